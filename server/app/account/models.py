@@ -20,10 +20,10 @@ class Account(Base):
     description: Mapped[str] = mapped_column(String(500), default="")
     is_default: Mapped[bool] = mapped_column(Boolean, default=False)
     created_at: Mapped[str] = mapped_column(
-        String(30), default=lambda: datetime.now(timezone.utc).isoformat()
+        String(40), default=lambda: datetime.now(timezone.utc).isoformat()
     )
     updated_at: Mapped[str] = mapped_column(
-        String(30),
+        String(40),
         default=lambda: datetime.now(timezone.utc).isoformat(),
         onupdate=lambda: datetime.now(timezone.utc).isoformat(),
     )
@@ -3,14 +3,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.account import service
 from app.account.schemas import AccountCreate, AccountUpdate
-from app.deps import get_db
+from app.deps import get_db, get_read_db
 from app.response import error, success
 
 router = APIRouter(prefix="/accounts", tags=["accounts"])
 
 
 @router.get("")
-async def list_accounts(db: AsyncSession = Depends(get_db)):
+async def list_accounts(db: AsyncSession = Depends(get_read_db)):
     accounts = await service.get_accounts(db)
     return success(accounts)
 
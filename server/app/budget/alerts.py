@@ -0,0 +1,105 @@
+"""预算阈值告警：订阅交易写入事件，增量维护 Budget.spent 并在越过阈值时发出事件
+
+每次写入只按事件负载里的快照（分类、日期、金额）查出覆盖它的预算
+（经分类闭包表匹配祖先分类），对这些预算的 spent 做加减，不重新汇总交易。
+加减与投递登记（outbox.claim）同一事务提交，重复投递的事件不会重复计入。
+越过 alert_threshold 或 100% 时发出 budget.threshold_crossed。
+"""
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.budget.models import Budget
+from app.category.models import CategoryClosure
+from app.database import async_session
+from app.plugin import outbox
+from app.plugin.base import registry
+
+
+def _contribution(snapshot: Optional[dict]) -> Optional[tuple]:
+    """快照对预算的贡献：(分类, 日期, 金额)；非支出或无分类时为 None"""
+    if not snapshot or snapshot.get("type") != "expense" or not snapshot.get("categoryId"):
+        return None
+    return snapshot["categoryId"], snapshot["date"], float(snapshot["amount"])
+
+
+async def _covering_budgets(db: AsyncSession, category_id: str, date: str) -> List[Budget]:
+    result = await db.execute(
+        select(Budget)
+        .join(CategoryClosure, CategoryClosure.ancestor_id == Budget.category_id)
+        .where(
+            CategoryClosure.descendant_id == category_id,
+            Budget.start_date <= date,
+            Budget.end_date >= date,
+        )
+    )
+    return list(result.scalars().all())
+
+
+async def apply_change(before: Optional[dict], after: Optional[dict]) -> None:
+    """按前后快照调整相关预算的 spent，并检查阈值"""
+    deltas: Dict[str, float] = {}
+    budgets: Dict[str, Budget] = {}
+    async with async_session() as db:
+        for snapshot, sign in ((before, -1), (after, 1)):
+            contrib = _contribution(snapshot)
+            if not contrib:
+                continue
+            category_id, date, amount = contrib
+            for b in await _covering_budgets(db, category_id, date):
+                budgets[b.id] = b
+                deltas[b.id] = deltas.get(b.id, 0.0) + sign * amount
+
+        deltas = {bid: d for bid, d in deltas.items() if abs(d) >= 0.005}
+        # 与 spent 的更新同一事务登记投递：重复投递的事件不会被再次计入
+        if not deltas or not await outbox.claim(db):
+            return
+        crossed = []
+        for bid, delta in deltas.items():
+            b = budgets[bid]
+            # 原子自增，并发写入不会丢失更新
+            new_spent = float((await db.execute(
+                update(Budget)
+                .where(Budget.id == bid)
+                .values(spent=Budget.spent + Decimal(str(round(delta, 2))))
+                .returning(Budget.spent)
+            )).scalar_one())
+            old_spent = new_spent - delta
+            amount = float(b.amount)
+            if amount <= 0:
+                continue
+            for level in sorted({float(b.alert_threshold), 1.0}):
+                limit = amount * level
+                if old_spent < limit <= new_spent:
+                    crossed.append({
+                        "budgetId": b.id,
+                        "name": b.name,
+                        "categoryId": b.category_id,
+                        "amount": amount,
+                        "spent": round(new_spent, 2),
+                        "threshold": level,
+                    })
+        for payload in crossed:
+            outbox.record(db, "budget.threshold_crossed", payload)
+        await db.commit()
+        await outbox.publish(db)
+
+
+async def _on_created(payload: dict) -> None:
+    await apply_change(None, payload)
+
+
+async def _on_updated(payload: dict) -> None:
+    await apply_change(payload.get("before"), payload.get("after"))
+
+
+async def _on_deleted(payload: dict) -> None:
+    await apply_change(payload, None)
+
+
+# spent 按增量累加，重复执行会重复计入：不参与回放（需要重建时用 POST /budgets/recompute-spent）
+registry.subscribe("transaction.created", _on_created, replay=False)
+registry.subscribe("transaction.updated", _on_updated, replay=False)
+registry.subscribe("transaction.deleted", _on_deleted, replay=False)
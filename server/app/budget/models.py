@@ -23,10 +23,10 @@ class Budget(Base):
     end_date: Mapped[str] = mapped_column(String(30), nullable=False)
     alert_threshold: Mapped[float] = mapped_column(Numeric(6, 4), default=0.8)
     created_at: Mapped[str] = mapped_column(
-        String(30), default=lambda: datetime.now(timezone.utc).isoformat()
+        String(40), default=lambda: datetime.now(timezone.utc).isoformat()
     )
     updated_at: Mapped[str] = mapped_column(
-        String(30),
+        String(40),
         default=lambda: datetime.now(timezone.utc).isoformat(),
         onupdate=lambda: datetime.now(timezone.utc).isoformat(),
     )
@@ -3,18 +3,24 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.budget import service
 from app.budget.schemas import BudgetCreate, BudgetUpdate
-from app.deps import get_db
+from app.deps import get_db, get_read_db
 from app.response import error, success
 
 router = APIRouter(prefix="/budgets", tags=["budgets"])
 
 
 @router.get("")
-async def list_budgets(db: AsyncSession = Depends(get_db)):
+async def list_budgets(db: AsyncSession = Depends(get_read_db)):
     budgets = await service.get_budgets(db)
     return success(budgets)
 
 
+@router.post("/recompute-spent")
+async def recompute_spent(db: AsyncSession = Depends(get_db)):
+    """按交易重新汇总各预算的 spent（维护操作，校正增量维护产生的偏差）"""
+    return success(await service.recompute_spent(db))
+
+
 @router.post("")
 async def create_budget(data: BudgetCreate, db: AsyncSession = Depends(get_db)):
     budget = await service.create_budget(db, data)
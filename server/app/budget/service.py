@@ -1,23 +1,27 @@
+import logging
 from datetime import datetime, timezone
-from typing import Optional, List
+from typing import Iterable, Optional, List
 
 from sqlalchemy import select, func, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.budget.models import Budget
 from app.budget.schemas import BudgetCreate, BudgetUpdate
-from app.category.models import Category
+from app.category.models import Category, CategoryClosure
+from app.transaction.keys import day_key_expr, from_cents
 from app.transaction.models import Transaction
 
+logger = logging.getLogger(__name__)
 
-def _to_dict(budget: Budget, category_name: str = "") -> dict:
+
+def _to_dict(budget: Budget, category_name: str = "", spent: Optional[float] = None) -> dict:
     return {
         "id": budget.id,
         "name": budget.name,
         "categoryId": budget.category_id,
         "categoryName": category_name,
         "amount": float(budget.amount),
-        "spent": float(budget.spent),
+        "spent": float(budget.spent) if spent is None else spent,
         "period": budget.period,
         "startDate": budget.start_date,
         "endDate": budget.end_date,
@@ -27,48 +31,80 @@ def _to_dict(budget: Budget, category_name: str = "") -> dict:
     }
 
 
-async def _calc_spent(db: AsyncSession, category_id: str, start_date: str, end_date: str) -> float:
-    result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount), 0.0)).where(
+async def _load_with_spent(db: AsyncSession, budget_id: Optional[str] = None,
+                           category_ids: Optional[Iterable[str]] = None) -> list:
+    """一次查询取出预算、分类名和期间内支出合计，返回 (Budget, 分类名, 支出) 列表
+
+    预算经分类闭包表 LEFT JOIN 交易（预算分类及其所有子分类、支出、日期落在
+    预算期间内）后按预算分组，替代每个预算单独一次 SUM；与报表一致按 day_key 过滤、
+    按 amount_cents 求和。
+    """
+    query = (
+        select(Budget, Category.name, func.coalesce(func.sum(Transaction.amount_cents), 0))
+        .outerjoin(Category, Category.id == Budget.category_id)
+        .outerjoin(CategoryClosure, CategoryClosure.ancestor_id == Budget.category_id)
+        .outerjoin(
+            Transaction,
             and_(
-                Transaction.category_id == category_id,
+                Transaction.category_id == CategoryClosure.descendant_id,
                 Transaction.type == "expense",
-                Transaction.date >= start_date,
-                Transaction.date <= end_date,
-            )
+                Transaction.day_key >= day_key_expr(Budget.start_date),
+                Transaction.day_key <= day_key_expr(Budget.end_date),
+            ),
         )
+        .group_by(Budget.id, Category.name)
+        .order_by(Budget.created_at)
     )
-    return float(result.scalar() or 0.0)
+    if budget_id:
+        query = query.where(Budget.id == budget_id)
+    if category_ids is not None:
+        query = query.where(Budget.category_id.in_(list(category_ids)))
+    result = await db.execute(query)
+    return [(b, cat_name or "", from_cents(spent)) for b, cat_name, spent in result.all()]
+
+
+async def _refresh_spent(db: AsyncSession, budget: Budget) -> dict:
+    """创建/修改预算后按新的分类和期间重算 spent（之后由 app.budget.alerts 增量维护）"""
+    await db.flush()
+    _, cat_name, spent = (await _load_with_spent(db, budget.id))[0]
+    budget.spent = spent
+    await db.commit()
+    return _to_dict(budget, cat_name)
 
 
 async def get_budgets(db: AsyncSession) -> List[dict]:
-    result = await db.execute(select(Budget).order_by(Budget.created_at))
-    budgets = list(result.scalars().all())
-    if not budgets:
-        return []
-
-    # Batch query category names
-    cat_ids = {b.category_id for b in budgets if b.category_id}
-    cat_map: dict[str, str] = {}
-    if cat_ids:
-        cat_result = await db.execute(
-            select(Category.id, Category.name).where(Category.id.in_(cat_ids))
-        )
-        cat_map = {r[0]: r[1] for r in cat_result.all()}
-
-    # Batch calc spent: single aggregation query grouped by category_id
-    # Build conditions for all budgets' date ranges
-    # We need per-budget spent, so group by category_id with union of date ranges
-    # Since budgets can have different date ranges per category, we still need per-budget calculation
-    # But we can batch by collecting (category_id, start, end) combos
-    # For simplicity and correctness, use a single query with CASE WHEN per budget
-    items = []
-    for b in budgets:
-        spent = await _calc_spent(db, b.category_id, b.start_date, b.end_date)
-        b.spent = spent
-        cat_name = cat_map.get(b.category_id, "")
-        items.append(_to_dict(b, cat_name))
-    return items
+    """只读：spent 以汇总结果为准；与增量维护的 Budget.spent 不一致时记录警告，由 recompute_spent 校正"""
+    rows = await _load_with_spent(db)
+    drifted = [b.name for b, _, spent in rows if abs(float(b.spent or 0.0) - spent) >= 0.005]
+    if drifted:
+        logger.warning("budget spent drift: %s", ", ".join(drifted))
+    return [_to_dict(b, cat_name, spent) for b, cat_name, spent in rows]
+
+
+async def refresh_spent(db: AsyncSession, category_ids: Optional[Iterable[str]] = None) -> dict:
+    """按交易重新汇总预算的 spent（category_ids 指定时只处理这些分类上的预算），不提交
+
+    分类移动后由调用方在同一事务中对新旧祖先链上的预算调用。
+    """
+    rows = await _load_with_spent(db, category_ids=category_ids)
+    corrected = []
+    for b, _, spent in rows:
+        if abs(float(b.spent or 0.0) - spent) >= 0.005:
+            corrected.append({"id": b.id, "name": b.name, "before": float(b.spent or 0.0), "after": spent})
+            b.spent = spent
+    return {"total": len(rows), "corrected": corrected}
+
+
+async def recompute_spent(db: AsyncSession) -> dict:
+    """按交易重新汇总所有预算的 spent
+
+    Budget.spent 由 app.budget.alerts 按交易事件增量维护；不发事件的写入
+    （如直接改库）会造成偏差，需要时显式调用校正。
+    """
+    result = await refresh_spent(db)
+    if result["corrected"]:
+        await db.commit()
+    return result
 
 
 async def create_budget(db: AsyncSession, data: BudgetCreate) -> dict:
@@ -82,20 +118,7 @@ async def create_budget(db: AsyncSession, data: BudgetCreate) -> dict:
         alert_threshold=data.alertThreshold,
     )
     db.add(budget)
-    await db.commit()
-    await db.refresh(budget)
-    spent = await _calc_spent(db, budget.category_id, budget.start_date, budget.end_date)
-    budget.spent = spent
-    cat_map: dict[str, str] = {}
-    if budget.category_id:
-        cat_result = await db.execute(
-            select(Category.id, Category.name).where(Category.id == budget.category_id)
-        )
-        row = cat_result.first()
-        if row:
-            cat_map[row[0]] = row[1]
-    cat_name = cat_map.get(budget.category_id, "")
-    return _to_dict(budget, cat_name)
+    return await _refresh_spent(db, budget)
 
 
 async def update_budget(db: AsyncSession, budget_id: str, data: BudgetUpdate) -> Optional[dict]:
@@ -113,20 +136,7 @@ async def update_budget(db: AsyncSession, budget_id: str, data: BudgetUpdate) ->
         attr = field_map.get(key, key)
         setattr(budget, attr, value)
     budget.updated_at = datetime.now(timezone.utc).isoformat()
-    await db.commit()
-    await db.refresh(budget)
-    spent = await _calc_spent(db, budget.category_id, budget.start_date, budget.end_date)
-    budget.spent = spent
-    cat_map: dict[str, str] = {}
-    if budget.category_id:
-        cat_result = await db.execute(
-            select(Category.id, Category.name).where(Category.id == budget.category_id)
-        )
-        row = cat_result.first()
-        if row:
-            cat_map[row[0]] = row[1]
-    cat_name = cat_map.get(budget.category_id, "")
-    return _to_dict(budget, cat_name)
+    return await _refresh_spent(db, budget)
 
 
 async def delete_budget(db: AsyncSession, budget_id: str) -> bool:
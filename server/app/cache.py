@@ -0,0 +1,38 @@
+"""进程内查询结果缓存：按命名空间存放，由插件事件触发失效。"""
+from typing import Any, Dict, Hashable, Optional
+
+from app.plugin.base import registry
+
+
+class QueryCache:
+    def __init__(self) -> None:
+        self._store: Dict[str, Dict[Hashable, Any]] = {}
+        self._generations: Dict[str, int] = {}
+
+    def generation(self, namespace: str) -> int:
+        """当前失效代数；计算前取一次，写回时比对，避免把失效前的结果写入缓存"""
+        return self._generations.get(namespace, 0)
+
+    def get(self, namespace: str, key: Hashable = None) -> Optional[Any]:
+        return self._store.get(namespace, {}).get(key)
+
+    def set(self, namespace: str, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        if generation is not None and generation != self.generation(namespace):
+            return
+        # 只保留最新的 key（如按日期区分的提醒），旧 key 不再有用
+        self._store[namespace] = {key: value}
+
+    def invalidate(self, namespace: str) -> None:
+        self._store.pop(namespace, None)
+        self._generations[namespace] = self.generation(namespace) + 1
+
+    def invalidate_on(self, namespace: str, *events: str) -> None:
+        """订阅事件，任一事件触发时清空该命名空间"""
+        async def _handler(payload: Any = None) -> None:
+            self.invalidate(namespace)
+
+        for event in events:
+            registry.subscribe(event, _handler, inline=True)
+
+
+cache = QueryCache()
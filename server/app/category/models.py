@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime, timezone
 from typing import Optional
 
-from sqlalchemy import Integer, String
+from sqlalchemy import Index, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.database import Base
@@ -19,5 +19,17 @@ class Category(Base):
     parent_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True, default=None)
     sort: Mapped[int] = mapped_column(Integer, default=0)
     created_at: Mapped[str] = mapped_column(
-        String(30), default=lambda: datetime.now(timezone.utc).isoformat()
+        String(40), default=lambda: datetime.now(timezone.utc).isoformat()
     )
+
+
+class CategoryClosure(Base):
+    """分类闭包表：每对 (祖先, 后代) 一行，含自身 (depth=0)，供按父分类汇总时一次 JOIN"""
+    __tablename__ = "category_closure"
+    __table_args__ = (
+        Index("ix_category_closure_descendant_id", "descendant_id"),
+    )
+
+    ancestor_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    descendant_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    depth: Mapped[int] = mapped_column(Integer, default=0)
@@ -3,14 +3,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.category import service
 from app.category.schemas import CategoryCreate, CategoryUpdate
-from app.deps import get_db
+from app.deps import get_db, get_read_db
 from app.response import error, success
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
 
 @router.get("")
-async def list_categories(db: AsyncSession = Depends(get_db)):
+async def list_categories(db: AsyncSession = Depends(get_read_db)):
     categories = await service.get_categories(db)
     return success(categories)
 
@@ -26,6 +26,8 @@ async def update_category(
     category_id: str, data: CategoryUpdate, db: AsyncSession = Depends(get_db)
 ):
     category = await service.update_category(db, category_id, data)
+    if category == "invalid_parent":
+        return error("不能将分类移动到自身或其子分类下", code=409)
     if not category:
         return error("Category not found", code=404)
     return success(category)
@@ -1,11 +1,13 @@
 from datetime import datetime, timezone
 from typing import Optional, Union, List, Dict
 
-from sqlalchemy import select
+from sqlalchemy import select, delete, insert, func, true
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
 from app.budget.models import Budget
-from app.category.models import Category
+from app.budget.service import refresh_spent
+from app.category.models import Category, CategoryClosure
 from app.category.schemas import CategoryCreate, CategoryUpdate
 from app.transaction.models import Transaction
 
@@ -38,6 +40,73 @@ def _build_tree(items: List[dict]) -> List[dict]:
     return roots
 
 
+# ============================================================
+# 分类闭包表维护
+# ============================================================
+async def _link_to_parent(db: AsyncSession, node_id: str, parent_id: Optional[str]) -> None:
+    """把 node_id 的整棵子树挂到 parent_id 的所有祖先下（子树内部的行保持不变）"""
+    if not parent_id:
+        return
+    up = aliased(CategoryClosure)
+    down = aliased(CategoryClosure)
+    await db.execute(
+        insert(CategoryClosure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            # 祖先集合 × 子树节点的笛卡尔积
+            select(up.ancestor_id, down.descendant_id, up.depth + down.depth + 1)
+            .select_from(up)
+            .join(down, true())
+            .where(up.descendant_id == parent_id, down.ancestor_id == node_id),
+        )
+    )
+
+
+async def _ancestors(db: AsyncSession, node_id: str) -> List[str]:
+    result = await db.execute(select(CategoryClosure.ancestor_id).where(CategoryClosure.descendant_id == node_id))
+    return list(result.scalars().all())
+
+
+async def _unlink_from_parent(db: AsyncSession, node_id: str) -> None:
+    """删除子树与原祖先之间的行"""
+    subtree = select(CategoryClosure.descendant_id).where(CategoryClosure.ancestor_id == node_id)
+    ancestors = select(CategoryClosure.ancestor_id).where(
+        CategoryClosure.descendant_id == node_id, CategoryClosure.ancestor_id != node_id
+    )
+    await db.execute(
+        delete(CategoryClosure).where(
+            CategoryClosure.descendant_id.in_(subtree),
+            CategoryClosure.ancestor_id.in_(ancestors),
+        )
+    )
+
+
+async def rebuild_closure(db: AsyncSession) -> None:
+    """按 parent_id 全量重建闭包表"""
+    result = await db.execute(select(Category.id, Category.parent_id))
+    parents = {r[0]: r[1] for r in result.all()}
+    rows = []
+    for cid in parents:
+        node, depth, seen = cid, 0, set()
+        while node and node in parents and node not in seen:
+            seen.add(node)
+            rows.append({"ancestor_id": node, "descendant_id": cid, "depth": depth})
+            node, depth = parents[node], depth + 1
+    await db.execute(delete(CategoryClosure))
+    if rows:
+        await db.execute(insert(CategoryClosure), rows)
+    await db.commit()
+
+
+async def ensure_closure(db: AsyncSession) -> None:
+    """启动时校验：自身行数与分类数不一致（新库或外部写入）时重建"""
+    cat_count = (await db.execute(select(func.count(Category.id)))).scalar() or 0
+    self_count = (await db.execute(
+        select(func.count()).select_from(CategoryClosure).where(CategoryClosure.depth == 0)
+    )).scalar() or 0
+    if cat_count != self_count:
+        await rebuild_closure(db)
+
+
 async def get_categories(db: AsyncSession) -> List[dict]:
     result = await db.execute(select(Category).order_by(Category.sort, Category.created_at))
     items = [_to_dict(c) for c in result.scalars().all()]
@@ -54,6 +123,10 @@ async def create_category(db: AsyncSession, data: CategoryCreate) -> dict:
         sort=data.sort,
     )
     db.add(cat)
+    await db.flush()
+    db.add(CategoryClosure(ancestor_id=cat.id, descendant_id=cat.id, depth=0))
+    await db.flush()
+    await _link_to_parent(db, cat.id, cat.parent_id)
     await db.commit()
     await db.refresh(cat)
     result = _to_dict(cat)
@@ -61,15 +134,35 @@ async def create_category(db: AsyncSession, data: CategoryCreate) -> dict:
     return result
 
 
-async def update_category(db: AsyncSession, category_id: str, data: CategoryUpdate) -> Optional[dict]:
+async def update_category(db: AsyncSession, category_id: str, data: CategoryUpdate) -> Union[dict, str, None]:
     cat = await db.get(Category, category_id)
     if not cat:
         return None
     update_data = data.model_dump(exclude_unset=True)
+    old_parent_id = cat.parent_id
+    new_parent_id = update_data.get("parentId", old_parent_id) or None
+    if new_parent_id != old_parent_id and new_parent_id:
+        # 不能挂到自身或自己的后代下
+        in_subtree = await db.execute(
+            select(CategoryClosure.descendant_id).where(
+                CategoryClosure.ancestor_id == category_id,
+                CategoryClosure.descendant_id == new_parent_id,
+            )
+        )
+        if new_parent_id == category_id or in_subtree.first():
+            return "invalid_parent"
     field_map = {"parentId": "parent_id"}
     for key, value in update_data.items():
         attr = field_map.get(key, key)
         setattr(cat, attr, value)
+    if new_parent_id != old_parent_id:
+        affected = set(await _ancestors(db, category_id))
+        await _unlink_from_parent(db, category_id)
+        await _link_to_parent(db, category_id, new_parent_id)
+        affected.update(await _ancestors(db, category_id))
+        # 子树的支出从旧祖先链移到新祖先链，两条链上的预算 spent 随之重算
+        affected.discard(category_id)
+        await refresh_spent(db, affected)
     await db.commit()
     await db.refresh(cat)
     result = _to_dict(cat)
@@ -100,5 +193,7 @@ async def delete_category(db: AsyncSession, category_id: str) -> Union[bool, str
     if bgt.first():
         return "in_use"
     await db.delete(cat)
+    # 仅叶子分类可删，只需删除以它为后代的行
+    await db.execute(delete(CategoryClosure).where(CategoryClosure.descendant_id == category_id))
     await db.commit()
     return True
@@ -2,7 +2,7 @@ from typing import Optional
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.deps import get_db
+from app.deps import get_db, get_read_db
 from app.response import error, success
 from app.contact import service
 from app.contact.schemas import ContactCreate, ContactUpdate
@@ -16,14 +16,14 @@ async def list_contacts(
     pageSize: int = Query(20, ge=1, le=100),
     keyword: Optional[str] = None,
     type: Optional[str] = None,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     result = await service.get_contacts(db, page=page, page_size=pageSize, keyword=keyword, type_filter=type)
     return success(result)
 
 
 @router.get("/all")
-async def all_contacts(type: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+async def all_contacts(type: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
     data = await service.get_all_contacts(db, type_filter=type)
     return success(data)
 
@@ -2,13 +2,13 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.dashboard import service
-from app.deps import get_db
+from app.deps import get_read_db
 from app.response import success
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
 
 @router.get("/summary")
-async def get_summary(db: AsyncSession = Depends(get_db)):
+async def get_summary(db: AsyncSession = Depends(get_read_db)):
     data = await service.get_dashboard_summary(db)
     return success(data)
@@ -3,6 +3,7 @@ from datetime import datetime
 from sqlalchemy import select, func, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.transaction.keys import from_cents, to_day_key
 from app.transaction.models import Transaction
 
 
@@ -24,32 +25,32 @@ def _get_current_quarter_range() -> tuple[str, str, str]:
 async def get_dashboard_summary(db: AsyncSession) -> dict:
     start_date, end_date, quarter_name = _get_current_quarter_range()
 
-    date_filter = and_(Transaction.date >= start_date, Transaction.date < end_date)
+    date_filter = and_(Transaction.day_key >= to_day_key(start_date), Transaction.day_key < to_day_key(end_date))
 
     # Quarterly income
     inc_result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount), 0.0))
+        select(func.coalesce(func.sum(Transaction.amount_cents), 0))
         .where(and_(date_filter, Transaction.type == "income"))
     )
-    quarterly_income = float(inc_result.scalar() or 0)
+    quarterly_income = from_cents(inc_result.scalar())
 
     # Quarterly expense
     exp_result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount), 0.0))
+        select(func.coalesce(func.sum(Transaction.amount_cents), 0))
         .where(and_(date_filter, Transaction.type == "expense"))
     )
-    quarterly_expense = float(exp_result.scalar() or 0)
+    quarterly_expense = from_cents(exp_result.scalar())
 
     # Quarterly invoiced income (income with invoice_completed=True)
     inv_result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount), 0.0))
+        select(func.coalesce(func.sum(Transaction.amount_cents), 0))
         .where(and_(
             date_filter,
             Transaction.type == "income",
             Transaction.invoice_completed == True,
         ))
     )
-    quarterly_invoiced_income = float(inv_result.scalar() or 0)
+    quarterly_invoiced_income = from_cents(inv_result.scalar())
 
     # Pending counts
     pending_payments_count = (await db.execute(
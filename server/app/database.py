@@ -1,25 +1,110 @@
+from typing import Optional
+
 from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 
 from app.config import settings
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.ECHO_SQL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
-)
+IS_SQLITE = "sqlite" in settings.DATABASE_URL
+
+
+def _engine_args(url: str, read_only: bool = False) -> dict:
+    """create_async_engine 的连接与连接池参数"""
+    if "sqlite" in url:
+        args = {"connect_args": {"check_same_thread": False}}
+        # 内存库使用单连接池，不支持连接数配置
+        if ":memory:" in url:
+            return args
+    elif "asyncpg" in url:
+        server_settings = {"application_name": settings.DB_APPLICATION_NAME, "jit": "off"}
+        if read_only:
+            server_settings["default_transaction_read_only"] = "on"
+        args = {
+            "connect_args": {"command_timeout": settings.DB_COMMAND_TIMEOUT, "server_settings": server_settings},
+            # 服务器端会关闭空闲连接，取用前检查并定期回收
+            "pool_pre_ping": True,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+        }
+    else:
+        args = {}
+    args.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+    return args
+
+
+engine = create_async_engine(settings.DATABASE_URL, echo=settings.ECHO_SQL, **_engine_args(settings.DATABASE_URL))
+
+
+def sqlite_pragmas(read_only: bool = False) -> list:
+    """每个新连接执行的 PRAGMA"""
+    pragmas = ["PRAGMA query_only=ON"] if read_only else ["PRAGMA foreign_keys=ON"]
+    if not settings.SQLITE_PERFORMANCE_PROFILE:
+        return pragmas
+    # journal_mode 记录在数据库文件中，由读写连接设置
+    if ":memory:" not in settings.DATABASE_URL and not read_only:
+        pragmas.append("PRAGMA journal_mode=WAL")
+    pragmas += [
+        # WAL 下 NORMAL 不会损坏数据库，断电时最多丢失最后几个已提交事务
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        "PRAGMA temp_store=MEMORY",
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+    ]
+    return pragmas
 
-# Enable foreign keys for SQLite
-if "sqlite" in settings.DATABASE_URL:
+
+# Enable foreign keys (and the performance profile) for SQLite
+if IS_SQLITE:
     @event.listens_for(engine.sync_engine, "connect")
     def _set_sqlite_pragma(dbapi_conn, connection_record):
         cursor = dbapi_conn.cursor()
-        cursor.execute("PRAGMA foreign_keys=ON")
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
         cursor.close()
 
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+def _read_url() -> Optional[str]:
+    if not settings.SEPARATE_READ_ENGINE:
+        return None
+    if settings.READ_DATABASE_URL:
+        return settings.READ_DATABASE_URL
+    if not IS_SQLITE or ":memory:" in settings.DATABASE_URL:
+        return None
+    url = make_url(settings.DATABASE_URL)
+    return url.set(database=f"file:{url.database}", query={"mode": "ro", "uri": "true"}).render_as_string(False)
+
+
+# 只读引擎：长时间的报表扫描不占用写连接；未配置时与主引擎相同
+_read_database_url = _read_url()
+if _read_database_url:
+    read_engine = create_async_engine(
+        _read_database_url, echo=settings.ECHO_SQL, **_engine_args(_read_database_url, read_only=True)
+    )
+    if "sqlite" in _read_database_url:
+        @event.listens_for(read_engine.sync_engine, "connect")
+        def _set_sqlite_read_pragma(dbapi_conn, connection_record):
+            cursor = dbapi_conn.cursor()
+            for pragma in sqlite_pragmas(read_only=True):
+                cursor.execute(pragma)
+            cursor.close()
+else:
+    read_engine = engine
+
+async_read_session = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+# 慢查询记录（含执行计划），按需开启
+if settings.SLOW_QUERY_LOG_ENABLED:
+    from app.metrics.slow_queries import recorder as slow_query_recorder
+    slow_query_recorder.attach(engine, read_engine)
+
+
 class Base(DeclarativeBase):
     pass
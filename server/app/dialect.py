@@ -0,0 +1,12 @@
+"""数据库方言适配：服务层通过这里的函数编写与方言无关的查询（SQLite / PostgreSQL）"""
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def upsert(db: AsyncSession, table):
+    """当前方言的 INSERT（支持 on_conflict_do_update / returning）"""
+    # 按需导入：PostgreSQL 方言模块较大，SQLite 部署无需加载
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
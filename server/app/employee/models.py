@@ -28,10 +28,10 @@ class Employee(Base):
     special_deduction: Mapped[float] = mapped_column(Numeric(12, 2), default=0)  # 专项附加扣除总额/月
     notes: Mapped[str] = mapped_column(Text, default="")
     created_at: Mapped[str] = mapped_column(
-        String(30), default=lambda: datetime.now(timezone.utc).isoformat()
+        String(40), default=lambda: datetime.now(timezone.utc).isoformat()
     )
     updated_at: Mapped[str] = mapped_column(
-        String(30),
+        String(40),
         default=lambda: datetime.now(timezone.utc).isoformat(),
         onupdate=lambda: datetime.now(timezone.utc).isoformat(),
     )
@@ -54,5 +54,5 @@ class SalaryRecord(Base):
     status: Mapped[str] = mapped_column(String(20), default="confirmed")  # confirmed
     transaction_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True, default=None)
     confirmed_at: Mapped[str] = mapped_column(
-        String(30), default=lambda: datetime.now(timezone.utc).isoformat()
+        String(40), default=lambda: datetime.now(timezone.utc).isoformat()
     )
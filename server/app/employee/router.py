@@ -3,7 +3,7 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.deps import get_db
+from app.deps import get_db, get_read_db
 from app.response import success, error
 from app.employee import service
 from app.employee.schemas import EmployeeCreate, EmployeeUpdate, SalaryConfirmRequest, SalaryRecordUpdate
@@ -17,20 +17,20 @@ async def list_employees(
     pageSize: int = Query(20, ge=1, le=100),
     keyword: Optional[str] = None,
     status: Optional[str] = None,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     result = await service.get_employees(db, page=page, page_size=pageSize, keyword=keyword, status=status)
     return success(result)
 
 
 @router.get("/all")
-async def all_employees(status: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+async def all_employees(status: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
     data = await service.get_all_employees(db, status=status)
     return success(data)
 
 
 @router.get("/reminders")
-async def pay_reminders(db: AsyncSession = Depends(get_db)):
+async def pay_reminders(db: AsyncSession = Depends(get_read_db)):
     data = await service.get_pay_reminders(db)
     return success(data)
 
@@ -106,20 +106,20 @@ async def calc_tax(
 async def salary_records(
     employeeId: Optional[str] = None,
     year: Optional[int] = None,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     data = await service.get_salary_records(db, employee_id=employeeId, year=year)
     return success(data)
 
 
 @router.get("/unpaid-salaries")
-async def unpaid_salaries(db: AsyncSession = Depends(get_db)):
+async def unpaid_salaries(db: AsyncSession = Depends(get_read_db)):
     data = await service.get_unpaid_salaries(db)
     return success(data)
 
 
 @router.get("/salary-differences")
-async def salary_differences(db: AsyncSession = Depends(get_db)):
+async def salary_differences(db: AsyncSession = Depends(get_read_db)):
     data = await service.get_salary_differences(db)
     return success(data)
 
@@ -2,11 +2,13 @@ from datetime import datetime, timezone
 from typing import Optional, List
 import uuid
 
-from sqlalchemy import select, or_, func, and_
+from sqlalchemy import select, or_, func, and_, case
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import cache
 from app.employee.models import Employee, SalaryRecord
 from app.employee.schemas import EmployeeCreate, EmployeeUpdate
+from app.plugin import outbox
 
 
 # 个税月度累进税率表（用于简单单月计算）
@@ -287,8 +289,11 @@ async def create_employee(db: AsyncSession, data: EmployeeCreate) -> dict:
         special_deduction=data.specialDeduction, notes=data.notes,
     )
     db.add(e)
+    await db.flush()
+    outbox.record(db, "employee.created", {"id": e.id})
     await db.commit()
     await db.refresh(e)
+    await outbox.publish(db)
     return await _to_dict(e, db)
 
 
@@ -300,8 +305,10 @@ async def update_employee(db: AsyncSession, eid: str, data: EmployeeUpdate) -> O
     for key, value in update_data.items():
         setattr(e, FIELD_MAP.get(key, key), value)
     e.updated_at = datetime.now(timezone.utc).isoformat()
+    outbox.record(db, "employee.updated", {"id": e.id})
     await db.commit()
     await db.refresh(e)
+    await outbox.publish(db)
     return await _to_dict(e, db)
 
 
@@ -310,33 +317,50 @@ async def delete_employee(db: AsyncSession, eid: str) -> bool:
     if not e:
         return False
     await db.delete(e)
+    outbox.record(db, "employee.deleted", {"id": eid})
     await db.commit()
+    await outbox.publish(db)
     return True
 
 
+REMINDER_CACHE = "employee.pay_reminders"
+
+
 async def get_pay_reminders(db: AsyncSession) -> List[dict]:
-    """获取工资发放提醒和入职周年提醒"""
+    """获取工资发放提醒和入职周年提醒
+
+    在职员工及其当年已发放记录的累计数据由一次 LEFT JOIN + GROUP BY 读出，
+    结果按日期缓存，员工或工资记录变更时失效（仪表盘每次加载都会轮询）。
+    """
     now = datetime.now()
+    cache_key = now.date().isoformat()
+    cached = cache.get(REMINDER_CACHE, cache_key)
+    if cached is not None:
+        return cached
+    generation = cache.generation(REMINDER_CACHE)
+
     today = now.day
     current_month = now.month
     current_year = now.year
 
-    result = await db.execute(select(Employee).where(Employee.status == "active"))
-    employees = result.scalars().all()
-
-    # 查询当月已发放记录，已发工资的不再提醒
-    paid_result = await db.execute(
-        select(SalaryRecord).where(
-            SalaryRecord.year == current_year,
-            SalaryRecord.month == current_month,
+    prev_month = SalaryRecord.month < current_month
+    result = await db.execute(
+        select(
+            Employee,
+            func.coalesce(func.sum(case((prev_month, SalaryRecord.base_salary), else_=0)), 0),
+            func.coalesce(func.sum(case((prev_month, SalaryRecord.tax), else_=0)), 0),
+            func.count(case((prev_month, SalaryRecord.id))),
+            func.count(case((SalaryRecord.month == current_month, SalaryRecord.id))),
         )
+        .outerjoin(SalaryRecord, and_(SalaryRecord.employee_id == Employee.id, SalaryRecord.year == current_year))
+        .where(Employee.status == "active")
+        .group_by(Employee.id)
     )
-    paid_employee_ids = {r.employee_id for r in paid_result.scalars().all()}
 
     reminders = []
-    for e in employees:
+    for e, prev_income, prev_tax, prev_months, paid_this_month in result.all():
         # 工资发放提醒：从月初到发薪日后3天，已发放的不提醒
-        if e.id not in paid_employee_ids:
+        if not paid_this_month:
             diff = e.pay_day - today
             if diff >= -3:
                 if diff > 3:
@@ -351,21 +375,12 @@ async def get_pay_reminders(db: AsyncSession) -> List[dict]:
                 social_rate = float(e.social_insurance_rate)
                 fund_rate = float(e.housing_fund_rate)
                 special_ded = float(e.special_deduction)
-                cumulative = await _get_cumulative_data(db, e.id, current_year, current_month)
-                prev_months = cumulative["month_count"]
-                month_index = prev_months + 1
-                prev_records = (await db.execute(
-                    select(SalaryRecord).where(
-                        and_(SalaryRecord.employee_id == e.id, SalaryRecord.year == current_year, SalaryRecord.month < current_month)
-                    )
-                )).scalars().all()
-                prev_deduction = sum(float(r.base_salary) * (social_rate + fund_rate) / 100 for r in prev_records)
                 tax_info = calc_tax_cumulative(
                     float(e.base_salary), social_rate, fund_rate, special_ded,
-                    month_index=month_index,
-                    prev_cumulative_income=cumulative["prev_cumulative_income"],
-                    prev_cumulative_tax=cumulative["prev_cumulative_tax"],
-                    prev_cumulative_deduction=prev_deduction,
+                    month_index=prev_months + 1,
+                    prev_cumulative_income=float(prev_income),
+                    prev_cumulative_tax=float(prev_tax),
+                    prev_cumulative_deduction=float(prev_income) * (social_rate + fund_rate) / 100,
                     prev_cumulative_special=special_ded * prev_months,
                 )
                 reminders.append({
@@ -395,9 +410,17 @@ async def get_pay_reminders(db: AsyncSession) -> List[dict]:
             except (ValueError, TypeError):
                 pass
     reminders.sort(key=lambda r: r["daysUntil"])
+    cache.set(REMINDER_CACHE, cache_key, reminders, generation)
     return reminders
 
 
+cache.invalidate_on(
+    REMINDER_CACHE,
+    "employee.created", "employee.updated", "employee.deleted",
+    "salary.confirmed", "salary.updated",
+)
+
+
 async def get_salary_records(db: AsyncSession, employee_id: Optional[str] = None, year: Optional[int] = None) -> List[dict]:
     """获取工资发放记录（含实际支付金额和差额）"""
     from app.transaction.models import Transaction
@@ -441,6 +464,7 @@ async def get_salary_records(db: AsyncSession, employee_id: Optional[str] = None
 async def confirm_salary(db: AsyncSession, employee_id: str, year: int, month: int, account_id: Optional[str] = None, transfer_fee: float = 0, voucher: Optional[list] = None, manual_tax: Optional[float] = None, actual_paid: Optional[float] = None) -> dict:
     """确认工资发放：创建 SalaryRecord + 自动生成支出流水（金额=实际发放+可选手续费）"""
     from app.transaction.models import Transaction, Attachment
+    from app.transaction.hooks import txn_payload
     from app.account.models import Account
 
     # 检查是否已发放
@@ -563,8 +587,13 @@ async def confirm_salary(db: AsyncSession, employee_id: str, year: int, month: i
         confirmed_at=now,
     )
     db.add(record)
+    outbox.record(db, "transaction.created", txn_payload(txn))
+    if transfer_fee > 0:
+        outbox.record(db, "transaction.created", txn_payload(fee_txn))
+    outbox.record(db, "salary.confirmed", {"id": record.id, "employeeId": employee_id, "year": year, "month": month})
     await db.commit()
     await db.refresh(record)
+    await outbox.publish(db)
     difference = round(net_salary - paid_amount, 2)
     return {
         "id": record.id,
@@ -664,9 +693,12 @@ async def update_salary_record(db: AsyncSession, record_id: str, data) -> Option
         return None
 
     from app.transaction.models import Transaction
+    from app.transaction.hooks import txn_payload
     from app.account.models import Account
     from decimal import Decimal
 
+    txn_events = []
+
     # 更新个税 → 重算税后应发
     if data.tax is not None:
         record.tax = data.tax
@@ -676,6 +708,7 @@ async def update_salary_record(db: AsyncSession, record_id: str, data) -> Option
     if data.actualPaid is not None and record.transaction_id:
         txn = await db.get(Transaction, record.transaction_id)
         if txn:
+            before = txn_payload(txn)
             if txn.account_id:
                 account = await db.get(Account, txn.account_id)
                 if account:
@@ -683,9 +716,14 @@ async def update_salary_record(db: AsyncSession, record_id: str, data) -> Option
                     new_amount = Decimal(str(data.actualPaid))
                     account.balance += old_amount - new_amount
             txn.amount = data.actualPaid
+            txn_events.append({"id": txn.id, "before": before, "after": txn_payload(txn)})
 
+    for payload in txn_events:
+        outbox.record(db, "transaction.updated", payload)
+    outbox.record(db, "salary.updated", {"id": record.id, "employeeId": record.employee_id})
     await db.commit()
     await db.refresh(record)
+    await outbox.publish(db)
 
     # 取实际发放金额
     actual_paid = float(record.net_salary)
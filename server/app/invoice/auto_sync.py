@@ -0,0 +1,23 @@
+"""发票自动同步：订阅交易写入事件，增量同步交易中的发票数据
+
+同步按高水位增量扫描、已关联的交易由反连接排除，重复投递或回放只会多扫描一次。
+同一进程内串行执行，避免并发投递为同一交易重复建发票。
+"""
+import asyncio
+
+from app.database import async_session
+from app.invoice.service import sync_invoices_from_transactions
+from app.plugin.base import registry
+
+_lock = asyncio.Lock()
+
+
+async def _sync(payload: dict) -> None:
+    async with _lock:
+        async with async_session() as db:
+            await sync_invoices_from_transactions(db)
+
+
+registry.subscribe("transaction.created", _sync)
+registry.subscribe("transaction.updated", _sync)
+registry.subscribe("transaction.invoice_confirmed", _sync)
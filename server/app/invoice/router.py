@@ -3,7 +3,7 @@ from typing import Optional
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.deps import get_db
+from app.deps import get_db, get_read_db
 from app.invoice import service
 from app.invoice.schemas import InvoiceCreate, InvoiceUpdate
 from app.response import error, success
@@ -21,7 +21,7 @@ async def list_invoices(
     keyword: Optional[str] = Query(None, description="搜索关键字"),
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     result = await service.get_invoices(
         db,
@@ -38,10 +38,9 @@ async def list_invoices(
 
 
 @router.get("/stats")
-async def invoice_stats(db: AsyncSession = Depends(get_db)):
+async def invoice_stats(db: AsyncSession = Depends(get_read_db)):
     """发票统计（总数、收到/开出金额、本月统计）"""
-    # 每次获取统计前，先同步交易中的发票数据
-    await service.sync_invoices_from_transactions(db)
+    # 交易中的发票数据由交易写入事件自动同步（app.invoice.auto_sync），或调用 POST /sync
     stats = await service.get_invoice_stats(db)
     return success(stats)
 
@@ -97,7 +96,10 @@ async def delete_invoice(invoice_id: str, db: AsyncSession = Depends(get_db)):
 
 
 @router.post("/sync")
-async def sync_invoices(db: AsyncSession = Depends(get_db)):
+async def sync_invoices(
+    full: bool = Query(False, description="忽略高水位，全量扫描"),
+    db: AsyncSession = Depends(get_db),
+):
     """手动同步：从交易数据自动创建发票记录"""
-    result = await service.sync_invoices_from_transactions(db)
+    result = await service.sync_invoices_from_transactions(db, full=full)
     return success(result)
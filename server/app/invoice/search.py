@@ -0,0 +1,98 @@
+"""发票关键字检索：SQLite FTS5 trigram 索引（号码、代码、购买方、销售方）
+
+索引由 invoices 上的触发器维护，任何写入方式都会同步；启动时校验行数，不一致则重建。
+
+trigram 分词支持任意位置的子串匹配，替代四个 LIKE '%kw%' 的全表扫描。
+非 SQLite 数据库或关键字不足 3 个字符时回退到 LIKE。
+"""
+import re
+
+from sqlalchemy import column, literal_column, or_, select, table, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+from app.invoice.models import Invoice
+
+FTS_ENABLED = "sqlite" in settings.DATABASE_URL
+
+# 增值税发票号码 8 位，全电发票 20 位
+INVOICE_NUMBER_RE = re.compile(r"^(\d{8}|\d{20})$")
+
+_fts = table("invoices_fts", column("invoice_id"))
+
+
+_COLUMNS = "invoice_id, number, code, buyer_name, seller_name"
+_NEW_VALUES = "new.id, coalesce(new.number, ''), coalesce(new.code, ''), coalesce(new.buyer_name, ''), coalesce(new.seller_name, '')"
+
+# 触发器随 invoices 的每次写入同步索引，覆盖服务层之外的写入（脚本、手工 SQL）
+_TRIGGERS = {
+    "invoices_fts_ai": f"""
+        CREATE TRIGGER invoices_fts_ai AFTER INSERT ON invoices BEGIN
+            INSERT INTO invoices_fts ({_COLUMNS}) VALUES ({_NEW_VALUES});
+        END""",
+    "invoices_fts_ad": """
+        CREATE TRIGGER invoices_fts_ad AFTER DELETE ON invoices BEGIN
+            DELETE FROM invoices_fts WHERE invoice_id = old.id;
+        END""",
+    "invoices_fts_au": f"""
+        CREATE TRIGGER invoices_fts_au AFTER UPDATE OF id, number, code, buyer_name, seller_name ON invoices BEGIN
+            DELETE FROM invoices_fts WHERE invoice_id = old.id;
+            INSERT INTO invoices_fts ({_COLUMNS}) VALUES ({_NEW_VALUES});
+        END""",
+}
+
+
+async def ensure_index(conn: AsyncConnection) -> None:
+    """创建 FTS 表与同步触发器；新建、补建触发器或行数与 invoices 不一致时从 invoices 重建"""
+    if not FTS_ENABLED:
+        return
+    existing = set((await conn.execute(text(
+        "SELECT name FROM sqlite_master WHERE name = 'invoices_fts' OR name LIKE 'invoices_fts_a_'"
+    ))).scalars().all())
+    rebuild = False
+    if "invoices_fts" not in existing:
+        await conn.execute(text(
+            "CREATE VIRTUAL TABLE invoices_fts USING fts5("
+            "invoice_id UNINDEXED, number, code, buyer_name, seller_name, tokenize='trigram')"
+        ))
+        rebuild = True
+    for name, ddl in _TRIGGERS.items():
+        if name not in existing:
+            await conn.execute(text(ddl))
+            rebuild = True
+    if not rebuild:
+        indexed, total = (await conn.execute(text(
+            "SELECT (SELECT count(*) FROM invoices_fts), (SELECT count(*) FROM invoices)"
+        ))).one()
+        rebuild = indexed != total
+    if rebuild:
+        await conn.execute(text("DELETE FROM invoices_fts"))
+        await conn.execute(text(
+            f"INSERT INTO invoices_fts ({_COLUMNS}) "
+            "SELECT id, coalesce(number, ''), coalesce(code, ''), coalesce(buyer_name, ''), coalesce(seller_name, '') "
+            "FROM invoices"
+        ))
+
+
+def keyword_condition(keyword: str):
+    """构造关键字过滤条件
+
+    完整发票号码额外走 number 索引精确匹配，与子串匹配结果合并；
+    >= 3 字符的关键字走 trigram 索引，更短的关键字回退到 ILIKE 全表扫描。
+    """
+    exact = Invoice.number == keyword if INVOICE_NUMBER_RE.match(keyword) else None
+    if FTS_ENABLED and len(keyword) >= 3:
+        phrase = '"' + keyword.replace('"', '""') + '"'
+        condition = Invoice.id.in_(
+            select(_fts.c.invoice_id).where(literal_column("invoices_fts").match(phrase))
+        )
+        return condition if exact is None else or_(exact, condition)
+    # trigram 无法匹配不足 3 个字符的关键字，只能对四列做 ILIKE 全表扫描（非 SQLite 同样走这里）
+    kw = f"%{keyword}%"
+    # ilike：PostgreSQL 的 LIKE 区分大小写，与 SQLite 行为保持一致
+    return or_(
+        Invoice.number.ilike(kw),
+        Invoice.code.ilike(kw),
+        Invoice.buyer_name.ilike(kw),
+        Invoice.seller_name.ilike(kw),
+    )
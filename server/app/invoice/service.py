@@ -1,15 +1,21 @@
 import json
 import re
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List
 
-from sqlalchemy import select, func, and_, or_, desc
+from sqlalchemy import select, func, and_, or_, desc, case
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import cache
+from app.config import settings
+from app.invoice import search
 from app.invoice.models import Invoice
+from app.sync.models import SyncWatermark
 from app.invoice.schemas import InvoiceCreate, InvoiceUpdate
-from app.plugin.base import registry
+from app.plugin import outbox
+from app.plugin.hooks import EVENTS
 from app.transaction.models import Transaction
+from app.upload.thumbnails import thumbnail_url
 from app.settings.models import CompanyInfo
 
 
@@ -31,6 +37,7 @@ def _to_dict(inv: Invoice) -> dict:
         "items": json.loads(inv.items) if inv.items else [],
         "transactionId": inv.transaction_id,
         "imageUrl": inv.image_url,
+        "thumbUrl": thumbnail_url(inv.image_url),
         "status": inv.status,
         "createdAt": inv.created_at,
         "updatedAt": inv.updated_at,
@@ -62,13 +69,7 @@ async def get_invoices(
     if end_date:
         conditions.append(Invoice.issue_date <= end_date)
     if keyword:
-        kw = f"%{keyword}%"
-        conditions.append(or_(
-            Invoice.number.like(kw),
-            Invoice.code.like(kw),
-            Invoice.buyer_name.like(kw),
-            Invoice.seller_name.like(kw),
-        ))
+        conditions.append(search.keyword_condition(keyword))
 
     where_clause = and_(*conditions) if conditions else True
 
@@ -96,87 +97,70 @@ async def get_invoices(
     }
 
 
+STATS_CACHE = "invoice.stats"
+
+
 async def get_invoice_stats(db: AsyncSession) -> dict:
-    """发票统计"""
+    """发票统计
+
+    一次 GROUP BY direction 查询得出各方向合计、本月合计和待验证数，
+    结果缓存到下一次 invoice.* 事件。
+    """
     now = datetime.now()
     current_month = f"{now.year}-{now.month:02d}"
+    cached = cache.get(STATS_CACHE, current_month)
+    if cached is not None:
+        return cached
+    generation = cache.generation(STATS_CACHE)
 
-    # 总数
-    total_result = await db.execute(select(func.count(Invoice.id)))
-    total = total_result.scalar() or 0
-
-    # 收到发票合计
-    in_result = await db.execute(
-        select(
-            func.count(Invoice.id),
-            func.coalesce(func.sum(Invoice.total_amount), 0.0),
-            func.coalesce(func.sum(Invoice.tax_amount), 0.0),
-        ).where(Invoice.direction == "in")
-    )
-    in_row = in_result.one()
+    # 本月范围用 [月初, 下月初) 比较，可走 (direction, issue_date) 索引
+    month_start = f"{current_month}-01"
+    month_end = f"{now.year + 1}-01-01" if now.month == 12 else f"{now.year}-{now.month + 1:02d}-01"
+    in_month = and_(Invoice.issue_date >= month_start, Invoice.issue_date < month_end)
 
-    # 开出发票合计
-    out_result = await db.execute(
+    result = await db.execute(
         select(
+            Invoice.direction,
             func.count(Invoice.id),
             func.coalesce(func.sum(Invoice.total_amount), 0.0),
             func.coalesce(func.sum(Invoice.tax_amount), 0.0),
-        ).where(Invoice.direction == "out")
+            func.count(case((in_month, Invoice.id))),
+            func.coalesce(func.sum(case((in_month, Invoice.total_amount), else_=0)), 0.0),
+            func.count(case((Invoice.status == "pending", Invoice.id))),
+        ).group_by(Invoice.direction)
     )
-    out_row = out_result.one()
-
-    # 本月收到
-    in_month_result = await db.execute(
-        select(
-            func.count(Invoice.id),
-            func.coalesce(func.sum(Invoice.total_amount), 0.0),
-        ).where(and_(
-            Invoice.direction == "in",
-            Invoice.issue_date.like(f"{current_month}%"),
-        ))
-    )
-    in_month = in_month_result.one()
-
-    # 本月开出
-    out_month_result = await db.execute(
-        select(
-            func.count(Invoice.id),
-            func.coalesce(func.sum(Invoice.total_amount), 0.0),
-        ).where(and_(
-            Invoice.direction == "out",
-            Invoice.issue_date.like(f"{current_month}%"),
-        ))
-    )
-    out_month = out_month_result.one()
-
-    # 待验证
-    pending_result = await db.execute(
-        select(func.count(Invoice.id)).where(Invoice.status == "pending")
-    )
-    pending = pending_result.scalar() or 0
-
-    return {
-        "total": total,
-        "pending": pending,
+    rows = {r[0]: r for r in result.all()}
+    empty = (None, 0, 0.0, 0.0, 0, 0.0, 0)
+    in_row = rows.get("in", empty)
+    out_row = rows.get("out", empty)
+
+    stats = {
+        "total": sum(r[1] for r in rows.values()),
+        "pending": sum(r[6] for r in rows.values()),
         "received": {
-            "count": in_row[0],
-            "totalAmount": float(in_row[1]),
-            "taxAmount": float(in_row[2]),
+            "count": in_row[1],
+            "totalAmount": float(in_row[2]),
+            "taxAmount": float(in_row[3]),
         },
         "issued": {
-            "count": out_row[0],
-            "totalAmount": float(out_row[1]),
-            "taxAmount": float(out_row[2]),
+            "count": out_row[1],
+            "totalAmount": float(out_row[2]),
+            "taxAmount": float(out_row[3]),
         },
         "monthReceived": {
-            "count": in_month[0],
-            "totalAmount": float(in_month[1]),
+            "count": in_row[4],
+            "totalAmount": float(in_row[5]),
         },
         "monthIssued": {
-            "count": out_month[0],
-            "totalAmount": float(out_month[1]),
+            "count": out_row[4],
+            "totalAmount": float(out_row[5]),
         },
     }
+    cache.set(STATS_CACHE, current_month, stats, generation)
+    return stats
+
+
+cache.invalidate_on(STATS_CACHE, *sorted(e for e in EVENTS if e.startswith("invoice.")))
 
 
 async def get_invoice_by_id(db: AsyncSession, invoice_id: str) -> Optional[dict]:
@@ -204,9 +188,11 @@ async def create_invoice(db: AsyncSession, data: InvoiceCreate) -> dict:
         status=data.status,
     )
     db.add(inv)
+    await db.flush()
+    outbox.record(db, "invoice.created", {"id": inv.id})
     await db.commit()
     await db.refresh(inv)
-    await registry.emit("invoice.created", {"id": inv.id})
+    await outbox.publish(db)
     return _to_dict(inv)
 
 
@@ -217,8 +203,10 @@ async def verify_invoice(db: AsyncSession, invoice_id: str) -> Optional[dict]:
         return None
     inv.status = "verified"
     inv.updated_at = datetime.now(timezone.utc).isoformat()
+    outbox.record(db, "invoice.verified", {"id": inv.id})
     await db.commit()
     await db.refresh(inv)
+    await outbox.publish(db)
     return _to_dict(inv)
 
 
@@ -229,8 +217,10 @@ async def void_invoice(db: AsyncSession, invoice_id: str) -> Optional[dict]:
         return None
     inv.status = "void"
     inv.updated_at = datetime.now(timezone.utc).isoformat()
+    outbox.record(db, "invoice.voided", {"id": inv.id})
     await db.commit()
     await db.refresh(inv)
+    await outbox.publish(db)
     return _to_dict(inv)
 
 
@@ -261,9 +251,10 @@ async def update_invoice(db: AsyncSession, invoice_id: str, data: InvoiceUpdate)
         inv.items = json.dumps([item if isinstance(item, dict) else item.model_dump() for item in items_data])
 
     inv.updated_at = datetime.now(timezone.utc).isoformat()
+    outbox.record(db, "invoice.updated", {"id": inv.id})
     await db.commit()
     await db.refresh(inv)
-    await registry.emit("invoice.updated", {"id": inv.id})
+    await outbox.publish(db)
     return _to_dict(inv)
 
 
@@ -272,8 +263,9 @@ async def delete_invoice(db: AsyncSession, invoice_id: str) -> bool:
     if not inv:
         return False
     await db.delete(inv)
+    outbox.record(db, "invoice.deleted", {"id": invoice_id})
     await db.commit()
-    await registry.emit("invoice.deleted", {"id": invoice_id})
+    await outbox.publish(db)
     return True
 
 
@@ -304,49 +296,63 @@ def _parse_invoice_filename(filename: str) -> dict:
     return result
 
 
-async def sync_invoices_from_transactions(db: AsyncSession) -> dict:
+SYNC_WATERMARK = "invoice.sync_from_transactions"
+
+
+def _sync_since(watermark: str) -> str:
+    """增量扫描起点：高水位减去回看窗口。updated_at 在写入时取值、提交较晚的交易可能落在高水位之前"""
+    if not watermark:
+        return ""
+    try:
+        since = datetime.fromisoformat(watermark) - timedelta(seconds=settings.INVOICE_SYNC_LOOKBACK)
+    except ValueError:
+        return ""
+    return since.isoformat()
+
+
+async def sync_invoices_from_transactions(db: AsyncSession, full: bool = False) -> dict:
     """扫描有发票数据的交易，自动创建对应的发票记录。
 
     仅处理 invoice_issued=1 或 invoice_images 非空、且尚未关联 invoice 记录的交易。
+    默认增量模式：只看 updated_at 不早于上次高水位减回看窗口的交易；full=True 时全量扫描。
+    已关联判断用 NOT EXISTS 反连接（invoices.transaction_id 有索引），重复扫描不会重复建发票。
     """
-    # 获取公司信息
-    company_result = await db.execute(select(CompanyInfo).limit(1))
-    company = company_result.scalar_one_or_none()
-    company_name = company.company_name if company else "知域科技（新安县）有限责任公司"
-    tax_number = company.tax_number if company else "91410323MAK75U412Y"
+    watermark = await db.get(SyncWatermark, SYNC_WATERMARK)
+    since = _sync_since(watermark.value) if watermark and not full else ""
 
-    # 查找已有发票关联的 transaction_id 集合
-    linked_result = await db.execute(
-        select(Invoice.transaction_id).where(Invoice.transaction_id.isnot(None))
-    )
-    linked_tx_ids = {r[0] for r in linked_result.all()}
+    conditions = [
+        or_(
+            Transaction.invoice_issued == True,
+            and_(
+                Transaction.invoice_images.isnot(None),
+                Transaction.invoice_images != "[]",
+            ),
+        ),
+        ~select(Invoice.id).where(Invoice.transaction_id == Transaction.id).exists(),
+    ]
+    # 回看窗口内的行会被重复扫描，已建发票的由反连接排除
+    if since:
+        conditions.append(Transaction.updated_at >= since)
 
     # 查找有发票数据但未关联的交易
     result = await db.execute(
-        select(Transaction).where(
-            and_(
-                or_(
-                    Transaction.invoice_issued == True,
-                    and_(
-                        Transaction.invoice_images.isnot(None),
-                        Transaction.invoice_images != "[]",
-                    ),
-                ),
-                Transaction.id.notin_(linked_tx_ids) if linked_tx_ids else True,
-            )
-        )
+        select(Transaction).where(and_(*conditions)).order_by(Transaction.updated_at)
     )
     transactions = result.scalars().all()
+    if not transactions:
+        return {"created": 0, "skipped": 0}
+
+    # 获取公司信息
+    company_result = await db.execute(select(CompanyInfo).limit(1))
+    company = company_result.scalar_one_or_none()
+    company_name = company.company_name if company else "知域科技（新安县）有限责任公司"
+    tax_number = company.tax_number if company else "91410323MAK75U412Y"
 
     created = 0
     skipped = 0
+    new_invoices: List[Invoice] = []
 
     for tx in transactions:
-        # 跳过已关联的
-        if tx.id in linked_tx_ids:
-            skipped += 1
-            continue
-
         # 解析发票图片
         images = json.loads(tx.invoice_images) if tx.invoice_images else []
         if not images:
@@ -392,9 +398,23 @@ async def sync_invoices_from_transactions(db: AsyncSession) -> dict:
             status="verified" if tx.invoice_completed else "pending",
         )
         db.add(inv)
+        new_invoices.append(inv)
         created += 1
 
+    # 高水位只在前进时写入，避免无新数据时也产生写事务
+    latest = transactions[-1].updated_at or ""
+    advanced = latest > ((watermark.value or "") if watermark else "")
+    if advanced:
+        if watermark is None:
+            watermark = SyncWatermark(name=SYNC_WATERMARK)
+            db.add(watermark)
+        watermark.value = latest
+    if not new_invoices and not advanced:
+        return {"created": 0, "skipped": skipped}
+
     if created > 0:
-        await db.commit()
+        outbox.record(db, "invoice.synced", {"created": created})
+    await db.commit()
+    await outbox.publish(db)
 
     return {"created": created, "skipped": skipped}
@@ -1,22 +1,72 @@
+import time
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 from app.config import UPLOAD_DIR, settings
-from app.database import Base, async_session, engine
+from app.database import Base, async_session, engine, read_engine
+from app.static import ImmutableStaticFiles
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+async def _sync_schema() -> None:
+    """建表、补列、种子数据与一次性数据迁移（均可重复执行）"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # 交易整数键列（旧库补列并回填）
+        from app.transaction.keys import ensure_columns
+        await ensure_columns(conn)
     # Seed data
     from app.seed import seed
+    from app.reimbursement.service import ensure_batch_items
     async with async_session() as db:
         await seed(db)
+        # 报销单关联表（从 transaction_ids JSON 迁移）
+        await ensure_batch_items(db)
+        # 预算 spent 按分类层级重新汇总（旧库的值按非层级规则累计，之后的增量在此基础上维护）；
+        # 汇总依赖闭包表，先校验
+        from app.budget.service import recompute_spent
+        from app.category.service import ensure_closure
+        await ensure_closure(db)
+        await recompute_spent(db)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    # 库结构哈希与上次启动一致时跳过建表与种子数据
+    from app import schema
+    expected = schema.metadata_hash(engine.dialect)
+    async with engine.connect() as conn:
+        current = settings.STARTUP_SCHEMA_CHECK and await schema.current_stamp(conn) == expected
+    if not current:
+        await _sync_schema()
+        async with engine.begin() as conn:
+            await schema.stamp(conn, expected)
+    # 分类闭包表（新库、种子数据写入或外部修改分类后需重建；仅两次计数，每次启动都校验）
+    from app.category.service import ensure_closure
+    async with async_session() as db:
+        await ensure_closure(db)
+    # 发票检索 FTS 索引与同步触发器（行数不一致时重建；仅两次计数，每次启动都校验）
+    from app.invoice.search import ensure_index
+    async with engine.begin() as conn:
+        await ensure_index(conn)
+    # 已生成的缩略图登记到内存，请求中不再逐个检查文件
+    from starlette.concurrency import run_in_threadpool
+    from app.upload import thumbnails
+    await run_in_threadpool(thumbnails.scan)
+    # 插件事件分发：先按序号投递发件箱中上次未完成的事件，queued 模式再启动中继
+    from app.plugin.dispatch import dispatcher
+    await dispatcher.start(queued=settings.PLUGIN_DISPATCH_MODE == "queued")
+    # 固定支出自动入账（启动即补录一次）
+    from app.recurring_expense import scheduler
+    scheduler.start()
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"Startup finished in {elapsed:.0f} ms ({'schema current' if current else 'schema synced'})")
     yield
+    await scheduler.stop()
+    thumbnails.shutdown()
+    await dispatcher.stop()
 
 
 app = FastAPI(title="小微企业财务记账系统", version="1.0.0", lifespan=lifespan)
@@ -27,19 +77,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 前端可读取 Server-Timing（浏览器开发者工具的 Timing 面板也会显示）
+    expose_headers=["Server-Timing"],
 )
 
+# 请求级 SQL 条数与耗时统计
+if settings.REQUEST_METRICS_ENABLED:
+    from app.metrics.collector import RequestMetricsMiddleware, instrument
+    instrument(engine, read_engine)
+    app.add_middleware(RequestMetricsMiddleware)
+
 # Import models so Base.metadata knows about them
-from app.account import models as _account_models  # noqa: F401, E402
-from app.category import models as _category_models  # noqa: F401, E402
-from app.transaction import models as _transaction_models  # noqa: F401, E402
-from app.invoice import models as _invoice_models  # noqa: F401, E402
-from app.budget import models as _budget_models  # noqa: F401, E402
-from app.recurring_expense import models as _recurring_expense_models  # noqa: F401, E402
-from app.settings import models as _settings_models  # noqa: F401, E402
-from app.reimbursement import models as _reimbursement_models  # noqa: F401, E402
-from app.contact import models as _contact_models  # noqa: F401, E402
-from app.employee import models as _employee_models  # noqa: F401, E402
+from app import models as _models  # noqa: F401, E402
 
 # Register routers
 from app.account.router import router as account_router  # noqa: E402
@@ -55,6 +104,12 @@ from app.reimbursement.router import router as reimbursement_router  # noqa: E40
 from app.contact.router import router as contact_router  # noqa: E402
 from app.employee.router import router as employee_router  # noqa: E402
 from app.dashboard.router import router as dashboard_router  # noqa: E402
+from app.plugin.router import router as plugin_router  # noqa: E402
+from app.metrics.router import router as metrics_router  # noqa: E402
+
+# Register event subscribers
+from app.budget import alerts as _budget_alerts  # noqa: F401, E402
+from app.invoice import auto_sync as _invoice_auto_sync  # noqa: F401, E402
 
 app.include_router(account_router)
 app.include_router(category_router)
@@ -69,9 +124,11 @@ app.include_router(reimbursement_router)
 app.include_router(contact_router)
 app.include_router(employee_router)
 app.include_router(dashboard_router)
+app.include_router(plugin_router)
+app.include_router(metrics_router)
 
-# Serve uploaded files
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+# Serve uploaded files（文件名唯一且内容不变，按不可变资源缓存）
+app.mount("/uploads", ImmutableStaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
 
 
 if __name__ == "__main__":
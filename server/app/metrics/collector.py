@@ -0,0 +1,165 @@
+"""请求级 SQL 统计：每个请求的查询条数、数据库耗时与总耗时
+
+引擎的 before/after_cursor_execute 事件把 SQL 耗时累加到当前请求（contextvars），
+中间件写入 Server-Timing 响应头、按路由汇总直方图（GET /metrics），超出预算时记录警告日志，
+用于发现 N+1 查询。
+"""
+import logging
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 直方图桶上限（含），超出最后一个上限的计入 +Inf 桶
+DURATION_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_ms")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_started", None)
+    stats = _current.get()
+    if stats is None or started is None:
+        return
+    stats.queries += 1
+    stats.db_ms += (time.perf_counter() - started) * 1000
+
+
+def instrument(*engines: AsyncEngine) -> None:
+    """为引擎注册 SQL 计时事件（同一引擎只注册一次）"""
+    for engine in dict.fromkeys(engines):
+        sync_engine = engine.sync_engine
+        if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _histogram(bounds: tuple, counts: list) -> list:
+    labels = list(bounds) + ["+Inf"]
+    return [{"le": le, "count": n} for le, n in zip(labels, counts)]
+
+
+class RequestMetrics:
+    """按 (method, 路由模板) 汇总；直方图为各桶计数（非累计）"""
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], dict] = {}
+
+    def observe(self, method: str, route: str, status: int, total_ms: float, stats: RequestStats) -> None:
+        s = self._routes.get((method, route))
+        if s is None:
+            s = self._routes[(method, route)] = {
+                "count": 0, "errors": 0, "overBudget": 0,
+                "totalMs": 0.0, "maxMs": 0.0, "queries": 0, "maxQueries": 0, "dbMs": 0.0,
+                "durationBuckets": [0] * (len(DURATION_BUCKETS_MS) + 1),
+                "queryBuckets": [0] * (len(QUERY_BUCKETS) + 1),
+            }
+        s["count"] += 1
+        if status >= 500:
+            s["errors"] += 1
+        s["totalMs"] += total_ms
+        s["maxMs"] = max(s["maxMs"], total_ms)
+        s["queries"] += stats.queries
+        s["maxQueries"] = max(s["maxQueries"], stats.queries)
+        s["dbMs"] += stats.db_ms
+        s["durationBuckets"][bisect_left(DURATION_BUCKETS_MS, total_ms)] += 1
+        s["queryBuckets"][bisect_left(QUERY_BUCKETS, stats.queries)] += 1
+
+        if stats.queries > settings.REQUEST_QUERY_BUDGET or total_ms > settings.REQUEST_TIME_BUDGET_MS:
+            s["overBudget"] += 1
+            logger.warning(
+                "request over budget: %s %s queries=%d db=%.1fms total=%.1fms (budget %d queries / %.0fms)",
+                method, route, stats.queries, stats.db_ms, total_ms,
+                settings.REQUEST_QUERY_BUDGET, settings.REQUEST_TIME_BUDGET_MS,
+            )
+
+    def snapshot(self) -> dict:
+        routes = []
+        for (method, route), s in self._routes.items():
+            count = s["count"]
+            routes.append({
+                "method": method,
+                "route": route,
+                "count": count,
+                "errors": s["errors"],
+                "overBudget": s["overBudget"],
+                "avgMs": round(s["totalMs"] / count, 2),
+                "maxMs": round(s["maxMs"], 2),
+                "avgQueries": round(s["queries"] / count, 2),
+                "maxQueries": s["maxQueries"],
+                "avgDbMs": round(s["dbMs"] / count, 2),
+                "durationHistogram": _histogram(DURATION_BUCKETS_MS, s["durationBuckets"]),
+                "queryHistogram": _histogram(QUERY_BUCKETS, s["queryBuckets"]),
+            })
+        # 总耗时高的路由排在前面
+        routes.sort(key=lambda r: r["avgMs"] * r["count"], reverse=True)
+        return {
+            "enabled": settings.REQUEST_METRICS_ENABLED,
+            "queryBudget": settings.REQUEST_QUERY_BUDGET,
+            "timeBudgetMs": settings.REQUEST_TIME_BUDGET_MS,
+            "routes": routes,
+        }
+
+    def reset(self) -> None:
+        self._routes = {}
+
+
+request_metrics = RequestMetrics()
+
+
+class RequestMetricsMiddleware:
+    """ASGI 中间件：统计每个 HTTP 请求，响应头附带 Server-Timing（db 与 app 耗时）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = (time.perf_counter() - started) * 1000
+                MutableHeaders(scope=message).append(
+                    "Server-Timing",
+                    f'db;dur={stats.db_ms:.1f};desc="{stats.queries} queries", app;dur={elapsed:.1f}',
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            # 路由匹配后 FastAPI 把 APIRoute 写入 scope，按路径模板汇总（/transactions/{id}）；静态挂载按挂载路径
+            route = getattr(scope.get("route"), "path", None) or scope.get("root_path") or "unmatched"
+            total_ms = (time.perf_counter() - started) * 1000
+            request_metrics.observe(scope["method"], route, status, total_ms, stats)
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Query
+
+from app.metrics.collector import request_metrics
+from app.metrics.slow_queries import recorder
+from app.response import success
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("")
+async def get_request_metrics():
+    """按路由汇总的请求耗时、SQL 条数与数据库耗时（含直方图）"""
+    return success(request_metrics.snapshot())
+
+
+@router.delete("")
+async def reset_request_metrics():
+    """清空统计（如对比优化前后）"""
+    request_metrics.reset()
+    return success(None)
+
+
+@router.get("/slow-queries")
+async def get_slow_queries(limit: int = Query(50, ge=1, le=500)):
+    """慢查询：按语句形态汇总（含执行计划与全表扫描标记）及最近记录（含参数）"""
+    return success(recorder.snapshot(limit=limit))
+
+
+@router.delete("/slow-queries")
+async def reset_slow_queries():
+    recorder.reset()
+    return success(None)
@@ -0,0 +1,165 @@
+"""慢查询记录：超过阈值的 SQL 连同参数记入环形缓冲，按语句形态汇总
+
+每种语句形态（参数占位符相同、IN 列表长度归一）首次变慢时在同一连接上执行一次
+EXPLAIN QUERY PLAN（PostgreSQL 为 EXPLAIN），标记大表（SLOW_QUERY_SCAN_TABLES）的全表扫描。
+默认关闭（参数可能含业务数据），由 app.database 按 SLOW_QUERY_LOG_ENABLED 注册；查看见 GET /metrics/slow-queries。
+"""
+import hashlib
+import logging
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r"\(\s*(\?|%\(\w+\)s|\$\d+|:\w+)(\s*,\s*(\?|%\(\w+\)s|\$\d+|:\w+))+\s*\)")
+_SPACES = re.compile(r"\s+")
+# SQLite：SCAN transactions / SCAN TABLE transactions（旧版本）；带 USING ... INDEX 的是索引扫描
+_SQLITE_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?!.*USING (?:COVERING )?INDEX)")
+_PG_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+# 只对这些语句取执行计划：PostgreSQL 上 EXPLAIN 出错会中止当前事务
+_EXPLAINABLE = ("select", "insert", "update", "delete", "with")
+_MAX_STATEMENT = 4000
+_MAX_PARAM = 200
+
+
+def statement_shape(statement: str) -> str:
+    """归一化语句：合并空白，IN (?, ?, ...) 视为同一形态"""
+    return _IN_LIST.sub("(?...)", _SPACES.sub(" ", statement).strip())
+
+
+def _format_parameters(parameters, executemany: bool):
+    if executemany and parameters:
+        return {"first": _format_parameters(parameters[0], False), "rows": len(parameters)}
+    if isinstance(parameters, dict):
+        return {k: _format_value(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_format_value(v) for v in parameters]
+    return _format_value(parameters)
+
+
+def _format_value(value):
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    text = str(value)
+    return text if len(text) <= _MAX_PARAM else text[:_MAX_PARAM] + "…"
+
+
+class SlowQueryRecorder:
+    def __init__(self, threshold_ms: float, size: int, scan_tables: List[str]):
+        self.threshold_ms = threshold_ms
+        self.scan_tables = {t.strip().lower() for t in scan_tables if t.strip()}
+        self._recent = deque(maxlen=size)
+        self._shapes: Dict[str, dict] = {}
+
+    def attach(self, *engines: AsyncEngine) -> None:
+        for engine in dict.fromkeys(engines):
+            sync_engine = engine.sync_engine
+            if not event.contains(sync_engine, "before_cursor_execute", self._before_cursor_execute):
+                event.listen(sync_engine, "before_cursor_execute", self._before_cursor_execute)
+                event.listen(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info["slow_query_started"] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("slow_query_started", None)
+        if started is None:
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        if elapsed < self.threshold_ms:
+            return
+        shape = statement_shape(statement)
+        shape_id = hashlib.sha1(shape.encode()).hexdigest()[:12]
+        s = self._shapes.get(shape_id)
+        if s is None:
+            plan_params = parameters[0] if executemany and parameters else parameters
+            plan, error = self._explain(conn, statement, plan_params)
+            full_scans = self._full_scans(conn.dialect.name, plan)
+            s = self._shapes[shape_id] = {
+                "statement": shape[:_MAX_STATEMENT],
+                "count": 0, "totalMs": 0.0, "maxMs": 0.0,
+                "plan": plan, "planError": error, "fullScans": full_scans,
+            }
+            if full_scans:
+                logger.warning("slow query full scan on %s (%.1fms): %s", ", ".join(full_scans), elapsed, shape[:200])
+        s["count"] += 1
+        s["totalMs"] += elapsed
+        s["maxMs"] = max(s["maxMs"], elapsed)
+        self._recent.append({
+            "at": datetime.now(timezone.utc).isoformat(),
+            "shapeId": shape_id,
+            "ms": round(elapsed, 2),
+            "statement": statement[:_MAX_STATEMENT],
+            "parameters": _format_parameters(parameters, executemany),
+            "fullScans": s["fullScans"],
+        })
+
+    @staticmethod
+    def _explain(conn, statement: str, parameters):
+        """在当前连接上取执行计划（绕过 SQLAlchemy 执行，不触发事件）；失败时返回错误信息"""
+        if not statement.lstrip().lower().startswith(_EXPLAINABLE):
+            return [], None
+        prefix = "EXPLAIN " if conn.dialect.name == "postgresql" else "EXPLAIN QUERY PLAN "
+        try:
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute(prefix + statement, parameters or ())
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception as e:
+            return [], str(e)
+        # SQLite 返回 (id, parent, notused, detail)，PostgreSQL 每行一列文本
+        return [str(r[-1]) for r in rows], None
+
+    def _full_scans(self, dialect: str, plan: List[str]) -> List[str]:
+        pattern = _PG_SCAN if dialect == "postgresql" else _SQLITE_SCAN
+        found = []
+        for line in plan:
+            m = pattern.search(line.strip())
+            if m and m.group(1).lower() in self.scan_tables and m.group(1) not in found:
+                found.append(m.group(1))
+        return found
+
+    def snapshot(self, limit: int = 50) -> dict:
+        shapes = [
+            {
+                "shapeId": shape_id,
+                "statement": s["statement"],
+                "count": s["count"],
+                "avgMs": round(s["totalMs"] / s["count"], 2),
+                "maxMs": round(s["maxMs"], 2),
+                "fullScans": s["fullScans"],
+                "plan": s["plan"],
+                "planError": s["planError"],
+            }
+            for shape_id, s in self._shapes.items()
+        ]
+        shapes.sort(key=lambda s: s["avgMs"] * s["count"], reverse=True)
+        return {
+            "enabled": settings.SLOW_QUERY_LOG_ENABLED,
+            "thresholdMs": self.threshold_ms,
+            "scanTables": sorted(self.scan_tables),
+            "shapes": shapes,
+            "recent": list(reversed(self._recent))[:limit],
+        }
+
+    def reset(self) -> None:
+        self._recent.clear()
+        self._shapes = {}
+
+
+recorder = SlowQueryRecorder(
+    threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    size=settings.SLOW_QUERY_LOG_SIZE,
+    scan_tables=settings.SLOW_QUERY_SCAN_TABLES.split(","),
+)
@@ -0,0 +1,16 @@
+"""导入全部模型，使 Base.metadata 包含所有表
+
+命令行工具（迁移、基准脚本、alembic）只需模型时导入本模块，不加载 FastAPI 与各路由。
+"""
+from app.account import models as _account_models  # noqa: F401
+from app.category import models as _category_models  # noqa: F401
+from app.transaction import models as _transaction_models  # noqa: F401
+from app.invoice import models as _invoice_models  # noqa: F401
+from app.budget import models as _budget_models  # noqa: F401
+from app.recurring_expense import models as _recurring_expense_models  # noqa: F401
+from app.settings import models as _settings_models  # noqa: F401
+from app.reimbursement import models as _reimbursement_models  # noqa: F401
+from app.contact import models as _contact_models  # noqa: F401
+from app.employee import models as _employee_models  # noqa: F401
+from app.plugin import models as _plugin_models  # noqa: F401
+from app.sync import models as _sync_models  # noqa: F401
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, List, Set
 
 from fastapi import FastAPI
 
@@ -16,17 +16,34 @@ class PluginRegistry:
     def __init__(self) -> None:
         self._plugins: Dict[str, PluginBase] = {}
         self._subscribers: Dict[str, List[Callable]] = {}
+        self._inline_subscribers: Dict[str, List[Callable]] = {}
+        self._no_replay: Set[Callable] = set()
 
     def register(self, plugin: PluginBase, app: FastAPI) -> None:
         self._plugins[plugin.name] = plugin
         plugin.on_register(app)
 
-    def subscribe(self, event: str, handler: Callable) -> None:
-        self._subscribers.setdefault(event, []).append(handler)
+    def subscribe(self, event: str, handler: Callable, inline: bool = False, replay: bool = True) -> None:
+        """inline=True 的处理器在事件提交后立即同步执行（如缓存失效，需读写一致）；
+        其余处理器由分发器按发件箱序号投递。非幂等的处理器（如增量累加）传 replay=False，回放时跳过"""
+        target = self._inline_subscribers if inline else self._subscribers
+        target.setdefault(event, []).append(handler)
+        if not replay:
+            self._no_replay.add(handler)
+
+    def handlers(self, event: str) -> List[Callable]:
+        return self._subscribers.get(event, [])
+
+    def inline_handlers(self, event: str) -> List[Callable]:
+        return self._inline_subscribers.get(event, [])
+
+    def replayable(self, handler: Callable) -> bool:
+        return handler not in self._no_replay
 
     async def emit(self, event: str, payload: Any = None) -> None:
-        for handler in self._subscribers.get(event, []):
-            await handler(payload)
+        """不依附业务事务的事件；服务层修改数据时应使用 outbox.record + outbox.publish"""
+        from app.plugin import outbox
+        await outbox.emit(event, payload)
 
 
 registry = PluginRegistry()
@@ -0,0 +1,490 @@
+"""插件事件分发：以 event_outbox 为准，按序号投递
+
+事件由 outbox.record 与业务修改在同一事务写入发件箱（id 即序号），提交后 outbox.publish：
+- inline 模式：在请求内按序号依次执行处理器，成功后批量标记 delivered；失败的事件交给
+  后台任务退避重试，同一实体（负载 id）之后的事件暂存在它后面，按先后顺序投递
+- queued 模式：唤醒中继任务，中继按序号分批读取 pending 记录，按负载 id 分区放入
+  有界队列（同一实体的事件进入同一队列，保持先后顺序）；每个分区一个 worker，
+  同一事件的各处理器并发执行、各自限时，成功后批量标记 delivered，失败时 worker
+  原地退避重试（同一分区的后续事件等待，不会越过它）。
+两种模式超过 PLUGIN_MAX_ATTEMPTS 次均标记 failed。队列满时中继等待（背压），等待次数与时长计入指标。
+
+投递按 (序号, 处理器) 记录：部分处理器失败时，已成功的写入 event_deliveries，
+重试（含重启后重投）只执行尚未成功的处理器，非幂等的处理器不会重复执行。
+
+启动时投递所有 pending 记录，提交后、投递前进程崩溃的事件不会丢失（至少一次投递）。
+超过保留期的已投递记录在启动时以及运行中每次标记投递后（至多每 PLUGIN_OUTBOX_PRUNE_INTERVAL 秒一次）清理。
+"""
+import asyncio
+import json
+import logging
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, select, update
+
+from app.config import settings
+from app.database import async_session
+from app.dialect import upsert
+from app.plugin import outbox
+from app.plugin.base import registry
+from app.plugin.models import EventDelivery, EventOutbox
+
+logger = logging.getLogger(__name__)
+
+# (序号, 事件名, 负载, 已尝试次数)
+Item = Tuple[int, str, Any, int]
+
+
+def _handler_name(handler: Callable) -> str:
+    return f"{handler.__module__}.{getattr(handler, '__qualname__', repr(handler))}"
+
+
+def _partition_key(event: str, payload: Any) -> str:
+    if isinstance(payload, dict) and payload.get("id"):
+        return str(payload["id"])
+    return event
+
+
+def _backoff(attempts: int) -> float:
+    return min(2 ** attempts, 60)
+
+
+class EventDispatcher:
+    def __init__(self, workers: int, queue_size: int, handler_timeout: float, max_attempts: int,
+                 batch_size: int, poll_interval: float) -> None:
+        self.workers = workers
+        self.queue_size = queue_size
+        self.handler_timeout = handler_timeout
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.running = False
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._retries: Set[asyncio.Task] = set()
+        # inline 模式：有事件等待重试的实体 → 排在其后的事件
+        self._held: Dict[str, List[Item]] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._cursor = 0
+        self._inflight: Set[int] = set()
+        self._inline_lock: Optional[asyncio.Lock] = None
+        self._pruned_at = 0.0
+        self._pruning = False
+        self._metrics: Dict[str, Any] = {}
+        self._handler_metrics: Dict[str, Dict[str, float]] = {}
+        self._reset_metrics()
+
+    def _reset_metrics(self) -> None:
+        self._metrics = {
+            "published": 0,
+            "delivered": 0,
+            "retried": 0,
+            "failed": 0,
+            "handlerErrors": 0,
+            "handlerTimeouts": 0,
+            "maxQueueDepth": 0,
+            "blockedEnqueues": 0,
+            "blockedMs": 0.0,
+        }
+        self._handler_metrics = {}
+
+    # ---------- 生命周期 ----------
+
+    async def start(self, queued: bool) -> None:
+        """启动：清理过期记录并投递上次遗留的 pending 事件；queued=True 时启动中继与 worker"""
+        self._inline_lock = asyncio.Lock()
+        self._inflight = set()
+        self._held = {}
+        await self._prune()
+        if not queued:
+            await self._drain_inline()
+            return
+        if self.running:
+            return
+        per_queue = max(1, self.queue_size // self.workers)
+        self._queues = [asyncio.Queue(maxsize=per_queue) for _ in range(self.workers)]
+        self._wake = asyncio.Event()
+        self._cursor = 0
+        self._inflight = set()
+        self.running = True
+        self._tasks = [asyncio.create_task(self._worker(q)) for q in self._queues]
+        self._tasks.append(asyncio.create_task(self._relay()))
+        self._wake.set()
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """等待队列排空（最多 timeout 秒）后停止；未投递的仍为 pending，下次启动重投"""
+        if not self.running:
+            # inline 模式只有后台重试任务
+            for task in self._retries:
+                task.cancel()
+            await asyncio.gather(*self._retries, return_exceptions=True)
+            self._retries = set()
+            self._held = {}
+            return
+        self.running = False
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("plugin event queues not drained on shutdown: %d left", sum(q.qsize() for q in self._queues))
+        for task in [*self._tasks, *self._retries]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._retries, return_exceptions=True)
+        self._tasks = []
+        self._retries = set()
+        self._queues = []
+
+    async def _maybe_prune(self) -> None:
+        """距上次清理超过间隔时清理一次（多个 worker 同时到期时只执行一个）"""
+        if self._pruning or time.monotonic() - self._pruned_at < settings.PLUGIN_OUTBOX_PRUNE_INTERVAL:
+            return
+        self._pruning = True
+        try:
+            await self._prune()
+        except Exception:
+            logger.exception("plugin event outbox prune failed")
+        finally:
+            self._pruning = False
+
+    async def _prune(self) -> None:
+        """清理超过保留期的已投递记录"""
+        self._pruned_at = time.monotonic()
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=settings.PLUGIN_OUTBOX_RETENTION_DAYS)).isoformat()
+        async with async_session() as db:
+            await db.execute(
+                delete(EventOutbox).where(EventOutbox.status == "delivered", EventOutbox.delivered_at < cutoff)
+            )
+            # 部分投递记录只在事件仍为 pending 时有用
+            await db.execute(
+                delete(EventDelivery).where(
+                    EventDelivery.event_id.not_in(select(EventOutbox.id).where(EventOutbox.status == "pending"))
+                )
+            )
+            await db.commit()
+
+    # ---------- 发布 ----------
+
+    async def publish(self, items: List[Item]) -> None:
+        """业务事务提交后调用：inline 处理器立即执行，其余按模式同步投递或交给中继"""
+        self._metrics["published"] += len(items)
+        for _, event, payload, _ in items:
+            for handler in registry.inline_handlers(event):
+                try:
+                    await handler(payload)
+                except Exception:
+                    logger.exception("inline plugin handler %s failed", _handler_name(handler))
+        if self.running:
+            self._wake.set()
+            return
+        await self._deliver_inline(items)
+
+    async def _deliver_inline(self, items: List[Item]) -> None:
+        delivered = []
+        for item in items:
+            if item[0] in self._inflight:
+                # 已由后台重试任务接管
+                continue
+            key = _partition_key(item[1], item[2])
+            held = self._held.get(key)
+            if held is not None:
+                # 同一实体有事件在等待重试，排在它后面
+                held.append(item)
+                self._inflight.add(item[0])
+                continue
+            ok, retry = await self._attempt(item, concurrent=False)
+            if ok:
+                delivered.append(item[0])
+            elif retry is not None:
+                self._held[key] = []
+                self._inflight.add(item[0])
+                task = asyncio.create_task(self._retry_inline(key, retry))
+                self._retries.add(task)
+                task.add_done_callback(self._retries.discard)
+        await self._mark_delivered(delivered)
+
+    async def _retry_inline(self, key: str, item: Item) -> None:
+        """inline 模式的后台重试：退避后重投失败的事件，之后按序投递该实体暂存的事件"""
+        retry: Optional[Item] = item
+        try:
+            while True:
+                if retry is not None:
+                    await asyncio.sleep(_backoff(retry[3]))
+                    current = retry
+                else:
+                    backlog = self._held.get(key)
+                    if not backlog:
+                        return
+                    current = backlog.pop(0)
+                ok, retry = await self._attempt(current, concurrent=False)
+                if ok:
+                    await self._mark_delivered([current[0]])
+        except Exception:
+            # 未投递的事件仍为 pending，下次启动重投
+            logger.exception("plugin event retry for %s crashed", key)
+        finally:
+            self._held.pop(key, None)
+
+    async def _drain_inline(self) -> None:
+        lock = self._inline_lock or asyncio.Lock()
+        async with lock:
+            after = 0
+            while True:
+                rows = await self._pending_after(after)
+                if not rows:
+                    break
+                await self._deliver_inline(rows)
+                after = rows[-1][0]
+
+    @staticmethod
+    def _pending_handlers(event: str, done: Optional[Set[str]]) -> List[Callable]:
+        handlers = registry.handlers(event)
+        if not done:
+            return handlers
+        return [h for h in handlers if _handler_name(h) not in done]
+
+    async def _done_handlers(self, row_ids: List[int]) -> Dict[int, Set[str]]:
+        """重试的事件中已成功的处理器"""
+        if not row_ids:
+            return {}
+        async with async_session() as db:
+            rows = (await db.execute(
+                select(EventDelivery.event_id, EventDelivery.handler).where(EventDelivery.event_id.in_(row_ids))
+            )).all()
+        done: Dict[int, Set[str]] = {}
+        for event_id, name in rows:
+            done.setdefault(event_id, set()).add(name)
+        return done
+
+    async def _pending_after(self, after: int) -> List[Item]:
+        async with async_session() as db:
+            rows = (await db.execute(
+                select(EventOutbox.id, EventOutbox.event, EventOutbox.payload, EventOutbox.attempts)
+                .where(EventOutbox.status == "pending", EventOutbox.id > after)
+                .order_by(EventOutbox.id)
+                .limit(self.batch_size)
+            )).all()
+        return [(r[0], r[1], json.loads(r[2]), r[3]) for r in rows]
+
+    # ---------- 中继（queued 模式） ----------
+
+    async def _relay(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                # 兜底轮询时从头扫描：补上序号小于游标、但提交较晚的事件
+                self._cursor = 0
+            self._wake.clear()
+            try:
+                while True:
+                    rows = await self._pending_after(self._cursor)
+                    if not rows:
+                        break
+                    for item in rows:
+                        self._cursor = item[0]
+                        if item[0] in self._inflight:
+                            continue
+                        self._inflight.add(item[0])
+                        await self._put(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("plugin event relay failed")
+
+    async def _put(self, item: Item) -> None:
+        key = _partition_key(item[1], item[2])
+        queue = self._queues[zlib.crc32(key.encode()) % len(self._queues)]
+        if queue.full():
+            self._metrics["blockedEnqueues"] += 1
+            started = time.perf_counter()
+            await queue.put(item)
+            self._metrics["blockedMs"] += (time.perf_counter() - started) * 1000
+        else:
+            queue.put_nowait(item)
+        self._metrics["maxQueueDepth"] = max(self._metrics["maxQueueDepth"], queue.qsize())
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        delivered: List[int] = []
+        while True:
+            item = await queue.get()
+            try:
+                while True:
+                    ok, retry = await self._attempt(item, concurrent=True)
+                    if ok:
+                        delivered.append(item[0])
+                    if retry is None or not self.running:
+                        break
+                    # 原地退避重试：同一分区（同一实体）的后续事件在此等待，保持先后顺序
+                    if delivered:
+                        await self._mark_delivered(delivered)
+                        delivered = []
+                    await asyncio.sleep(_backoff(retry[3]))
+                    item = retry
+                # 队列暂时为空或攒够一批时统一标记
+                if delivered and (queue.empty() or len(delivered) >= self.batch_size):
+                    await self._mark_delivered(delivered)
+                    delivered = []
+            except Exception:
+                logger.exception("plugin event %s#%s delivery crashed", item[1], item[0])
+            finally:
+                queue.task_done()
+
+    async def _attempt(self, item: Item, concurrent: bool) -> Tuple[bool, Optional[Item]]:
+        """投递一次，返回 (是否全部成功, 需要重试时的下一次尝试)
+
+        重试时跳过已成功的处理器；失败时记录已成功的处理器，超过次数标记 failed。
+        concurrent=True 时同一事件的各处理器并发执行。
+        """
+        row_id, event, payload, attempts = item
+        done = (await self._done_handlers([row_id])).get(row_id) if attempts > 0 else None
+        handlers = self._pending_handlers(event, done)
+        if concurrent:
+            results = list(await asyncio.gather(*(self._call(h, payload, row_id) for h in handlers)))
+        else:
+            results = [await self._call(h, payload, row_id) for h in handlers]
+        errors = [e for e in results if e]
+        if not errors:
+            return True, None
+        attempts += 1
+        final = attempts >= self.max_attempts
+        succeeded = [_handler_name(h) for h, e in zip(handlers, results) if not e]
+        await self._mark_failed(row_id, attempts, errors, final, succeeded=succeeded)
+        if final:
+            self._inflight.discard(row_id)
+            return False, None
+        return False, (row_id, event, payload, attempts)
+
+    # ---------- 处理器调用与状态记录 ----------
+
+    async def _call(self, handler: Callable, payload: Any, seq: Optional[int] = None) -> Optional[str]:
+        name = _handler_name(handler)
+        # 处理器内可经 outbox.claim 登记本次投递（gather 中每个调用在各自的任务上下文里）
+        token = outbox.current_delivery.set((seq, name)) if seq is not None else None
+        stats = self._handler_metrics.setdefault(name, {"calls": 0, "errors": 0, "timeouts": 0, "totalMs": 0.0, "maxMs": 0.0})
+        started = time.perf_counter()
+        error = None
+        try:
+            await asyncio.wait_for(handler(payload), self.handler_timeout)
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            self._metrics["handlerTimeouts"] += 1
+            error = f"{name}: timeout after {self.handler_timeout}s"
+        except Exception as e:
+            stats["errors"] += 1
+            self._metrics["handlerErrors"] += 1
+            error = f"{name}: {e!r}"
+            logger.exception("plugin handler %s failed", name)
+        finally:
+            if token is not None:
+                outbox.current_delivery.reset(token)
+        elapsed = (time.perf_counter() - started) * 1000
+        stats["calls"] += 1
+        stats["totalMs"] += elapsed
+        stats["maxMs"] = max(stats["maxMs"], elapsed)
+        return error
+
+    async def _mark_delivered(self, row_ids: List[int]) -> None:
+        if not row_ids:
+            return
+        async with async_session() as db:
+            await db.execute(
+                update(EventOutbox)
+                .where(EventOutbox.id.in_(row_ids))
+                .values(status="delivered", delivered_at=datetime.now(timezone.utc).isoformat(), last_error=None)
+            )
+            await db.commit()
+        self._metrics["delivered"] += len(row_ids)
+        self._inflight.difference_update(row_ids)
+        await self._maybe_prune()
+
+    async def _mark_failed(self, row_id: int, attempts: int, errors: List[str], final: bool,
+                           succeeded: Optional[List[str]] = None) -> None:
+        """记录失败；succeeded 为本次已成功的处理器，重试时跳过"""
+        values = {"attempts": attempts, "last_error": "; ".join(errors)[:500]}
+        if final:
+            values["status"] = "failed"
+            self._metrics["failed"] += 1
+        else:
+            self._metrics["retried"] += 1
+        async with async_session() as db:
+            await db.execute(update(EventOutbox).where(EventOutbox.id == row_id).values(**values))
+            if succeeded and not final:
+                # 已经 claim 过的处理器行已存在
+                await db.execute(
+                    upsert(db, EventDelivery).on_conflict_do_nothing(),
+                    [{"event_id": row_id, "handler": name} for name in succeeded],
+                )
+            await db.commit()
+
+    # ---------- 回放 ----------
+
+    async def replay(self, from_seq: int, event: Optional[str] = None, handler: Optional[str] = None,
+                     limit: int = 1000) -> dict:
+        """把序号 >= from_seq 的事件（不论状态）按序重新交给进程内处理器，用于重建缓存/汇总。
+        handler 为处理器全名（见 metrics），指定时只回放给该处理器；订阅时声明 replay=False 的
+        非幂等处理器（如预算 spent 增量）始终跳过"""
+        async with async_session() as db:
+            stmt = (
+                select(EventOutbox.id, EventOutbox.event, EventOutbox.payload)
+                .where(EventOutbox.id >= from_seq)
+                .order_by(EventOutbox.id)
+                .limit(limit)
+            )
+            if event:
+                stmt = stmt.where(EventOutbox.event == event)
+            rows = (await db.execute(stmt)).all()
+        errors = 0
+        skipped: Set[str] = set()
+        for _, name, payload in rows:
+            data = json.loads(payload)
+            for h in [*registry.inline_handlers(name), *registry.handlers(name)]:
+                h_name = _handler_name(h)
+                if handler and h_name != handler:
+                    continue
+                if not registry.replayable(h):
+                    skipped.add(h_name)
+                    continue
+                if await self._call(h, data):
+                    errors += 1
+        return {
+            "replayed": len(rows),
+            "errors": errors,
+            "skippedHandlers": sorted(skipped),
+            "lastSeq": rows[-1][0] if rows else None,
+        }
+
+    # ---------- 指标 ----------
+
+    def metrics(self) -> dict:
+        handlers = []
+        for name, s in sorted(self._handler_metrics.items()):
+            handlers.append({
+                "handler": name,
+                "calls": int(s["calls"]),
+                "errors": int(s["errors"]),
+                "timeouts": int(s["timeouts"]),
+                "avgMs": round(s["totalMs"] / s["calls"], 2) if s["calls"] else 0.0,
+                "maxMs": round(s["maxMs"], 2),
+            })
+        return {
+            "mode": "queued" if self.running else "inline",
+            "workers": self.workers,
+            "queueSize": self.queue_size,
+            "queueDepth": sum(q.qsize() for q in self._queues),
+            "relayCursor": self._cursor,
+            "heldEntities": len(self._held),
+            **{k: round(v, 2) if isinstance(v, float) else v for k, v in self._metrics.items()},
+            "handlers": handlers,
+        }
+
+
+dispatcher = EventDispatcher(
+    workers=settings.PLUGIN_DISPATCH_WORKERS,
+    queue_size=settings.PLUGIN_QUEUE_SIZE,
+    handler_timeout=settings.PLUGIN_HANDLER_TIMEOUT,
+    max_attempts=settings.PLUGIN_MAX_ATTEMPTS,
+    batch_size=settings.PLUGIN_RELAY_BATCH_SIZE,
+    poll_interval=settings.PLUGIN_RELAY_POLL_INTERVAL,
+)
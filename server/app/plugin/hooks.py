@@ -6,8 +6,17 @@ EVENTS = {
     "transaction.invoice_confirmed",
     "transaction.invoice_skipped",
     "transaction.tax_declared",
+    "transaction.tax_batch_declared",
     "invoice.created",
     "invoice.updated",
     "invoice.deleted",
     "invoice.verified",
+    "invoice.voided",
+    "invoice.synced",
+    "employee.created",
+    "employee.updated",
+    "employee.deleted",
+    "salary.confirmed",
+    "salary.updated",
+    "budget.threshold_crossed",
 }
@@ -0,0 +1,38 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import Index, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class EventOutbox(Base):
+    """插件事件发件箱：与业务修改同一事务写入，id 即事件序号；投递完成后标记，重启时按序重投未完成的事件"""
+    __tablename__ = "event_outbox"
+    __table_args__ = (
+        Index("ix_event_outbox_status", "status"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    event: Mapped[str] = mapped_column(String(50), nullable=False)
+    payload: Mapped[str] = mapped_column(Text, default="null")  # JSON
+    status: Mapped[str] = mapped_column(String(20), default="pending")  # pending | delivered | failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    last_error: Mapped[Optional[str]] = mapped_column(String(500), nullable=True, default=None)
+    created_at: Mapped[str] = mapped_column(
+        String(40), default=lambda: datetime.now(timezone.utc).isoformat()
+    )
+    delivered_at: Mapped[Optional[str]] = mapped_column(String(40), nullable=True, default=None)
+
+
+class EventDelivery(Base):
+    """按处理器的投递记录：事件有处理器失败时，记下已成功的处理器，重试时只重新执行失败的那些；
+    非幂等处理器也通过 outbox.claim 在自己的事务中写入。事件整体投递完成或最终失败后由清理任务删除"""
+    __tablename__ = "event_deliveries"
+
+    event_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    handler: Mapped[str] = mapped_column(String(200), primary_key=True)
+    delivered_at: Mapped[str] = mapped_column(
+        String(40), default=lambda: datetime.now(timezone.utc).isoformat()
+    )
@@ -0,0 +1,92 @@
+"""事务性发件箱：事件与业务修改在同一个数据库事务中写入 event_outbox
+
+用法（服务层）：
+    outbox.record(db, "transaction.created", payload)   # commit 之前
+    await db.commit()
+    await outbox.publish(db)                            # commit 之后，触发投递
+
+提交与投递之间进程崩溃时，事件仍在发件箱中（pending），下次启动时按序号投递；
+订阅方也可通过 /plugins/events 从任意序号开始拉取或回放，增量重建缓存与汇总。
+
+投递至少一次：非幂等的处理器在自己的事务中调用 claim 登记本次投递，
+重复投递（如处理器已提交、标记 delivered 之前进程崩溃）时跳过。
+"""
+import json
+from contextvars import ContextVar
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import inspect as sa_inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import async_session
+from app.plugin.models import EventDelivery, EventOutbox
+
+_INFO_KEY = "outbox"
+# 分发器调用处理器时设置：(事件序号, 处理器全名)
+current_delivery: ContextVar[Optional[Tuple[int, str]]] = ContextVar("outbox_delivery", default=None)
+
+
+def _dumps(payload: Any) -> str:
+    return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def record(db: AsyncSession, event: str, payload: Any = None) -> None:
+    """把事件加入当前会话，随业务修改一起提交（回滚则一起丢弃）"""
+    row = EventOutbox(event=event, payload=_dumps(payload))
+    db.add(row)
+    db.info.setdefault(_INFO_KEY, []).append((row, payload))
+
+
+async def publish(db: AsyncSession) -> None:
+    """commit 之后调用：把本会话已提交的事件交给分发器"""
+    staged = db.info.pop(_INFO_KEY, [])
+    items: List[tuple] = []
+    for row, payload in staged:
+        # 回滚的记录不会持久化，跳过
+        if sa_inspect(row).persistent:
+            items.append((row.id, row.event, payload, 0))
+    if not items:
+        return
+    from app.plugin.dispatch import dispatcher
+    await dispatcher.publish(items)
+
+
+async def claim(db: AsyncSession) -> bool:
+    """在处理器自己的事务中登记本次投递，随其修改一起提交；该处理器已处理过此事件时返回 False。
+    不经分发器调用（inline 处理器、直接调用）时不登记，返回 True"""
+    delivery = current_delivery.get()
+    if delivery is None:
+        return True
+    if await db.get(EventDelivery, delivery):
+        return False
+    db.add(EventDelivery(event_id=delivery[0], handler=delivery[1]))
+    return True
+
+
+async def emit(event: str, payload: Any = None) -> None:
+    """不依附业务事务的事件，单独写入发件箱后投递"""
+    async with async_session() as db:
+        record(db, event, payload)
+        await db.commit()
+        await publish(db)
+
+
+async def read_events(db: AsyncSession, after: int = 0, limit: int = 100, event: Optional[str] = None) -> dict:
+    """按序号读取 after 之后的事件（不论投递状态）；订阅方保存 nextAfter 作为下次拉取的游标"""
+    stmt = select(EventOutbox).where(EventOutbox.id > after).order_by(EventOutbox.id).limit(limit)
+    if event:
+        stmt = stmt.where(EventOutbox.event == event)
+    rows = (await db.execute(stmt)).scalars().all()
+    return {
+        "items": [
+            {
+                "seq": r.id,
+                "event": r.event,
+                "payload": json.loads(r.payload),
+                "status": r.status,
+                "createdAt": r.created_at,
+            }
+            for r in rows
+        ],
+        "nextAfter": rows[-1].id if rows else after,
+    }
@@ -0,0 +1,39 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.deps import get_read_db
+from app.plugin import outbox
+from app.plugin.dispatch import dispatcher
+from app.response import success
+
+router = APIRouter(prefix="/plugins", tags=["plugins"])
+
+
+@router.get("/dispatch/metrics")
+async def dispatch_metrics():
+    """事件分发指标：队列深度、背压等待、各处理器耗时/超时/失败次数"""
+    return success(dispatcher.metrics())
+
+
+@router.get("/events")
+async def list_events(
+    after: int = Query(0, ge=0, description="从该序号之后开始"),
+    limit: int = Query(100, ge=1, le=1000),
+    event: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """按序号拉取发件箱事件，用于外部订阅方增量同步"""
+    return success(await outbox.read_events(db, after=after, limit=limit, event=event))
+
+
+@router.post("/events/replay")
+async def replay_events(
+    fromSeq: int = Query(..., ge=0),
+    event: Optional[str] = Query(None),
+    handler: Optional[str] = Query(None, description="只回放给指定处理器（全名见 /dispatch/metrics）"),
+    limit: int = Query(1000, ge=1, le=10000),
+):
+    """从指定序号起把事件重新交给进程内处理器"""
+    return success(await dispatcher.replay(fromSeq, event=event, handler=handler, limit=limit))
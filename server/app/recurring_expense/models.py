@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime, timezone
 from typing import Optional
 
-from sqlalchemy import Integer, Numeric, String
+from sqlalchemy import Integer, Numeric, String, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.database import Base
@@ -23,10 +23,27 @@ class RecurringExpense(Base):
     duration_months: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     enabled: Mapped[bool] = mapped_column(default=True)
     created_at: Mapped[str] = mapped_column(
-        String(30), default=lambda: datetime.now(timezone.utc).isoformat()
+        String(40), default=lambda: datetime.now(timezone.utc).isoformat()
     )
     updated_at: Mapped[str] = mapped_column(
-        String(30),
+        String(40),
         default=lambda: datetime.now(timezone.utc).isoformat(),
         onupdate=lambda: datetime.now(timezone.utc).isoformat(),
     )
+
+
+class RecurringOccurrence(Base):
+    """固定支出的某一期已生成的流水；(recurring_expense_id, period) 唯一，保证重复运行不会重复入账"""
+    __tablename__ = "recurring_occurrences"
+    __table_args__ = (
+        UniqueConstraint("recurring_expense_id", "period", name="uq_recurring_occurrence_period"),
+    )
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    recurring_expense_id: Mapped[str] = mapped_column(String(36), nullable=False)
+    period: Mapped[str] = mapped_column(String(7), nullable=False)  # YYYY-MM
+    due_date: Mapped[str] = mapped_column(String(30), nullable=False)
+    transaction_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True, default=None)
+    created_at: Mapped[str] = mapped_column(
+        String(40), default=lambda: datetime.now(timezone.utc).isoformat()
+    )
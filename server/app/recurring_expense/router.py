@@ -1,20 +1,32 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.recurring_expense import service
+from app.recurring_expense import scheduler, service
 from app.recurring_expense.schemas import RecurringExpenseCreate, RecurringExpenseUpdate
-from app.deps import get_db
+from app.deps import get_db, get_read_db
 from app.response import error, success
 
 router = APIRouter(prefix="/recurring-expenses", tags=["recurring-expenses"])
 
 
 @router.get("")
-async def list_items(db: AsyncSession = Depends(get_db)):
+async def list_items(db: AsyncSession = Depends(get_read_db)):
     items = await service.get_all(db)
     return success(items)
 
 
+@router.get("/preview")
+async def preview(months: int = Query(3, ge=0, le=24), db: AsyncSession = Depends(get_read_db)):
+    rows = await service.preview(db, months)
+    return success(rows)
+
+
+@router.post("/materialize")
+async def materialize():
+    result = await scheduler.run_once()
+    return success(result)
+
+
 @router.post("")
 async def create_item(data: RecurringExpenseCreate, db: AsyncSession = Depends(get_db)):
     item = await service.create(db, data)
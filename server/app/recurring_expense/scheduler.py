@@ -0,0 +1,51 @@
+"""固定支出自动入账调度：启动时补录停机期间错过的期次，之后按间隔定时运行"""
+import asyncio
+import logging
+from typing import Optional
+
+from app.config import settings
+from app.database import async_session
+from app.recurring_expense import service
+
+logger = logging.getLogger(__name__)
+
+# 定时任务与手动触发共用，避免同一进程内并发生成
+_lock = asyncio.Lock()
+_task: Optional[asyncio.Task] = None
+
+
+async def run_once() -> dict:
+    async with _lock:
+        async with async_session() as db:
+            return await service.materialize_due(db)
+
+
+async def _loop() -> None:
+    while True:
+        try:
+            result = await run_once()
+            if result["created"] or result["skipped"]:
+                logger.info("recurring expenses materialized: %s", result)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("recurring expense materialization failed")
+        await asyncio.sleep(settings.RECURRING_SCHEDULER_INTERVAL)
+
+
+def start() -> None:
+    global _task
+    if settings.RECURRING_SCHEDULER_ENABLED and _task is None:
+        _task = asyncio.create_task(_loop())
+
+
+async def stop() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
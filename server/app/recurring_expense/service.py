@@ -1,13 +1,25 @@
-from datetime import datetime, timezone
-from typing import Optional, List
+import calendar
+import uuid
+from datetime import date, datetime, timezone
+from typing import Optional, List, Tuple
 
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.recurring_expense.models import RecurringExpense
+from app.config import settings
+from app.plugin import outbox
+from app.recurring_expense.models import RecurringExpense, RecurringOccurrence
 from app.recurring_expense.schemas import RecurringExpenseCreate, RecurringExpenseUpdate
 from app.category.models import Category
 from app.account.models import Account
+from app.sync.models import SyncWatermark
+from app.transaction.hooks import txn_payload
+from app.transaction.models import Transaction
+from app.transaction.service import update_balance
+
+
+MATERIALIZE_SINCE_MARKER = "recurring_materialize_since"
 
 
 def _to_dict(item: RecurringExpense, category_name: str = "", account_name: str = "") -> dict:
@@ -116,3 +128,168 @@ async def delete(db: AsyncSession, item_id: str) -> bool:
     await db.delete(item)
     await db.commit()
     return True
+
+
+# ============================================================
+# 固定支出 → 流水 自动入账
+# ============================================================
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    try:
+        return date.fromisoformat(value[:10]) if value else None
+    except ValueError:
+        return None
+
+
+async def materialize_since(db: AsyncSession, today: date, record: bool) -> date:
+    """补录下限：RECURRING_MATERIALIZE_SINCE，未配置时为首次自动入账运行的日期
+
+    首次运行日期记录在 sync_watermarks 中，已有数据的系统启用自动入账后不会把
+    之前手工录入过的期次再生成一遍。record=False 时只读（预演）。
+    """
+    configured = _parse_date(settings.RECURRING_MATERIALIZE_SINCE)
+    if configured:
+        return configured
+    marker = await db.get(SyncWatermark, MATERIALIZE_SINCE_MARKER)
+    since = _parse_date(marker.value) if marker else None
+    if since:
+        return since
+    if record:
+        db.add(SyncWatermark(name=MATERIALIZE_SINCE_MARKER, value=today.isoformat()))
+        await db.commit()
+    return today
+
+
+def schedule(item: RecurringExpense, until: date, since: date) -> List[Tuple[str, str]]:
+    """列出某固定支出截至 until（含）的各期 (period YYYY-MM, 入账日期)
+
+    每月 day_of_month 入账（超出当月天数取月末），受 start_date、end_date、
+    duration_months 约束。早于创建日期或补录下限 since 的期次视为已手工录入，不列出。
+    """
+    start = _parse_date(item.start_date)
+    if not start:
+        return []
+    end = _parse_date(item.end_date)
+    lower = max(d for d in (start, _parse_date(item.created_at), since) if d)
+
+    occurrences = []
+    y, m = start.year, start.month
+    n = 0
+    while not (item.duration_months and n >= item.duration_months):
+        due = date(y, m, min(item.day_of_month, calendar.monthrange(y, m)[1]))
+        if due > until or (end and due > end):
+            break
+        if due >= lower:
+            occurrences.append((f"{y}-{m:02d}", due.isoformat()))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+        n += 1
+    return occurrences
+
+
+async def _materialized_map(db: AsyncSession, item_ids: List[str]) -> dict:
+    if not item_ids:
+        return {}
+    result = await db.execute(
+        select(RecurringOccurrence.recurring_expense_id, RecurringOccurrence.period, RecurringOccurrence.transaction_id)
+        .where(RecurringOccurrence.recurring_expense_id.in_(item_ids))
+    )
+    return {(r[0], r[1]): r[2] for r in result.all()}
+
+
+async def preview(db: AsyncSession, months: int = 3, today: Optional[date] = None) -> List[dict]:
+    """预演：列出未来 months 个月（含尚未补录的过期期次）将生成的流水，不写库"""
+    today = today or date.today()
+    y, m = today.year, today.month + months
+    y, m = y + (m - 1) // 12, (m - 1) % 12 + 1
+    until = date(y, m, min(today.day, calendar.monthrange(y, m)[1]))
+
+    since = await materialize_since(db, today, record=False)
+    result = await db.execute(select(RecurringExpense).where(RecurringExpense.enabled == True))
+    items = list(result.scalars().all())
+    done = await _materialized_map(db, [i.id for i in items])
+
+    rows = []
+    for item in items:
+        for period, due in schedule(item, until, since):
+            key = (item.id, period)
+            rows.append({
+                "recurringExpenseId": item.id,
+                "name": item.name,
+                "period": period,
+                "date": due,
+                "amount": float(item.amount),
+                "categoryId": item.category_id,
+                "accountId": item.account_id,
+                "due": due <= today.isoformat(),
+                "materialized": key in done,
+                "transactionId": done.get(key),
+            })
+    rows.sort(key=lambda r: (r["date"], r["name"]))
+    return rows
+
+
+async def materialize_due(db: AsyncSession, today: Optional[date] = None, batch_size: Optional[int] = None) -> dict:
+    """把到期（含停机期间错过的）各期固定支出生成支出流水
+
+    幂等：已生成的期次记录在 recurring_occurrences 中并有唯一约束，冲突的期次跳过；
+    按批提交，每批提交后发出 transaction.created。未指定账户的使用默认账户。
+    """
+    today = today or date.today()
+    batch_size = batch_size or settings.RECURRING_BATCH_SIZE
+
+    since = await materialize_since(db, today, record=True)
+    result = await db.execute(select(RecurringExpense).where(RecurringExpense.enabled == True))
+    items = list(result.scalars().all())
+    done = await _materialized_map(db, [i.id for i in items])
+    pending = [
+        (item, period, due)
+        for item in items
+        for period, due in schedule(item, today, since)
+        if (item.id, period) not in done
+    ]
+    if not pending:
+        return {"created": 0, "skipped": 0}
+
+    accounts = (await db.execute(select(Account.id, Account.is_default).order_by(Account.created_at))).all()
+    account_ids = {a[0] for a in accounts}
+    default_account_id = next((a[0] for a in accounts if a[1]), accounts[0][0] if accounts else None)
+
+    created = 0
+    skipped = 0
+    for start in range(0, len(pending), batch_size):
+        batch_created = 0
+        for item, period, due in pending[start:start + batch_size]:
+            account_id = item.account_id if item.account_id in account_ids else default_account_id
+            if not account_id:
+                skipped += 1
+                continue
+            # 每期一个 SAVEPOINT：另一个运行实例已生成该期时只放弃这一期，
+            # 不回滚整个会话（回滚会使已加载的 items 过期，后续读取在异步中失败）
+            try:
+                async with db.begin_nested():
+                    txn = Transaction(
+                        id=str(uuid.uuid4()),
+                        type="expense",
+                        amount=float(item.amount),
+                        date=due,
+                        category_id=item.category_id,
+                        account_id=account_id,
+                        description=f"{item.name}（{period}）",
+                        tags="[]",
+                    )
+                    db.add(txn)
+                    db.add(RecurringOccurrence(
+                        recurring_expense_id=item.id,
+                        period=period,
+                        due_date=due,
+                        transaction_id=txn.id,
+                    ))
+                    await update_balance(db, "expense", float(item.amount), account_id, None)
+                    outbox.record(db, "transaction.created", txn_payload(txn))
+            except IntegrityError:
+                skipped += 1
+                continue
+            batch_created += 1
+        await db.commit()
+        created += batch_created
+        await outbox.publish(db)
+    return {"created": created, "skipped": skipped}
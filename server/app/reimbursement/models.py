@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime, timezone
 from typing import Optional
 
-from sqlalchemy import Numeric, String, Text, Index
+from sqlalchemy import Integer, Numeric, String, Text, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.database import Base
@@ -17,7 +17,7 @@ class ReimbursementBatch(Base):
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     batch_no: Mapped[str] = mapped_column(String(20), nullable=False, unique=True)
     employee_name: Mapped[str] = mapped_column(String(100), nullable=False)
-    transaction_ids: Mapped[str] = mapped_column(Text, default="[]")  # JSON array
+    transaction_ids: Mapped[str] = mapped_column(Text, default="[]")  # JSON array，仅作兼容保留，以 reimbursement_batch_items 为准
     total_amount: Mapped[float] = mapped_column(Numeric(12, 2), default=0.0)
     status: Mapped[str] = mapped_column(String(20), default="pending")  # pending | confirmed | paid
     note: Mapped[str] = mapped_column(String(500), default="")
@@ -26,8 +26,28 @@ class ReimbursementBatch(Base):
     fee_transaction_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True, default=None)
     completed_date: Mapped[Optional[str]] = mapped_column(String(30), nullable=True, default=None)
     created_at: Mapped[str] = mapped_column(
-        String(30), default=lambda: datetime.now(timezone.utc).isoformat()
+        String(40), default=lambda: datetime.now(timezone.utc).isoformat()
     )
-    completed_at: Mapped[Optional[str]] = mapped_column(String(30), nullable=True, default=None)
-    paid_at: Mapped[Optional[str]] = mapped_column(String(30), nullable=True, default=None)
+    completed_at: Mapped[Optional[str]] = mapped_column(String(40), nullable=True, default=None)
+    paid_at: Mapped[Optional[str]] = mapped_column(String(40), nullable=True, default=None)
     payment_account_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True, default=None)
+
+
+class ReimbursementBatchItem(Base):
+    """报销单与交易的关联：(batch_id, transaction_id) 为主键，position 保留提交时的顺序"""
+    __tablename__ = "reimbursement_batch_items"
+    __table_args__ = (
+        Index("ix_reimbursement_batch_items_transaction_id", "transaction_id"),
+    )
+
+    batch_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    transaction_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    position: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class ReimbursementBatchSequence(Base):
+    """报销单号的按日序号：day=YYYYMMDD，value=当日已分配的最大序号"""
+    __tablename__ = "reimbursement_batch_sequences"
+
+    day: Mapped[str] = mapped_column(String(8), primary_key=True)
+    value: Mapped[int] = mapped_column(Integer, default=0)
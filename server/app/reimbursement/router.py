@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.deps import get_db
+from app.deps import get_db, get_read_db
 from app.reimbursement import service
 from app.reimbursement.schemas import ReimbursementCreate, ReimbursementComplete, ReimbursementConfirmPayment
 from app.response import error, success
@@ -10,17 +10,17 @@ router = APIRouter(prefix="/reimbursements", tags=["reimbursements"])
 
 
 @router.get("")
-async def list_batches(db: AsyncSession = Depends(get_db)):
+async def list_batches(db: AsyncSession = Depends(get_read_db)):
     return success(await service.get_batches(db))
 
 
 @router.get("/pending/count")
-async def pending_count(db: AsyncSession = Depends(get_db)):
+async def pending_count(db: AsyncSession = Depends(get_read_db)):
     return success(await service.get_pending_count(db))
 
 
 @router.get("/unpaid")
-async def unpaid_completed(db: AsyncSession = Depends(get_db)):
+async def unpaid_completed(db: AsyncSession = Depends(get_read_db)):
     return success(await service.get_unpaid_completed(db))
 
 
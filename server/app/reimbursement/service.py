@@ -3,30 +3,65 @@ import uuid
 from datetime import datetime, timezone
 from typing import Optional
 
-from sqlalchemy import select, func
+from sqlalchemy import Integer, cast, delete, exists, select, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.reimbursement.models import ReimbursementBatch
+from app.dialect import upsert
+from app.plugin import outbox
+from app.reimbursement.models import ReimbursementBatch, ReimbursementBatchItem, ReimbursementBatchSequence
 from app.reimbursement.schemas import ReimbursementCreate, ReimbursementComplete
+from app.transaction.hooks import txn_payload
 from app.transaction.models import Transaction
 from app.account.models import Account
 
 
 async def _load_batch_txns(db: AsyncSession, batch: ReimbursementBatch) -> list:
-    """Load all transactions associated with a batch using a single IN query."""
-    txn_ids = json.loads(batch.transaction_ids)
-    if not txn_ids:
-        return []
-    result = await db.execute(select(Transaction).where(Transaction.id.in_(txn_ids)))
+    """Load all transactions associated with a batch via the link table, in submission order."""
+    result = await db.execute(
+        select(Transaction)
+        .join(ReimbursementBatchItem, ReimbursementBatchItem.transaction_id == Transaction.id)
+        .where(ReimbursementBatchItem.batch_id == batch.id)
+        .order_by(ReimbursementBatchItem.position)
+    )
     return list(result.scalars().all())
 
 
-def _to_dict(batch: ReimbursementBatch) -> dict:
+async def ensure_batch_items(db: AsyncSession) -> None:
+    """启动时迁移：把尚无关联行的报销单的 transaction_ids JSON 数组写入关联表，并清理指向已删除交易的关联行"""
+    orphans = await db.execute(
+        delete(ReimbursementBatchItem).where(
+            ~exists().where(Transaction.id == ReimbursementBatchItem.transaction_id)
+        )
+    )
+    result = await db.execute(
+        select(ReimbursementBatch.id, ReimbursementBatch.transaction_ids)
+        .where(
+            ReimbursementBatch.transaction_ids != "[]",
+            ~exists().where(ReimbursementBatchItem.batch_id == ReimbursementBatch.id),
+        )
+    )
+    rows = result.all()
+    for batch_id, raw in rows:
+        try:
+            txn_ids = list(dict.fromkeys(json.loads(raw or "[]")))
+        except ValueError:
+            continue
+        # 跳过已删除的交易（其关联行已在上面清理，避免重新写回）
+        alive = set((await db.execute(select(Transaction.id).where(Transaction.id.in_(txn_ids)))).scalars().all())
+        db.add_all(
+            ReimbursementBatchItem(batch_id=batch_id, transaction_id=tid, position=i)
+            for i, tid in enumerate(txn_ids) if tid in alive
+        )
+    if rows or orphans.rowcount:
+        await db.commit()
+
+
+def _to_dict(batch: ReimbursementBatch, transaction_ids: list) -> dict:
     return {
         "id": batch.id,
         "batchNo": batch.batch_no,
         "employeeName": batch.employee_name,
-        "transactionIds": json.loads(batch.transaction_ids),
+        "transactionIds": transaction_ids,
         "totalAmount": float(batch.total_amount),
         "status": batch.status,
         "note": batch.note,
@@ -42,22 +77,38 @@ def _to_dict(batch: ReimbursementBatch) -> dict:
 
 
 async def _generate_batch_no(db: AsyncSession) -> str:
+    """从按日序号表原子地取下一个单号（INSERT ... ON CONFLICT DO UPDATE ... RETURNING）
+
+    当日首次分配时以已有单号的最大序号为起点，兼容序号表上线前生成的单号
+    （按数量计会在删除过报销单后与剩余单号冲突）。
+    """
     today = datetime.now(timezone.utc).strftime("%Y%m%d")
     prefix = f"RB-{today}-"
-    result = await db.execute(
-        select(func.count(ReimbursementBatch.id))
+    existing = (
+        select(func.coalesce(func.max(cast(func.substr(ReimbursementBatch.batch_no, len(prefix) + 1), Integer)), 0))
         .where(ReimbursementBatch.batch_no.like(f"{prefix}%"))
+        .scalar_subquery()
     )
-    count = (result.scalar() or 0) + 1
-    return f"{prefix}{count:03d}"
+    stmt = upsert(db, ReimbursementBatchSequence).values(day=today, value=existing + 1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ReimbursementBatchSequence.day],
+        set_={"value": ReimbursementBatchSequence.value + 1},
+    ).returning(ReimbursementBatchSequence.value)
+    seq = (await db.execute(stmt)).scalar_one()
+    return f"{prefix}{seq:03d}"
 
 
 async def create_batch(db: AsyncSession, data: ReimbursementCreate) -> dict:
-    # Validate transactions
+    # Validate transactions：一次 IN 查询载入，内存中校验（重复的 id 只计一次）
+    txn_ids = list(dict.fromkeys(data.transactionIds))
+    found = {}
+    if txn_ids:
+        result = await db.execute(select(Transaction).where(Transaction.id.in_(txn_ids)))
+        found = {t.id: t for t in result.scalars().all()}
     txns = []
     total = 0.0
-    for tid in data.transactionIds:
-        txn = await db.get(Transaction, tid)
+    for tid in txn_ids:
+        txn = found.get(tid)
         if not txn:
             raise ValueError(f"交易 {tid} 不存在")
         if txn.payment_account_type != "personal":
@@ -65,40 +116,66 @@ async def create_batch(db: AsyncSession, data: ReimbursementCreate) -> dict:
         if txn.reimbursement_batch_id:
             raise ValueError(f"交易 {tid} 已关联报销单")
         txns.append(txn)
-        total += txn.amount
+        total += float(txn.amount)
 
     batch_no = await _generate_batch_no(db)
     batch = ReimbursementBatch(
         id=str(uuid.uuid4()),
         batch_no=batch_no,
         employee_name=data.employeeName,
-        transaction_ids=json.dumps(data.transactionIds),
+        transaction_ids=json.dumps(txn_ids),
         total_amount=round(total, 2),
         note=data.note or "",
     )
     db.add(batch)
-
-    for txn in txns:
-        txn.reimbursement_batch_id = batch.id
-        txn.reimbursement_status = "pending"
+    db.add_all(
+        ReimbursementBatchItem(batch_id=batch.id, transaction_id=tid, position=i)
+        for i, tid in enumerate(txn_ids)
+    )
+    await db.flush()
+
+    # 条件更新：只关联仍未被其他报销单占用的交易，防止并发创建时重复关联
+    if txn_ids:
+        linked = await db.execute(
+            update(Transaction)
+            .where(Transaction.id.in_(txn_ids), Transaction.reimbursement_batch_id.is_(None))
+            .values(reimbursement_batch_id=batch.id, reimbursement_status="pending")
+            .execution_options(synchronize_session="fetch")
+        )
+        if linked.rowcount != len(txn_ids):
+            await db.rollback()
+            raise ValueError("部分交易已关联其他报销单，请刷新后重试")
 
     await db.commit()
     await db.refresh(batch)
-    return _to_dict(batch)
+    return _to_dict(batch, txn_ids)
 
 
 async def get_batches(db: AsyncSession) -> list:
+    """两次查询：全部报销单 + 经关联表 JOIN 的全部交易"""
     result = await db.execute(
         select(ReimbursementBatch).order_by(ReimbursementBatch.created_at.desc())
     )
+    batch_list = list(result.scalars().all())
+    if not batch_list:
+        return []
+
+    txn_result = await db.execute(
+        select(ReimbursementBatchItem.batch_id, Transaction.id, Transaction.date, Transaction.description, Transaction.amount)
+        .join(Transaction, Transaction.id == ReimbursementBatchItem.transaction_id)
+        .order_by(ReimbursementBatchItem.batch_id, ReimbursementBatchItem.position)
+    )
+    txns_by_batch: dict = {}
+    for batch_id, tid, date, description, amount in txn_result.all():
+        txns_by_batch.setdefault(batch_id, []).append(
+            {"id": tid, "date": date, "description": description, "amount": float(amount)}
+        )
+
     batches = []
-    for b in result.scalars().all():
-        d = _to_dict(b)
-        txns = await _load_batch_txns(db, b)
-        d["transactions"] = [
-            {"id": t.id, "date": t.date, "description": t.description, "amount": float(t.amount)}
-            for t in txns
-        ]
+    for b in batch_list:
+        txns = txns_by_batch.get(b.id, [])
+        d = _to_dict(b, [t["id"] for t in txns])
+        d["transactions"] = txns
         batches.append(d)
     return batches
 
@@ -118,7 +195,8 @@ async def complete_batch(db: AsyncSession, batch_id: str, data: ReimbursementCom
     batch.actual_amount = data.actualAmount if data.actualAmount is not None else batch.total_amount
     batch.fee = data.fee
 
-    for txn in await _load_batch_txns(db, batch):
+    txns = await _load_batch_txns(db, batch)
+    for txn in txns:
         txn.reimbursement_status = "confirmed"
 
     if data.fee and data.fee > 0:
@@ -142,10 +220,12 @@ async def complete_batch(db: AsyncSession, batch_id: str, data: ReimbursementCom
         account = await db.get(Account, data.feeAccountId)
         if account:
             account.balance -= data.fee
+        outbox.record(db, "transaction.created", txn_payload(fee_txn))
 
     await db.commit()
     await db.refresh(batch)
-    return _to_dict(batch)
+    await outbox.publish(db)
+    return _to_dict(batch, [t.id for t in txns])
 
 
 async def delete_batch(db: AsyncSession, batch_id: str) -> bool:
@@ -155,6 +235,7 @@ async def delete_batch(db: AsyncSession, batch_id: str) -> bool:
     for txn in await _load_batch_txns(db, batch):
         txn.reimbursement_batch_id = None
         txn.reimbursement_status = None
+    await db.execute(delete(ReimbursementBatchItem).where(ReimbursementBatchItem.batch_id == batch.id))
     await db.delete(batch)
     await db.commit()
     return True
@@ -191,7 +272,8 @@ async def confirm_payment(db: AsyncSession, batch_id: str, account_id: Optional[
     batch.payment_account_id = account_id
 
     # 标记关联交易的 payment_confirmed 和 reimbursement_status
-    for txn in await _load_batch_txns(db, batch):
+    txns = await _load_batch_txns(db, batch)
+    for txn in txns:
         txn.payment_confirmed = True
         txn.payment_confirmed_at = now
         txn.reimbursement_status = "paid"
@@ -205,4 +287,4 @@ async def confirm_payment(db: AsyncSession, batch_id: str, account_id: Optional[
 
     await db.commit()
     await db.refresh(batch)
-    return _to_dict(batch)
+    return _to_dict(batch, [t.id for t in txns])
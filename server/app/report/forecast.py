@@ -0,0 +1,179 @@
+"""现金流预测：从当前余额出发，按天推算未来 N 个月各账户的余额
+
+资金变动来源：
+- 固定支出：尚未生成流水的各期（过期未生成的记在今天）
+- 工资：在职员工每月发薪日按基本工资支出，已确认发放的月份跳过
+- 未到账收入 / 未付支出：账面余额已包含这些流水，先从今天的现金中扣回，
+  再在 流水日期 + settle_days 那天（不早于今天）到账/付出
+
+每个账户一条按天的变动数组，事件按「距今天数」直接落到下标上，
+余额由前缀和得到，月汇总按预先算好的月份边界切片。
+"""
+import calendar
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import Literal, Optional
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.account.models import Account
+from app.employee.models import Employee, SalaryRecord
+from app.recurring_expense.models import RecurringExpense, RecurringOccurrence
+from app.recurring_expense.service import materialize_since, schedule
+from app.transaction.models import Transaction
+
+
+def _add_months(d: date, months: int) -> date:
+    y, m = divmod(d.month - 1 + months, 12)
+    y, m = d.year + y, m + 1
+    return date(y, m, min(d.day, calendar.monthrange(y, m)[1]))
+
+
+async def get_forecast(
+    db: AsyncSession,
+    months: int = 6,
+    settle_days: int = 30,
+    granularity: Literal["month", "day"] = "month",
+    today: Optional[date] = None,
+) -> dict:
+    today = today or date.today()
+    end = _add_months(today, months)
+    n_days = (end - today).days + 1
+
+    accounts = (await db.execute(
+        select(Account.id, Account.name, Account.balance, Account.is_default).order_by(Account.created_at)
+    )).all()
+    if not accounts:
+        return {"startDate": today.isoformat(), "endDate": end.isoformat(), "openingBalance": 0.0,
+                "closingBalance": 0.0, "accounts": [], "months": [], "events": []}
+    account_ids = {a[0] for a in accounts}
+    default_account_id = next((a[0] for a in accounts if a[3]), accounts[0][0])
+
+    opening = {a[0]: float(a[2]) for a in accounts}
+    deltas = {a[0]: [0.0] * n_days for a in accounts}
+    events = []
+
+    def add(account_id: Optional[str], when: date, amount: float, source: str, name: str) -> None:
+        if account_id not in account_ids:
+            account_id = default_account_id
+        idx = min(max((when - today).days, 0), n_days - 1)
+        deltas[account_id][idx] += amount
+        events.append({
+            "date": (today + timedelta(days=idx)).isoformat(),
+            "source": source,
+            "name": name,
+            "amount": round(amount, 2),
+            "accountId": account_id,
+        })
+
+    # 固定支出
+    items = (await db.execute(select(RecurringExpense).where(RecurringExpense.enabled == True))).scalars().all()
+    done = set()
+    if items:
+        done = set((await db.execute(
+            select(RecurringOccurrence.recurring_expense_id, RecurringOccurrence.period)
+            .where(RecurringOccurrence.recurring_expense_id.in_([i.id for i in items]))
+        )).all())
+    since = await materialize_since(db, today, record=False)
+    for item in items:
+        for period, due in schedule(item, end, since):
+            if (item.id, period) not in done:
+                add(item.account_id, date.fromisoformat(due), -float(item.amount), "recurring", item.name)
+
+    # 工资（从本月起）
+    employees = (await db.execute(
+        select(Employee.id, Employee.name, Employee.base_salary, Employee.pay_day, Employee.entry_date)
+        .where(Employee.status == "active")
+    )).all()
+    paid = set((await db.execute(
+        select(SalaryRecord.employee_id, SalaryRecord.year, SalaryRecord.month)
+        .where(or_(SalaryRecord.year > today.year,
+                   and_(SalaryRecord.year == today.year, SalaryRecord.month >= today.month)))
+    )).all())
+    month_starts = [_add_months(today.replace(day=1), i) for i in range(months + 1)]
+    for emp_id, name, base_salary, pay_day, entry_date in employees:
+        salary = float(base_salary or 0)
+        if salary <= 0:
+            continue
+        for ms in month_starts:
+            pay_date = ms.replace(day=min(pay_day or 15, calendar.monthrange(ms.year, ms.month)[1]))
+            if pay_date > end or (entry_date and pay_date.isoformat() < entry_date[:10]):
+                continue
+            if (emp_id, ms.year, ms.month) not in paid:
+                add(default_account_id, pay_date, -salary, "salary", name)
+
+    # 未到账收入 / 未付支出
+    open_rows = (await db.execute(
+        select(Transaction.type, Transaction.amount, Transaction.date, Transaction.account_id, Transaction.description)
+        .where(and_(
+            Transaction.payment_confirmed == False,
+            Transaction.type.in_(["income", "expense"]),
+            or_(Transaction.payment_account_type.is_(None), Transaction.payment_account_type != "personal"),
+        ))
+    )).all()
+    for txn_type, amount, txn_date, account_id, description in open_rows:
+        if account_id not in account_ids:
+            continue
+        signed = float(amount) if txn_type == "income" else -float(amount)
+        opening[account_id] -= signed
+        try:
+            settle = date.fromisoformat(txn_date[:10]) + timedelta(days=settle_days)
+        except (TypeError, ValueError):
+            settle = today
+        add(account_id, settle, signed, "receivable" if txn_type == "income" else "payable", description or "")
+
+    # 前缀和得到每日余额
+    balances = {
+        acc_id: list(accumulate(deltas[acc_id], initial=opening[acc_id]))[1:]
+        for acc_id in deltas
+    }
+    total_deltas = [sum(col) for col in zip(*deltas.values())]
+    total_balance = [sum(col) for col in zip(*balances.values())]
+    day_dates = [today + timedelta(days=i) for i in range(n_days)]
+
+    # 月份边界（下标），按切片汇总
+    bounds = [0] + [(ms - today).days for ms in month_starts[1:] if (ms - today).days < n_days] + [n_days]
+    month_rows = []
+    for lo, hi in zip(bounds, bounds[1:]):
+        chunk = total_deltas[lo:hi]
+        bal = total_balance[lo:hi]
+        low = min(range(len(bal)), key=bal.__getitem__)
+        month_rows.append({
+            "month": day_dates[lo].strftime("%Y-%m"),
+            "inflow": round(sum(d for d in chunk if d > 0), 2),
+            "outflow": round(-sum(d for d in chunk if d < 0), 2),
+            "closingBalance": round(bal[-1], 2),
+            "minBalance": round(bal[low], 2),
+            "minBalanceDate": day_dates[lo + low].isoformat(),
+        })
+
+    account_rows = []
+    for acc_id, name, _, _ in accounts:
+        bal = balances[acc_id]
+        low = min(range(n_days), key=bal.__getitem__)
+        account_rows.append({
+            "accountId": acc_id,
+            "accountName": name,
+            "openingBalance": round(opening[acc_id], 2),
+            "closingBalance": round(bal[-1], 2),
+            "minBalance": round(bal[low], 2),
+            "minBalanceDate": day_dates[low].isoformat(),
+        })
+
+    events.sort(key=lambda e: e["date"])
+    data = {
+        "startDate": today.isoformat(),
+        "endDate": end.isoformat(),
+        "openingBalance": round(sum(opening.values()), 2),
+        "closingBalance": round(total_balance[-1], 2),
+        "accounts": account_rows,
+        "months": month_rows,
+        "events": events,
+    }
+    if granularity == "day":
+        data["days"] = [
+            {"date": day_dates[i].isoformat(), "net": round(total_deltas[i], 2), "balance": round(total_balance[i], 2)}
+            for i in range(n_days)
+        ]
+    return data
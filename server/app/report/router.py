@@ -1,13 +1,13 @@
 import os
-from typing import Optional
-from fastapi import APIRouter, Depends, Query
-from fastapi.responses import FileResponse
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.deps import get_db
+from app.deps import get_read_db
 from app.report import service
-from app.report import tax_report
+from app.report import forecast, tax_report
 from app.response import success, error
+from app.static import cached_file_response
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
@@ -16,7 +16,7 @@ router = APIRouter(prefix="/reports", tags=["reports"])
 async def profit_loss(
     startDate: str = Query(...),
     endDate: str = Query(...),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     data = await service.get_profit_loss(db, startDate, endDate)
     return success(data)
@@ -26,20 +26,32 @@ async def profit_loss(
 async def cash_flow(
     startDate: str = Query(...),
     endDate: str = Query(...),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     data = await service.get_cash_flow(db, startDate, endDate)
     return success(data)
 
 
+@router.get("/cash-flow/forecast")
+async def cash_flow_forecast(
+    months: int = Query(6, ge=1, le=24),
+    settleDays: int = Query(30, ge=0, description="未到账收入/未付支出预计在流水日期后多少天结清"),
+    granularity: Literal["month", "day"] = Query("month"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    data = await forecast.get_forecast(db, months, settleDays, granularity)
+    return success(data)
+
+
 @router.get("/category")
 async def category_report(
     startDate: str = Query(...),
     endDate: str = Query(...),
     type: Optional[str] = None,
-    db: AsyncSession = Depends(get_db),
+    rollup: bool = Query(False, description="子分类金额归集到一级分类"),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    data = await service.get_category_report(db, startDate, endDate, type)
+    data = await service.get_category_report(db, startDate, endDate, type, rollup)
     return success(data)
 
 
@@ -47,26 +59,26 @@ async def category_report(
 async def trend_report(
     startDate: str = Query(...),
     endDate: str = Query(...),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     data = await service.get_trend_report(db, startDate, endDate)
     return success(data)
 
 
 @router.get("/receivables")
-async def receivables(db: AsyncSession = Depends(get_db)):
+async def receivables(db: AsyncSession = Depends(get_read_db)):
     data = await service.get_receivables(db)
     return success(data)
 
 
 @router.get("/payables")
-async def payables(db: AsyncSession = Depends(get_db)):
+async def payables(db: AsyncSession = Depends(get_read_db)):
     data = await service.get_payables(db)
     return success(data)
 
 
 @router.get("/aging")
-async def aging(type: Optional[str] = "receivable", db: AsyncSession = Depends(get_db)):
+async def aging(type: Optional[str] = "receivable", db: AsyncSession = Depends(get_read_db)):
     data = await service.get_aging_analysis(db, type or "receivable")
     return success(data)
 
@@ -76,7 +88,7 @@ async def generate_tax_report(
     reportType: str = Query(..., description="monthly 或 yearly"),
     startDate: str = Query(..., description="所属期起 YYYY-MM-DD"),
     endDate: str = Query(..., description="所属期止 YYYY-MM-DD"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """生成报税用 XLS 财务报表"""
     try:
@@ -90,14 +102,15 @@ async def generate_tax_report(
 
 
 @router.get("/tax-report/download")
-async def download_tax_report(filename: str = Query(...)):
-    """下载已生成的报表文件"""
+async def download_tax_report(request: Request, filename: str = Query(...)):
+    """下载已生成的报表文件（文件名含生成时间，生成后不再修改，按不可变资源缓存）"""
     from app.report.tax_report import OUTPUT_DIR
     path = os.path.join(OUTPUT_DIR, filename)
-    if not os.path.exists(path):
+    if os.path.basename(filename) != filename or not os.path.isfile(path):
         return error("文件不存在", code=404)
-    return FileResponse(
+    return cached_file_response(
         path,
+        request.headers,
         media_type="application/vnd.ms-excel",
         filename=filename,
     )
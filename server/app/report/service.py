@@ -3,8 +3,9 @@ from sqlalchemy import select, func, and_, case
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.account.models import Account
-from app.category.models import Category
+from app.category.models import Category, CategoryClosure
 from app.contact.models import Contact
+from app.transaction.keys import day_label, from_cents, month_label, to_day_key
 from app.transaction.models import Transaction
 
 
@@ -30,25 +31,25 @@ async def _batch_account_names(db: AsyncSession, account_ids: set) -> dict:
 
 
 async def get_profit_loss(db: AsyncSession, start_date: str, end_date: str) -> dict:
-    date_filter = and_(Transaction.date >= start_date, Transaction.date <= end_date)
+    date_filter = Transaction.day_key.between(to_day_key(start_date), to_day_key(end_date))
 
     # Total income
     inc_result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount), 0.0))
+        select(func.coalesce(func.sum(Transaction.amount_cents), 0))
         .where(and_(date_filter, Transaction.type == "income"))
     )
-    total_income = float(inc_result.scalar() or 0)
+    total_income = from_cents(inc_result.scalar())
 
     # Total expense
     exp_result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount), 0.0))
+        select(func.coalesce(func.sum(Transaction.amount_cents), 0))
         .where(and_(date_filter, Transaction.type == "expense"))
     )
-    total_expense = float(exp_result.scalar() or 0)
+    total_expense = from_cents(exp_result.scalar())
 
     # Income by category
     inc_by_cat = await db.execute(
-        select(Transaction.category_id, func.sum(Transaction.amount).label("total"))
+        select(Transaction.category_id, func.sum(Transaction.amount_cents).label("total"))
         .where(and_(date_filter, Transaction.type == "income"))
         .group_by(Transaction.category_id)
     )
@@ -56,7 +57,7 @@ async def get_profit_loss(db: AsyncSession, start_date: str, end_date: str) -> d
 
     # Expense by category
     exp_by_cat = await db.execute(
-        select(Transaction.category_id, func.sum(Transaction.amount).label("total"))
+        select(Transaction.category_id, func.sum(Transaction.amount_cents).label("total"))
         .where(and_(date_filter, Transaction.type == "expense"))
         .group_by(Transaction.category_id)
     )
@@ -72,7 +73,7 @@ async def get_profit_loss(db: AsyncSession, start_date: str, end_date: str) -> d
         income_categories.append({
             "categoryId": row[0] or "",
             "categoryName": cat_info.get("name", "未分类"),
-            "amount": float(row[1]),
+            "amount": from_cents(row[1]),
         })
 
     expense_categories = []
@@ -81,7 +82,7 @@ async def get_profit_loss(db: AsyncSession, start_date: str, end_date: str) -> d
         expense_categories.append({
             "categoryId": row[0] or "",
             "categoryName": cat_info.get("name", "未分类"),
-            "amount": float(row[1]),
+            "amount": from_cents(row[1]),
         })
 
     return {
@@ -94,28 +95,28 @@ async def get_profit_loss(db: AsyncSession, start_date: str, end_date: str) -> d
 
 
 async def get_cash_flow(db: AsyncSession, start_date: str, end_date: str) -> dict:
-    date_filter = and_(Transaction.date >= start_date, Transaction.date <= end_date)
+    date_filter = Transaction.day_key.between(to_day_key(start_date), to_day_key(end_date))
 
     # Inflow (income)
     inflow_result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount), 0.0))
+        select(func.coalesce(func.sum(Transaction.amount_cents), 0))
         .where(and_(date_filter, Transaction.type == "income"))
     )
-    inflow = float(inflow_result.scalar() or 0)
+    inflow = from_cents(inflow_result.scalar())
 
     # Outflow (expense)
     outflow_result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount), 0.0))
+        select(func.coalesce(func.sum(Transaction.amount_cents), 0))
         .where(and_(date_filter, Transaction.type == "expense"))
     )
-    outflow = float(outflow_result.scalar() or 0)
+    outflow = from_cents(outflow_result.scalar())
 
     # By account
     by_account_result = await db.execute(
         select(
             Transaction.account_id,
-            func.sum(case((Transaction.type == "income", Transaction.amount), else_=0)).label("inflow"),
-            func.sum(case((Transaction.type == "expense", Transaction.amount), else_=0)).label("outflow"),
+            func.sum(case((Transaction.type == "income", Transaction.amount_cents), else_=0)).label("inflow"),
+            func.sum(case((Transaction.type == "expense", Transaction.amount_cents), else_=0)).label("outflow"),
         )
         .where(date_filter)
         .group_by(Transaction.account_id)
@@ -131,29 +132,29 @@ async def get_cash_flow(db: AsyncSession, start_date: str, end_date: str) -> dic
         by_account.append({
             "accountId": row[0] or "",
             "accountName": acc_map.get(row[0], "未知账户"),
-            "inflow": float(row[1]),
-            "outflow": float(row[2]),
-            "net": float(row[1]) - float(row[2]),
+            "inflow": from_cents(row[1]),
+            "outflow": from_cents(row[2]),
+            "net": from_cents(row[1] - row[2]),
         })
 
     # By month
     by_month_result = await db.execute(
         select(
-            func.substr(Transaction.date, 1, 7).label("month"),
-            func.sum(case((Transaction.type == "income", Transaction.amount), else_=0)).label("inflow"),
-            func.sum(case((Transaction.type == "expense", Transaction.amount), else_=0)).label("outflow"),
+            Transaction.month_key.label("month"),
+            func.sum(case((Transaction.type == "income", Transaction.amount_cents), else_=0)).label("inflow"),
+            func.sum(case((Transaction.type == "expense", Transaction.amount_cents), else_=0)).label("outflow"),
         )
         .where(date_filter)
-        .group_by(func.substr(Transaction.date, 1, 7))
-        .order_by(func.substr(Transaction.date, 1, 7))
+        .group_by(Transaction.month_key)
+        .order_by(Transaction.month_key)
     )
     by_month = []
     for row in by_month_result.all():
         by_month.append({
-            "month": row[0],
-            "inflow": float(row[1]),
-            "outflow": float(row[2]),
-            "net": float(row[1]) - float(row[2]),
+            "month": month_label(row[0]),
+            "inflow": from_cents(row[1]),
+            "outflow": from_cents(row[2]),
+            "net": from_cents(row[1] - row[2]),
         })
 
     return {
@@ -165,17 +166,33 @@ async def get_cash_flow(db: AsyncSession, start_date: str, end_date: str) -> dic
     }
 
 
-async def get_category_report(db: AsyncSession, start_date: str, end_date: str, type_filter: Optional[str] = None) -> dict:
-    date_filter = and_(Transaction.date >= start_date, Transaction.date <= end_date)
+async def get_category_report(db: AsyncSession, start_date: str, end_date: str,
+                              type_filter: Optional[str] = None, rollup: bool = False) -> dict:
+    """分类汇总；rollup=True 时经闭包表把子分类金额归集到一级分类"""
+    date_filter = Transaction.day_key.between(to_day_key(start_date), to_day_key(end_date))
     conditions = [date_filter]
     if type_filter:
         conditions.append(Transaction.type == type_filter)
 
+    if rollup:
+        root_ids = select(Category.id).where(Category.parent_id.is_(None))
+        group_col = func.coalesce(CategoryClosure.ancestor_id, Transaction.category_id)
+        query = select(group_col, func.sum(Transaction.amount_cents).label("total")).outerjoin(
+            CategoryClosure,
+            and_(
+                CategoryClosure.descendant_id == Transaction.category_id,
+                CategoryClosure.ancestor_id.in_(root_ids),
+            ),
+        )
+    else:
+        group_col = Transaction.category_id
+        query = select(group_col, func.sum(Transaction.amount_cents).label("total"))
+
     result = await db.execute(
-        select(Transaction.category_id, func.sum(Transaction.amount).label("total"))
+        query
         .where(and_(*conditions))
-        .group_by(Transaction.category_id)
-        .order_by(func.sum(Transaction.amount).desc())
+        .group_by(group_col)
+        .order_by(func.sum(Transaction.amount_cents).desc())
     )
     rows = result.all()
 
@@ -187,7 +204,7 @@ async def get_category_report(db: AsyncSession, start_date: str, end_date: str,
     grand_total = 0.0
     for row in rows:
         cat_info = cat_map.get(row[0], {})
-        amount = float(row[1])
+        amount = from_cents(row[1])
         grand_total += amount
         categories.append({
             "categoryId": row[0] or "",
@@ -208,25 +225,25 @@ async def get_category_report(db: AsyncSession, start_date: str, end_date: str,
 
 
 async def get_trend_report(db: AsyncSession, start_date: str, end_date: str) -> dict:
-    date_filter = and_(Transaction.date >= start_date, Transaction.date <= end_date)
+    date_filter = Transaction.day_key.between(to_day_key(start_date), to_day_key(end_date))
 
     result = await db.execute(
         select(
-            func.substr(Transaction.date, 1, 7).label("month"),
-            func.sum(case((Transaction.type == "income", Transaction.amount), else_=0)).label("income"),
-            func.sum(case((Transaction.type == "expense", Transaction.amount), else_=0)).label("expense"),
+            Transaction.month_key.label("month"),
+            func.sum(case((Transaction.type == "income", Transaction.amount_cents), else_=0)).label("income"),
+            func.sum(case((Transaction.type == "expense", Transaction.amount_cents), else_=0)).label("expense"),
         )
         .where(date_filter)
-        .group_by(func.substr(Transaction.date, 1, 7))
-        .order_by(func.substr(Transaction.date, 1, 7))
+        .group_by(Transaction.month_key)
+        .order_by(Transaction.month_key)
     )
 
     months = []
     for row in result.all():
-        income = float(row[1])
-        expense = float(row[2])
+        income = from_cents(row[1])
+        expense = from_cents(row[2])
         months.append({
-            "month": row[0],
+            "month": month_label(row[0]),
             "income": income,
             "expense": expense,
             "profit": income - expense,
@@ -240,13 +257,13 @@ async def get_receivables(db: AsyncSession) -> dict:
     result = await db.execute(
         select(
             Transaction.contact_id,
-            func.sum(Transaction.amount).label("total"),
+            func.sum(Transaction.amount_cents).label("total"),
             func.count(Transaction.id).label("count"),
-            func.min(Transaction.date).label("earliest"),
+            func.min(Transaction.day_key).label("earliest"),
         )
         .where(and_(Transaction.type == "income", Transaction.payment_confirmed == False))
         .group_by(Transaction.contact_id)
-        .order_by(func.sum(Transaction.amount).desc())
+        .order_by(func.sum(Transaction.amount_cents).desc())
     )
     rows = result.all()
 
@@ -257,14 +274,14 @@ async def get_receivables(db: AsyncSession) -> dict:
     items = []
     grand_total = 0.0
     for row in rows:
-        amount = float(row[1])
+        amount = from_cents(row[1])
         grand_total += amount
         items.append({
             "contactId": row[0] or "",
             "contactName": contact_map.get(row[0], "未指定客户") if row[0] else "未指定客户",
             "amount": amount,
             "count": row[2],
-            "earliestDate": row[3],
+            "earliestDate": day_label(row[3]),
         })
     return {"items": items, "total": grand_total}
 
@@ -274,13 +291,13 @@ async def get_payables(db: AsyncSession) -> dict:
     result = await db.execute(
         select(
             Transaction.contact_id,
-            func.sum(Transaction.amount).label("total"),
+            func.sum(Transaction.amount_cents).label("total"),
             func.count(Transaction.id).label("count"),
-            func.min(Transaction.date).label("earliest"),
+            func.min(Transaction.day_key).label("earliest"),
         )
         .where(and_(Transaction.type == "expense", Transaction.payment_confirmed == False))
         .group_by(Transaction.contact_id)
-        .order_by(func.sum(Transaction.amount).desc())
+        .order_by(func.sum(Transaction.amount_cents).desc())
     )
     rows = result.all()
 
@@ -291,14 +308,14 @@ async def get_payables(db: AsyncSession) -> dict:
     items = []
     grand_total = 0.0
     for row in rows:
-        amount = float(row[1])
+        amount = from_cents(row[1])
         grand_total += amount
         items.append({
             "contactId": row[0] or "",
             "contactName": contact_map.get(row[0], "未指定供应商") if row[0] else "未指定供应商",
             "amount": amount,
             "count": row[2],
-            "earliestDate": row[3],
+            "earliestDate": day_label(row[3]),
         })
     return {"items": items, "total": grand_total}
 
@@ -314,13 +331,13 @@ async def get_aging_analysis(db: AsyncSession, report_type: str = "receivable")
         conditions = and_(Transaction.type == "expense", Transaction.payment_confirmed == False)
 
     result = await db.execute(
-        select(Transaction.date, Transaction.amount).where(conditions)
+        select(Transaction.day_key, Transaction.amount_cents).where(conditions)
     )
 
     buckets = {"0-30": 0.0, "31-60": 0.0, "61-90": 0.0, "91-120": 0.0, "120+": 0.0}
     for row in result.all():
-        days = (datetime.strptime(now, "%Y-%m-%d") - datetime.strptime(row[0][:10], "%Y-%m-%d")).days
-        amount = float(row[1])
+        days = (datetime.strptime(now, "%Y-%m-%d") - datetime.strptime(day_label(row[0]), "%Y-%m-%d")).days
+        amount = from_cents(row[1])
         if days <= 30:
             buckets["0-30"] += amount
         elif days <= 60:
@@ -7,19 +7,17 @@ import copy
 from datetime import datetime
 from typing import Optional
 
-import xlrd
-import xlwt
-from xlutils.copy import copy as xlcopy
-
 from sqlalchemy import select, func, and_, case
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.account.models import Account
 from app.category.models import Category
+from app.transaction.keys import from_cents, to_day_key
 from app.transaction.models import Transaction
 from app.employee.models import SalaryRecord
 from app.settings.models import CompanyInfo, TaxSettings
 from app.invoice.models import Invoice
+from app.static import GZIP_SUFFIX, precompress
 
 # 模板路径 - 项目根目录
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -108,10 +106,10 @@ async def _get_account_balances(db: AsyncSession) -> dict:
 async def _get_receivables_total(db: AsyncSession) -> float:
     """获取应收账款总额（未到账收入）"""
     result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount), 0.0))
+        select(func.coalesce(func.sum(Transaction.amount_cents), 0))
         .where(and_(Transaction.type == "income", Transaction.payment_confirmed == False))
     )
-    return float(result.scalar() or 0)
+    return from_cents(result.scalar())
 
 
 async def _get_payables_total(db: AsyncSession) -> float:
@@ -127,10 +125,10 @@ async def _get_payables_total(db: AsyncSession) -> float:
         conditions.append(Transaction.category_id.not_in(cat_ids))
 
     result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount), 0.0))
+        select(func.coalesce(func.sum(Transaction.amount_cents), 0))
         .where(and_(*conditions))
     )
-    return float(result.scalar() or 0)
+    return from_cents(result.scalar())
 
 
 async def _get_unpaid_salary(db: AsyncSession, year: int, month: int) -> float:
@@ -152,14 +150,14 @@ async def _get_unpaid_salary(db: AsyncSession, year: int, month: int) -> float:
     r2 = await db.execute(
         select(
             func.coalesce(func.sum(SalaryRecord.net_salary), 0.0),
-            func.coalesce(func.sum(Transaction.amount), 0.0),
+            func.coalesce(func.sum(Transaction.amount_cents), 0),
         )
         .select_from(SalaryRecord)
         .join(Transaction, SalaryRecord.transaction_id == Transaction.id)
         .where(and_(date_filter, SalaryRecord.transaction_id != None))
     )
     row = r2.one()
-    underpaid = max(float(row[0]) - float(row[1]), 0)
+    underpaid = max(float(row[0]) - from_cents(row[1]), 0)
 
     # 3. 员工垫付待报销款项（未付款的工资类交易，排除工资发放关联的）
     salary_cat_ids = await db.execute(
@@ -170,7 +168,7 @@ async def _get_unpaid_salary(db: AsyncSession, year: int, month: int) -> float:
     employee_reimbursement = 0.0
     if cat_ids:
         r3 = await db.execute(
-            select(func.coalesce(func.sum(Transaction.amount), 0.0))
+            select(func.coalesce(func.sum(Transaction.amount_cents), 0))
             .where(and_(
                 Transaction.type == "expense",
                 Transaction.payment_confirmed == False,
@@ -180,7 +178,7 @@ async def _get_unpaid_salary(db: AsyncSession, year: int, month: int) -> float:
                 ),
             ))
         )
-        employee_reimbursement = float(r3.scalar() or 0)
+        employee_reimbursement = from_cents(r3.scalar())
 
     return fully_unpaid + underpaid + employee_reimbursement
 
@@ -189,16 +187,15 @@ async def _get_income_data(db: AsyncSession, start_date: str, end_date: str, cas
     """获取期间内营业收入。cash_basis=True 时只统计已到账的（payment_confirmed=True）"""
     conditions = [
         Transaction.type == "income",
-        Transaction.date >= start_date,
-        Transaction.date <= end_date,
+        Transaction.day_key.between(to_day_key(start_date), to_day_key(end_date)),
     ]
     if cash_basis:
         conditions.append(Transaction.payment_confirmed == True)
     result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount), 0.0))
+        select(func.coalesce(func.sum(Transaction.amount_cents), 0))
         .where(and_(*conditions))
     )
-    return float(result.scalar() or 0)
+    return from_cents(result.scalar())
 
 
 async def _get_expense_by_category(db: AsyncSession, start_date: str, end_date: str,
@@ -210,8 +207,7 @@ async def _get_expense_by_category(db: AsyncSession, start_date: str, end_date:
     """
     conditions = [
         Transaction.type == "expense",
-        Transaction.date >= start_date,
-        Transaction.date <= end_date,
+        Transaction.day_key.between(to_day_key(start_date), to_day_key(end_date)),
     ]
     if cash_basis:
         conditions.append(Transaction.payment_confirmed == True)
@@ -221,7 +217,7 @@ async def _get_expense_by_category(db: AsyncSession, start_date: str, end_date:
             select(SalaryRecord.transaction_id).where(SalaryRecord.transaction_id != None)
         ))
     result = await db.execute(
-        select(Transaction.category_id, func.sum(Transaction.amount).label("total"))
+        select(Transaction.category_id, func.sum(Transaction.amount_cents).label("total"))
         .where(and_(*conditions))
         .group_by(Transaction.category_id)
     )
@@ -241,7 +237,7 @@ async def _get_expense_by_category(db: AsyncSession, start_date: str, end_date:
         cat_name = cat_map.get(row[0], "未分类")
         expenses.append({
             "category_name": cat_name,
-            "amount": float(row[1]),
+            "amount": from_cents(row[1]),
             "report_item": _classify_expense(cat_name),
         })
 
@@ -279,17 +275,16 @@ async def _get_salary_expense(db: AsyncSession, start_date: str, end_date: str,
 async def _get_salary_cash_paid(db: AsyncSession, start_date: str, end_date: str) -> float:
     """获取期间内实际从账户支付的工资金额（从关联交易中取，确保与账户余额一致）"""
     result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount), 0.0))
+        select(func.coalesce(func.sum(Transaction.amount_cents), 0))
         .where(and_(
             Transaction.id.in_(
                 select(SalaryRecord.transaction_id).where(SalaryRecord.transaction_id != None)
             ),
-            Transaction.date >= start_date,
-            Transaction.date <= end_date,
+            Transaction.day_key.between(to_day_key(start_date), to_day_key(end_date)),
             Transaction.payment_confirmed == True,
         ))
     )
-    return float(result.scalar() or 0)
+    return from_cents(result.scalar())
 
 
 async def _get_salary_tax_cash_paid(db: AsyncSession, start_date: str, end_date: str) -> float:
@@ -300,12 +295,11 @@ async def _get_salary_tax_cash_paid(db: AsyncSession, start_date: str, end_date:
     # 如果个税是在工资交易里一起扣的（未单独建交易），则此处返回 0
     # 只有单独的报税缴纳交易才算现金流出
     result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount), 0.0))
+        select(func.coalesce(func.sum(Transaction.amount_cents), 0))
         .where(and_(
             Transaction.type == "expense",
             Transaction.payment_confirmed == True,
-            Transaction.date >= start_date,
-            Transaction.date <= end_date,
+            Transaction.day_key.between(to_day_key(start_date), to_day_key(end_date)),
             Transaction.description.like("%个税%"),
             # 排除工资关联的交易
             Transaction.id.not_in(
@@ -313,7 +307,7 @@ async def _get_salary_tax_cash_paid(db: AsyncSession, start_date: str, end_date:
             ),
         ))
     )
-    return float(result.scalar() or 0)
+    return from_cents(result.scalar())
 
 
 async def _get_salary_tax(db: AsyncSession, start_date: str, end_date: str, cash_basis: bool = False) -> float:
@@ -404,6 +398,8 @@ def _aggregate_expenses(expenses: list) -> dict:
 # ============================================================
 def _get_cell_style(rb, sheet_idx, row, col):
     """从 xlrd 工作簿中提取单元格样式，转为 xlwt XFStyle 以保留模板格式"""
+    import xlwt
+
     rdsheet = rb.sheet_by_index(sheet_idx)
     xf_idx = rdsheet.cell_xf_index(row, col)
     xf = rb.xf_list[xf_idx]
@@ -732,7 +728,10 @@ async def generate_tax_report(
     if not os.path.exists(template_path):
         raise FileNotFoundError(f"模板文件不存在: {template_path}")
 
-    # 读取模板
+    # 读取模板（xlrd / xlwt / xlutils 仅生成报表时加载，不拖慢服务启动）
+    import xlrd
+    from xlutils.copy import copy as xlcopy
+
     rb = xlrd.open_workbook(template_path, formatting_info=True)
     wb = xlcopy(rb)
 
@@ -838,6 +837,7 @@ async def generate_tax_report(
     filename = f"财务报表_{type_label}_{start_date}至{end_date}_{datetime.now().strftime('%Y%m%d%H%M%S')}.xls"
     output_path = os.path.join(OUTPUT_DIR, filename)
     wb.save(output_path)
+    precompress(output_path)
 
     return output_path
 
@@ -865,5 +865,7 @@ def delete_report(filename: str) -> bool:
     path = os.path.join(OUTPUT_DIR, filename)
     if os.path.exists(path) and path.endswith(".xls"):
         os.remove(path)
+        if os.path.exists(path + GZIP_SUFFIX):
+            os.remove(path + GZIP_SUFFIX)
         return True
     return False
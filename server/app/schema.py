@@ -0,0 +1,50 @@
+"""库结构版本：模型元数据的哈希记录在 schema_version 表中
+
+启动时哈希一致则跳过 create_all、补列回填与种子数据检查，重启无需反射全部表。
+模型结构变化时哈希自动改变；修改 ensure_* 启动迁移的逻辑时递增 MIGRATION_REVISION。
+"""
+import hashlib
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Dialect
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.database import Base
+
+MIGRATION_REVISION = 2  # 2: 升级时按分类层级重算预算 spent
+_NAME = "app"
+
+
+def metadata_hash(dialect: Dialect) -> str:
+    """按当前方言编译全部建表与建索引语句后取哈希"""
+    digest = hashlib.sha256(f"migrations:{MIGRATION_REVISION}".encode())
+    for table in Base.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    return digest.hexdigest()
+
+
+async def current_stamp(conn: AsyncConnection) -> Optional[str]:
+    has_table = await conn.run_sync(lambda c: inspect(c).has_table("schema_version"))
+    if not has_table:
+        return None
+    return (await conn.execute(
+        text("SELECT hash FROM schema_version WHERE name = :name"), {"name": _NAME}
+    )).scalar()
+
+
+async def stamp(conn: AsyncConnection, value: str) -> None:
+    """启动迁移全部完成后写入，中途失败时下次启动会重新执行"""
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version "
+        "(name VARCHAR(50) PRIMARY KEY, hash VARCHAR(64) NOT NULL, updated_at VARCHAR(40) NOT NULL)"
+    ))
+    await conn.execute(text("DELETE FROM schema_version WHERE name = :name"), {"name": _NAME})
+    await conn.execute(
+        text("INSERT INTO schema_version (name, hash, updated_at) VALUES (:name, :hash, :at)"),
+        {"name": _NAME, "hash": value, "at": datetime.now(timezone.utc).isoformat()},
+    )
@@ -0,0 +1,105 @@
+"""不可变文件的静态服务：上传文件（按内容命名）与生成后不再修改的报表
+
+- 强 ETag + 长期 immutable 缓存，浏览器重复访问不再下载
+- 由原文件派生、可能重新生成的文件（缩略图）不标记 immutable，每次按 ETag 协商
+- 支持 Range（PDF 分段加载）
+- 客户端接受 gzip 时直接发送预压缩的 .gz 副本（Range 请求始终发原文件）
+"""
+import gzip
+import mimetypes
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from app.upload.thumbnails import is_thumbnail
+
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+DERIVED_CACHE_CONTROL = "private, no-cache"
+COMPRESSIBLE_EXTENSIONS = {".txt", ".csv", ".xls", ".doc", ".pdf"}
+GZIP_SUFFIX = ".gz"
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def precompress(path: Path) -> None:
+    """为可压缩的文件生成 .gz 副本（压缩后小于原文件 90% 才保留）"""
+    path = Path(path)
+    if path.suffix.lower() not in COMPRESSIBLE_EXTENSIONS:
+        return
+    gz_path = path.with_name(path.name + GZIP_SUFFIX)
+    tmp = gz_path.with_name(gz_path.name + ".tmp")
+    with open(path, "rb") as src, gzip.open(tmp, "wb", compresslevel=9) as dst:
+        shutil.copyfileobj(src, dst)
+    if tmp.stat().st_size < path.stat().st_size * 0.9:
+        os.replace(tmp, gz_path)
+    else:
+        tmp.unlink(missing_ok=True)
+
+
+def _etag(path: Path, stat_result: os.stat_result) -> str:
+    # 按内容寻址的文件名本身就是内容哈希（含扩展名，区分同一哈希的原文件与其他文件）；
+    # 派生文件内容随生成参数变化，按大小与修改时间
+    stem = path.name.split(".", 1)[0]
+    if _SHA256_RE.match(stem) and not is_thumbnail(path.name):
+        return f'"{path.name}"'
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+def _not_modified(etag: str, request_headers: Headers) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+
+
+def cached_file_response(
+    path: Path,
+    request_headers: Headers,
+    stat_result: Optional[os.stat_result] = None,
+    media_type: Optional[str] = None,
+    filename: Optional[str] = None,
+) -> Response:
+    path = Path(path)
+    stat_result = stat_result or path.stat()
+    etag = _etag(path, stat_result)
+    headers = {
+        "cache-control": DERIVED_CACHE_CONTROL if is_thumbnail(path.name) else CACHE_CONTROL,
+        "vary": "Accept-Encoding",
+    }
+
+    gz_path = path.with_name(path.name + GZIP_SUFFIX)
+    use_gzip = (
+        "range" not in request_headers
+        and "gzip" in request_headers.get("accept-encoding", "")
+        and gz_path.is_file()
+    )
+    if use_gzip:
+        etag = etag[:-1] + '-gz"'
+        headers["content-encoding"] = "gzip"
+    headers["etag"] = etag
+
+    if _not_modified(etag, request_headers):
+        return NotModifiedResponse(Headers(headers))
+
+    if media_type is None:
+        # 按原文件扩展名确定类型，避免 .gz 副本被识别为 application/gzip
+        media_type = mimetypes.guess_type(filename or path.name)[0] or "application/octet-stream"
+    if use_gzip:
+        return FileResponse(gz_path, headers=headers, media_type=media_type, filename=filename)
+    return FileResponse(path, headers=headers, media_type=media_type, filename=filename, stat_result=stat_result)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles，文件响应换成 cached_file_response"""
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        if status_code != 200:
+            return super().file_response(full_path, stat_result, scope, status_code)
+        return cached_file_response(Path(full_path), Headers(scope=scope), stat_result)
@@ -0,0 +1,19 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class SyncWatermark(Base):
+    """同步/补录任务的进度标记：如发票同步已处理到的流水 updated_at、固定支出的补录起始日期"""
+    __tablename__ = "sync_watermarks"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    value: Mapped[str] = mapped_column(String(40), default="")
+    updated_at: Mapped[str] = mapped_column(
+        String(40),
+        default=lambda: datetime.now(timezone.utc).isoformat(),
+        onupdate=lambda: datetime.now(timezone.utc).isoformat(),
+    )
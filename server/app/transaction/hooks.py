@@ -14,3 +14,16 @@ TRANSACTION_EVENTS = [
 
 def subscribe(event: str, handler):
     registry.subscribe(event, handler)
+
+
+def txn_payload(txn) -> dict:
+    """事件负载中的交易快照：订阅方（如预算告警）据此计算增量，无需回查数据库"""
+    return {
+        "id": txn.id,
+        "type": txn.type,
+        "amount": float(txn.amount),
+        "date": txn.date,
+        "categoryId": txn.category_id,
+        "accountId": txn.account_id,
+        "toAccountId": txn.to_account_id,
+    }
@@ -0,0 +1,86 @@
+"""交易的整数键：day_key（YYYYMMDD）、month_key（YYYYMM）、amount_cents（金额，分）
+
+Transaction 在赋值 date / amount 时同步维护这三列（见 models 中的 validates）。
+报表的日期范围过滤、按月分组与求和都走整数列：比较与求和精确，且无需 substr / float 转换。
+"""
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Optional
+
+from sqlalchemy import Integer, cast, func, inspect, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+_CENT = Decimal("0.01")
+
+KEY_COLUMNS = ("day_key", "month_key", "amount_cents")
+KEY_INDEXES = {
+    "ix_transactions_day_key": "transactions(day_key)",
+    "ix_transactions_type_day": "transactions(type, day_key, amount_cents)",
+    "ix_transactions_category_day": "transactions(category_id, day_key)",
+}
+
+
+def to_day_key(date: Optional[str]) -> int:
+    """'2026-03-01'（可带时间）→ 20260301；无法解析时为 0"""
+    digits = (date or "")[:10].replace("-", "")
+    return int(digits) if len(digits) == 8 and digits.isdigit() else 0
+
+
+def day_key_expr(column):
+    """SQL 中把日期字符串列转为 day_key，用于与其他表的日期列比较（如预算期间）"""
+    return cast(func.replace(func.substr(column, 1, 10), "-", ""), Integer)
+
+
+def to_month_key(date: Optional[str]) -> int:
+    return to_day_key(date) // 100
+
+
+def day_label(day_key: Optional[int]) -> str:
+    if not day_key:
+        return ""
+    return f"{day_key // 10000:04d}-{day_key // 100 % 100:02d}-{day_key % 100:02d}"
+
+
+def month_label(month_key: Optional[int]) -> str:
+    if not month_key:
+        return ""
+    return f"{month_key // 100:04d}-{month_key % 100:02d}"
+
+
+def to_cents(amount) -> int:
+    if amount is None:
+        return 0
+    return int((Decimal(str(amount)).quantize(_CENT, rounding=ROUND_HALF_UP) * 100))
+
+
+def from_cents(cents) -> float:
+    return int(cents or 0) / 100
+
+
+async def ensure_columns(conn: AsyncConnection, batch_size: int = 1000) -> None:
+    """启动时迁移：为旧库补充整数键列与索引，并回填尚未计算的行（day_key = 0）"""
+    existing = await conn.run_sync(lambda c: {col["name"] for col in inspect(c).get_columns("transactions")})
+    for name in KEY_COLUMNS:
+        if name not in existing:
+            await conn.execute(text(f"ALTER TABLE transactions ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"))
+    for name, target in KEY_INDEXES.items():
+        await conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+
+    while True:
+        rows = (await conn.execute(
+            text("SELECT id, date, amount FROM transactions WHERE day_key = 0 AND date <> '' LIMIT :n"),
+            {"n": batch_size},
+        )).all()
+        params = [
+            {"id": r[0], "d": to_day_key(r[1]), "m": to_month_key(r[1]), "c": to_cents(r[2])}
+            for r in rows
+        ]
+        # 无法解析的日期保持 0，避免死循环
+        params = [p for p in params if p["d"]]
+        if not params:
+            break
+        await conn.execute(
+            text("UPDATE transactions SET day_key = :d, month_key = :m, amount_cents = :c WHERE id = :id"),
+            params,
+        )
+        if len(rows) < batch_size:
+            break
@@ -3,9 +3,10 @@ from datetime import datetime, timezone
 from typing import Optional
 
 from sqlalchemy import Boolean, Integer, Numeric, String, Text, ForeignKey, Index
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import Mapped, mapped_column, validates
 
 from app.database import Base
+from app.transaction.keys import to_cents, to_day_key, to_month_key
 
 
 class Transaction(Base):
@@ -15,17 +16,26 @@ class Transaction(Base):
         Index("ix_transactions_type", "type"),
         Index("ix_transactions_account_id", "account_id"),
         Index("ix_transactions_category_id", "category_id"),
+        Index("ix_transactions_category_date", "category_id", "date"),
         Index("ix_transactions_contact_id", "contact_id"),
         Index("ix_transactions_payment_confirmed", "payment_confirmed"),
         Index("ix_transactions_tax_declared", "tax_declared"),
         Index("ix_transactions_invoice_pending", "invoice_needed", "invoice_completed"),
         Index("ix_transactions_reimbursement_batch_id", "reimbursement_batch_id"),
+        Index("ix_transactions_day_key", "day_key"),
+        # 覆盖索引：按类型 + 日期范围求和只读索引
+        Index("ix_transactions_type_day", "type", "day_key", "amount_cents"),
+        Index("ix_transactions_category_day", "category_id", "day_key"),
     )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     type: Mapped[str] = mapped_column(String(20), nullable=False)  # income | expense | transfer
     amount: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False)
     date: Mapped[str] = mapped_column(String(30), nullable=False)
+    # 由 date / amount 派生的整数键（见 app.transaction.keys）
+    day_key: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # YYYYMMDD
+    month_key: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # YYYYMM
+    amount_cents: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     category_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True, default=None)
     account_id: Mapped[str] = mapped_column(String(36), ForeignKey("accounts.id"), nullable=False)
     to_account_id: Mapped[Optional[str]] = mapped_column(String(36), ForeignKey("accounts.id"), nullable=True, default=None)
@@ -38,14 +48,14 @@ class Transaction(Base):
     payment_confirmed: Mapped[bool] = mapped_column(Boolean, default=False)
     payment_account_type: Mapped[Optional[str]] = mapped_column(String(20), nullable=True, default=None)
     payer_name: Mapped[Optional[str]] = mapped_column(String(100), nullable=True, default=None)
-    payment_confirmed_at: Mapped[Optional[str]] = mapped_column(String(30), nullable=True, default=None)
+    payment_confirmed_at: Mapped[Optional[str]] = mapped_column(String(40), nullable=True, default=None)
 
     invoice_needed: Mapped[bool] = mapped_column(Boolean, default=True)
     invoice_completed: Mapped[bool] = mapped_column(Boolean, default=False)
-    invoice_confirmed_at: Mapped[Optional[str]] = mapped_column(String(30), nullable=True, default=None)
+    invoice_confirmed_at: Mapped[Optional[str]] = mapped_column(String(40), nullable=True, default=None)
 
     tax_declared: Mapped[bool] = mapped_column(Boolean, default=False)
-    tax_declared_at: Mapped[Optional[str]] = mapped_column(String(30), nullable=True, default=None)
+    tax_declared_at: Mapped[Optional[str]] = mapped_column(String(40), nullable=True, default=None)
     tax_period: Mapped[Optional[str]] = mapped_column(String(20), nullable=True, default=None)
 
     # Contact
@@ -62,14 +72,25 @@ class Transaction(Base):
     company_account_images: Mapped[str] = mapped_column(Text, default="[]")  # JSON array
 
     created_at: Mapped[str] = mapped_column(
-        String(30), default=lambda: datetime.now(timezone.utc).isoformat()
+        String(40), default=lambda: datetime.now(timezone.utc).isoformat()
     )
     updated_at: Mapped[str] = mapped_column(
-        String(30),
+        String(40),
         default=lambda: datetime.now(timezone.utc).isoformat(),
         onupdate=lambda: datetime.now(timezone.utc).isoformat(),
     )
 
+    @validates("date")
+    def _sync_date_keys(self, key, value):
+        self.day_key = to_day_key(value)
+        self.month_key = to_month_key(value)
+        return value
+
+    @validates("amount")
+    def _sync_amount_cents(self, key, value):
+        self.amount_cents = to_cents(value)
+        return value
+
 
 class Attachment(Base):
     __tablename__ = "attachments"
@@ -2,7 +2,7 @@ from typing import Optional
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.deps import get_db
+from app.deps import get_db, get_read_db
 from app.response import error, success
 from app.transaction import service
 from app.transaction.schemas import (
@@ -18,19 +18,19 @@ router = APIRouter(prefix="/transactions", tags=["transactions"])
 
 
 @router.get("/pending/payments")
-async def pending_payments(db: AsyncSession = Depends(get_db)):
+async def pending_payments(db: AsyncSession = Depends(get_read_db)):
     items = await service.get_pending_payments(db)
     return success(items)
 
 
 @router.get("/pending/invoices")
-async def pending_invoices(db: AsyncSession = Depends(get_db)):
+async def pending_invoices(db: AsyncSession = Depends(get_read_db)):
     items = await service.get_pending_invoices(db)
     return success(items)
 
 
 @router.get("/pending/taxes")
-async def pending_taxes(db: AsyncSession = Depends(get_db)):
+async def pending_taxes(db: AsyncSession = Depends(get_read_db)):
     items = await service.get_pending_taxes(db)
     return success(items)
 
@@ -60,7 +60,7 @@ async def list_transactions(
     keyword: Optional[str] = None,
     amountMin: Optional[float] = None,
     amountMax: Optional[float] = None,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     result = await service.get_transactions(
         db,
@@ -4,15 +4,19 @@ from datetime import datetime, timezone
 from decimal import Decimal
 from typing import Optional, List
 
-from sqlalchemy import select, func, and_
+from sqlalchemy import delete, select, func, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.account.models import Account
 from app.category.models import Category
 from app.contact.models import Contact
-from app.plugin.base import registry
+from app.plugin import outbox
+from app.reimbursement.models import ReimbursementBatchItem
+from app.transaction.hooks import txn_payload
+from app.transaction.keys import to_cents, to_day_key
 from app.transaction.models import Attachment, Transaction
 from app.transaction.schemas import TransactionCreate, TransactionUpdate
+from app.upload.thumbnails import with_thumbnails
 
 
 def _to_dict(txn: Transaction, attachments: Optional[list] = None,
@@ -33,7 +37,7 @@ def _to_dict(txn: Transaction, attachments: Optional[list] = None,
         "contactName": contact_name,
         "description": txn.description,
         "tags": json.loads(txn.tags) if txn.tags else [],
-        "attachments": attachments or [],
+        "attachments": with_thumbnails(attachments or []),
         "invoiceId": txn.invoice_id,
         "bookId": txn.book_id,
         "createdAt": txn.created_at,
@@ -49,9 +53,9 @@ def _to_dict(txn: Transaction, attachments: Optional[list] = None,
         "taxDeclaredAt": txn.tax_declared_at,
         "taxPeriod": txn.tax_period,
         "invoiceIssued": txn.invoice_issued,
-        "invoiceImages": json.loads(txn.invoice_images) if txn.invoice_images else [],
+        "invoiceImages": with_thumbnails(json.loads(txn.invoice_images)) if txn.invoice_images else [],
         "companyAccountDate": txn.company_account_date,
-        "companyAccountImages": json.loads(txn.company_account_images) if txn.company_account_images else [],
+        "companyAccountImages": with_thumbnails(json.loads(txn.company_account_images)) if txn.company_account_images else [],
         "reimbursementBatchId": txn.reimbursement_batch_id,
         "reimbursementStatus": txn.reimbursement_status,
     }
@@ -138,9 +142,10 @@ async def _batch_enrich(db: AsyncSession, txns: List[Transaction]) -> List[dict]
     return items
 
 
-async def _update_balance(db: AsyncSession, txn_type: str, amount: float,
-                          account_id: str, to_account_id: Optional[str],
-                          reverse: bool = False, payment_account_type: Optional[str] = None):
+async def update_balance(db: AsyncSession, txn_type: str, amount: float,
+                         account_id: str, to_account_id: Optional[str],
+                         reverse: bool = False, payment_account_type: Optional[str] = None):
+    """按交易调整账户余额（reverse=True 撤销）；其他模块生成流水时也调用此函数"""
     # 个人代付不影响公司账户余额
     if payment_account_type == "personal":
         return
@@ -184,15 +189,15 @@ async def get_transactions(
     if contact_id:
         conditions.append(Transaction.contact_id == contact_id)
     if date_start:
-        conditions.append(Transaction.date >= date_start)
+        conditions.append(Transaction.day_key >= to_day_key(date_start))
     if date_end:
-        conditions.append(Transaction.date <= date_end)
+        conditions.append(Transaction.day_key <= to_day_key(date_end))
     if keyword:
         conditions.append(Transaction.description.contains(keyword))
     if amount_min is not None:
-        conditions.append(Transaction.amount >= amount_min)
+        conditions.append(Transaction.amount_cents >= to_cents(amount_min))
     if amount_max is not None:
-        conditions.append(Transaction.amount <= amount_max)
+        conditions.append(Transaction.amount_cents <= to_cents(amount_max))
 
     where_clause = and_(*conditions) if conditions else True
 
@@ -229,6 +234,7 @@ async def get_transaction_by_id(db: AsyncSession, txn_id: str) -> Optional[dict]
 
 async def create_transaction(db: AsyncSession, data: TransactionCreate) -> dict:
     txn = Transaction(
+        id=str(uuid.uuid4()),
         type=data.type,
         amount=data.amount,
         date=data.date,
@@ -269,13 +275,14 @@ async def create_transaction(db: AsyncSession, data: TransactionCreate) -> dict:
         att_dicts.append({"id": a.id, "name": a.name, "url": a.url, "type": a.type, "size": a.size})
 
     # Update account balance (personal 代付不扣公司账户)
-    await _update_balance(db, data.type, data.amount, data.accountId, data.toAccountId,
-                          payment_account_type=data.paymentAccountType)
+    await update_balance(db, data.type, data.amount, data.accountId, data.toAccountId,
+                         payment_account_type=data.paymentAccountType)
 
+    outbox.record(db, "transaction.created", txn_payload(txn))
     await db.commit()
     await db.refresh(txn)
 
-    await registry.emit("transaction.created", {"id": txn.id, "type": txn.type})
+    await outbox.publish(db)
 
     return await _enrich(db, txn, att_dicts)
 
@@ -285,9 +292,11 @@ async def update_transaction(db: AsyncSession, txn_id: str, data: TransactionUpd
     if not txn:
         return None
 
+    before = txn_payload(txn)
+
     # Reverse old balance effect
-    await _update_balance(db, txn.type, txn.amount, txn.account_id, txn.to_account_id,
-                          reverse=True, payment_account_type=txn.payment_account_type)
+    await update_balance(db, txn.type, txn.amount, txn.account_id, txn.to_account_id,
+                         reverse=True, payment_account_type=txn.payment_account_type)
 
     update_data = data.model_dump(exclude_unset=True)
     field_map = {
@@ -331,8 +340,8 @@ async def update_transaction(db: AsyncSession, txn_id: str, data: TransactionUpd
     txn.updated_at = datetime.now(timezone.utc).isoformat()
 
     # Apply new balance effect
-    await _update_balance(db, txn.type, txn.amount, txn.account_id, txn.to_account_id,
-                          payment_account_type=txn.payment_account_type)
+    await update_balance(db, txn.type, txn.amount, txn.account_id, txn.to_account_id,
+                         payment_account_type=txn.payment_account_type)
 
     # Update attachments if provided
     if new_attachments is not None:
@@ -354,10 +363,11 @@ async def update_transaction(db: AsyncSession, txn_id: str, data: TransactionUpd
             )
             db.add(a)
 
+    outbox.record(db, "transaction.updated", {"id": txn.id, "before": before, "after": txn_payload(txn)})
     await db.commit()
     await db.refresh(txn)
 
-    await registry.emit("transaction.updated", {"id": txn.id})
+    await outbox.publish(db)
 
     return await _enrich(db, txn)
 
@@ -366,20 +376,24 @@ async def delete_transaction(db: AsyncSession, txn_id: str) -> bool:
     txn = await db.get(Transaction, txn_id)
     if not txn:
         return False
+    snapshot = txn_payload(txn)
 
     # Reverse balance
-    await _update_balance(db, txn.type, txn.amount, txn.account_id, txn.to_account_id,
-                          reverse=True, payment_account_type=txn.payment_account_type)
+    await update_balance(db, txn.type, txn.amount, txn.account_id, txn.to_account_id,
+                         reverse=True, payment_account_type=txn.payment_account_type)
 
     # Delete attachments
     atts = await db.execute(select(Attachment).where(Attachment.transaction_id == txn_id))
     for a in atts.scalars().all():
         await db.delete(a)
+    # 报销单关联行
+    await db.execute(delete(ReimbursementBatchItem).where(ReimbursementBatchItem.transaction_id == txn_id))
 
     await db.delete(txn)
+    outbox.record(db, "transaction.deleted", snapshot)
     await db.commit()
 
-    await registry.emit("transaction.deleted", {"id": txn_id})
+    await outbox.publish(db)
     return True
 
 
@@ -393,9 +407,10 @@ async def confirm_payment(db: AsyncSession, txn_id: str, account_type: str) -> O
     txn.payment_account_type = account_type
     txn.payment_confirmed_at = datetime.now(timezone.utc).isoformat()
     txn.updated_at = datetime.now(timezone.utc).isoformat()
+    outbox.record(db, "transaction.payment_confirmed", {"id": txn_id})
     await db.commit()
     await db.refresh(txn)
-    await registry.emit("transaction.payment_confirmed", {"id": txn_id})
+    await outbox.publish(db)
     return await _enrich(db, txn)
 
 
@@ -408,9 +423,10 @@ async def confirm_invoice(db: AsyncSession, txn_id: str, invoice_id: Optional[st
     if invoice_id:
         txn.invoice_id = invoice_id
     txn.updated_at = datetime.now(timezone.utc).isoformat()
+    outbox.record(db, "transaction.invoice_confirmed", {"id": txn_id})
     await db.commit()
     await db.refresh(txn)
-    await registry.emit("transaction.invoice_confirmed", {"id": txn_id})
+    await outbox.publish(db)
     return await _enrich(db, txn)
 
 
@@ -420,9 +436,10 @@ async def skip_invoice(db: AsyncSession, txn_id: str) -> Optional[dict]:
         return None
     txn.invoice_needed = False
     txn.updated_at = datetime.now(timezone.utc).isoformat()
+    outbox.record(db, "transaction.invoice_skipped", {"id": txn_id})
     await db.commit()
     await db.refresh(txn)
-    await registry.emit("transaction.invoice_skipped", {"id": txn_id})
+    await outbox.publish(db)
     return await _enrich(db, txn)
 
 
@@ -434,9 +451,10 @@ async def confirm_tax(db: AsyncSession, txn_id: str, tax_period: str) -> Optiona
     txn.tax_declared_at = datetime.now(timezone.utc).isoformat()
     txn.tax_period = tax_period
     txn.updated_at = datetime.now(timezone.utc).isoformat()
+    outbox.record(db, "transaction.tax_declared", {"id": txn_id})
     await db.commit()
     await db.refresh(txn)
-    await registry.emit("transaction.tax_declared", {"id": txn_id})
+    await outbox.publish(db)
     return await _enrich(db, txn)
 
 
@@ -482,8 +500,9 @@ async def batch_confirm_tax(db: AsyncSession, tax_period: str) -> dict:
         txn.updated_at = now
         count += 1
     if count > 0:
+        outbox.record(db, "transaction.tax_batch_declared", {"count": count, "period": tax_period})
         await db.commit()
-        await registry.emit("transaction.tax_batch_declared", {"count": count, "period": tax_period})
+        await outbox.publish(db)
     return {"count": count, "taxPeriod": tax_period, "declaredAt": now}
 
 
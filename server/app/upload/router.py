@@ -1,34 +1,134 @@
-import uuid
-from pathlib import Path
+from typing import AsyncIterator, Optional
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.config import UPLOAD_DIR
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from app.deps import get_db
+from app.upload import service, thumbnails
 from app.response import success
 
 router = APIRouter(tags=["upload"])
 
-ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".csv", ".txt", ".zip"}
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
+class UploadSessionCreate(BaseModel):
+    name: str
+    size: int
+    type: Optional[str] = None
+
+
+_UPLOAD_BODY_LIMIT = service.MAX_FILE_SIZE + service.MULTIPART_OVERHEAD
+_TOO_LARGE = f"文件大小超过限制 ({service.MAX_FILE_SIZE // 1024 // 1024}MB)"
+
+
+async def _limited_body(request: Request) -> AsyncIterator[bytes]:
+    """边接收边计数，请求体超过上限立即中止（不等整个请求体落盘）"""
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > _UPLOAD_BODY_LIMIT:
+            raise HTTPException(status_code=400, detail=_TOO_LARGE)
+        yield chunk
+
+
+@router.post(
+    "/upload",
+    openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object", "required": ["file"], "properties": {"file": {"type": "string", "format": "binary"}},
+    }}}}},
+)
+async def upload_file(request: Request):
+    """multipart 字段 file；自行解析请求体，声明或实际大小超限时在接收过程中拒绝"""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > _UPLOAD_BODY_LIMIT:
+        raise HTTPException(status_code=400, detail=_TOO_LARGE)
+    try:
+        form = await MultiPartParser(request.headers, _limited_body(request), max_files=1, max_fields=10).parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+    except HTTPException:
+        raise
+    except Exception:
+        # 与 FastAPI 自动解析请求体时的行为一致：格式错误按 400 返回
+        raise HTTPException(status_code=400, detail="请求体解析失败")
+    try:
+        file = form.get("file")
+        if not isinstance(file, StarletteUploadFile):
+            raise HTTPException(status_code=400, detail="缺少上传文件")
+
+        async def chunks():
+            while chunk := await file.read(service.CHUNK_SIZE):
+                yield chunk
+
+        try:
+            data = await service.save_stream(chunks(), file.filename, file.content_type)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        await form.close()
+    data["thumbUrl"] = thumbnails.thumbnail_url(data["url"])
+    return success(data)
+
+
+# ---------- 分片上传（可续传） ----------
+
+@router.post("/upload/sessions")
+async def create_upload_session(data: UploadSessionCreate):
+    try:
+        session = await service.create_session(data.name, data.size, data.type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return success(session)
+
+
+@router.get("/upload/sessions/{upload_id}")
+async def get_upload_session(upload_id: str):
+    session = await service.get_session(upload_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="上传会话不存在")
+    return success(session)
+
+
+@router.put("/upload/sessions/{upload_id}")
+async def upload_chunk(upload_id: str, request: Request, offset: int = Query(..., ge=0)):
+    """请求体为原始字节，从 offset 处追加"""
+    try:
+        session = await service.append_chunk(upload_id, offset, request.stream())
+    except service.OffsetMismatch as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not session:
+        raise HTTPException(status_code=404, detail="上传会话不存在")
+    return success(session)
+
+
+@router.post("/upload/sessions/{upload_id}/complete")
+async def complete_upload_session(upload_id: str):
+    try:
+        data = await service.complete_session(upload_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not data:
+        raise HTTPException(status_code=404, detail="上传会话不存在")
+    data["thumbUrl"] = thumbnails.thumbnail_url(data["url"])
+    return success(data)
 
-@router.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    ext = Path(file.filename or "file").suffix.lower()
-    if ext not in ALLOWED_EXTENSIONS:
-        raise HTTPException(status_code=400, detail=f"不支持的文件类型: {ext}")
 
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail=f"文件大小超过限制 ({MAX_FILE_SIZE // 1024 // 1024}MB)")
+@router.delete("/upload/sessions/{upload_id}")
+async def abort_upload_session(upload_id: str):
+    if not await service.abort_session(upload_id):
+        raise HTTPException(status_code=404, detail="上传会话不存在")
+    return success(None)
 
-    filename = f"{uuid.uuid4().hex}{ext}"
-    dest = UPLOAD_DIR / filename
-    dest.write_bytes(content)
 
-    return success({
-        "id": filename,
-        "name": file.filename,
-        "url": f"/uploads/{filename}",
-        "type": file.content_type or "",
-        "size": len(content),
-    })
+@router.post("/upload/gc")
+async def collect_garbage(
+    dryRun: bool = Query(False, description="只统计不删除"),
+    db: AsyncSession = Depends(get_db),
+):
+    """清理无引用的上传文件（超过 24 小时且未被任何记录引用）"""
+    result = await service.collect_garbage(db, dry_run=dryRun)
+    return success(result)
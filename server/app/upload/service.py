@@ -0,0 +1,345 @@
+"""上传文件落盘：分块流式写入（文件 IO 在线程池中执行），超限即中止
+
+- save_stream：普通上传，边读边写临时文件，完成后改名
+- 分片上传会话：大文件（如扫描版发票 PDF）按 offset 追加，断线后可查询已接收字节数续传
+- 按内容寻址：文件名为 SHA-256 + 扩展名，相同内容只存一份；
+  collect_garbage 统计各业务表对文件的引用数，清理无引用的文件
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.config import UPLOAD_DIR
+from app.invoice.models import Invoice
+from app.static import GZIP_SUFFIX, precompress
+from app.transaction.models import Attachment, Transaction
+from app.upload.thumbnails import forget as forget_thumbnail, is_thumbnail, thumb_name
+
+ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".csv", ".txt", ".zip"}
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MULTIPART_OVERHEAD = 64 * 1024  # 普通上传请求体中 multipart 边界与字段头的余量
+MAX_CHUNKED_FILE_SIZE = 100 * 1024 * 1024  # 分片上传 100MB
+CHUNK_SIZE = 1024 * 1024  # 1MB
+GC_GRACE_SECONDS = 24 * 3600  # 上传后尚未保存到业务记录的文件，保留期内不清理
+PARTIAL_TTL_SECONDS = 24 * 3600  # 分片上传会话超过该时长未追加视为放弃
+PARTIAL_SWEEP_INTERVAL = 3600  # 秒，创建会话时顺带清理放弃会话的最小间隔
+
+# 未完成的上传放在 /uploads 静态目录之外（同一文件系统，完成后 os.replace 原子改名）
+PARTIAL_DIR = UPLOAD_DIR.parent / "uploads_partial"
+PARTIAL_DIR.mkdir(exist_ok=True)
+
+_UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_session_locks: Dict[str, asyncio.Lock] = {}
+_partial_swept_at: Optional[float] = None
+
+
+class OffsetMismatch(ValueError):
+    """分片 offset 与已接收字节数不一致，客户端应查询后从 received 处续传"""
+
+
+def check_extension(filename: Optional[str]) -> str:
+    ext = Path(filename or "file").suffix.lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise ValueError(f"不支持的文件类型: {ext}")
+    return ext
+
+
+def _too_large(limit: int) -> ValueError:
+    return ValueError(f"文件大小超过限制 ({limit // 1024 // 1024}MB)")
+
+
+def _file_dict(filename: str, name: Optional[str], content_type: Optional[str], size: int, deduplicated: bool) -> dict:
+    # id 每次上传唯一（会被用作附件主键），url 按内容共享
+    return {
+        "id": uuid.uuid4().hex,
+        "name": name,
+        "url": f"/uploads/{filename}",
+        "type": content_type or "",
+        "size": size,
+        "hash": filename.split(".", 1)[0],
+        "deduplicated": deduplicated,
+    }
+
+
+def _write_and_hash(f, hasher, chunk: bytes) -> None:
+    f.write(chunk)
+    if hasher is not None:
+        hasher.update(chunk)
+
+
+async def _write_chunks(f, chunks: AsyncIterator[bytes], limit: int, too_large: ValueError, hasher=None) -> int:
+    """把 chunks 写入已打开的文件（可同时计算哈希），返回写入字节数；累计超过 limit 时立即抛出 too_large"""
+    written = 0
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        written += len(chunk)
+        if written > limit:
+            raise too_large
+        await run_in_threadpool(_write_and_hash, f, hasher, chunk)
+    return written
+
+
+def _hash_file(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _store(tmp: Path, digest: str, ext: str) -> tuple:
+    """把临时文件按内容寻址放入 UPLOAD_DIR；已存在相同内容时丢弃临时文件。返回 (文件名, 是否重复)"""
+    filename = f"{digest}{ext}"
+    dest = UPLOAD_DIR / filename
+    if dest.exists():
+        tmp.unlink(missing_ok=True)
+        os.utime(dest)  # 刷新时间，避免刚被复用的文件落入 GC
+        return filename, True
+    os.replace(tmp, dest)
+    precompress(dest)
+    forget_thumbnail(filename)  # 此前因原文件缺失记为失败的，允许重新生成
+    return filename, False
+
+
+async def save_stream(chunks: AsyncIterator[bytes], name: Optional[str], content_type: Optional[str]) -> dict:
+    ext = check_extension(name)
+    tmp = PARTIAL_DIR / f"{uuid.uuid4().hex}.tmp"
+    hasher = hashlib.sha256()
+    f = await run_in_threadpool(open, tmp, "wb")
+    try:
+        size = await _write_chunks(f, chunks, MAX_FILE_SIZE, _too_large(MAX_FILE_SIZE), hasher)
+    except BaseException:
+        await run_in_threadpool(f.close)
+        tmp.unlink(missing_ok=True)
+        raise
+    await run_in_threadpool(f.close)
+    filename, deduplicated = await run_in_threadpool(_store, tmp, hasher.hexdigest(), ext)
+    return _file_dict(filename, name, content_type, size, deduplicated)
+
+
+# ============================================================
+# 分片上传会话：PARTIAL_DIR/{id}.json 元数据 + {id}.part 已接收内容
+# ============================================================
+def _meta_path(upload_id: str) -> Path:
+    return PARTIAL_DIR / f"{upload_id}.json"
+
+
+def _part_path(upload_id: str) -> Path:
+    return PARTIAL_DIR / f"{upload_id}.part"
+
+
+def _read_meta(upload_id: str) -> Optional[dict]:
+    if not _UPLOAD_ID_RE.match(upload_id):
+        return None
+    try:
+        return json.loads(_meta_path(upload_id).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _status(upload_id: str, meta: dict) -> dict:
+    part = _part_path(upload_id)
+    received = part.stat().st_size if part.exists() else 0
+    return {
+        "uploadId": upload_id,
+        "name": meta["name"],
+        "size": meta["size"],
+        "received": received,
+        "chunkSize": CHUNK_SIZE,
+    }
+
+
+def _sweep_partial(max_age: float) -> set:
+    """删除 PARTIAL_DIR 中超过 max_age 未修改的文件（放弃的会话、残留临时文件），返回涉及的会话 id"""
+    cutoff = time.time() - max_age
+    removed = set()
+    for path in PARTIAL_DIR.iterdir():
+        if path.is_file() and path.stat().st_mtime <= cutoff:
+            path.unlink(missing_ok=True)
+            removed.add(path.stem)
+    return removed
+
+
+async def sweep_partial_sessions(max_age: float = PARTIAL_TTL_SECONDS) -> int:
+    """清理放弃的分片上传会话（含残留临时文件）及其锁，返回清理的数量"""
+    global _partial_swept_at
+    _partial_swept_at = time.monotonic()
+    removed = await run_in_threadpool(_sweep_partial, max_age)
+    for upload_id in removed:
+        lock = _session_locks.get(upload_id)
+        if lock is not None and not lock.locked():
+            _session_locks.pop(upload_id, None)
+    return len(removed)
+
+
+async def create_session(name: str, size: int, content_type: Optional[str]) -> dict:
+    check_extension(name)
+    if size <= 0:
+        raise ValueError("文件大小无效")
+    if size > MAX_CHUNKED_FILE_SIZE:
+        raise _too_large(MAX_CHUNKED_FILE_SIZE)
+    if _partial_swept_at is None or time.monotonic() - _partial_swept_at >= PARTIAL_SWEEP_INTERVAL:
+        await sweep_partial_sessions()
+    upload_id = uuid.uuid4().hex
+    meta = {"name": name, "size": size, "type": content_type or ""}
+
+    def _create() -> None:
+        _part_path(upload_id).touch()
+        _meta_path(upload_id).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+    await run_in_threadpool(_create)
+    return await run_in_threadpool(_status, upload_id, meta)
+
+
+async def get_session(upload_id: str) -> Optional[dict]:
+    meta = await run_in_threadpool(_read_meta, upload_id)
+    return await run_in_threadpool(_status, upload_id, meta) if meta else None
+
+
+async def _session_lock(upload_id: str) -> Optional[asyncio.Lock]:
+    """会话存在时返回其锁（不存在的 id 不建锁）；持锁后仍需重新读取元数据"""
+    if not await run_in_threadpool(_read_meta, upload_id):
+        return None
+    return _session_locks.setdefault(upload_id, asyncio.Lock())
+
+
+async def append_chunk(upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> Optional[dict]:
+    """从 offset 起追加一段；offset 必须等于已接收字节数（续传前先 GET 查询）"""
+    lock = await _session_lock(upload_id)
+    if lock is None:
+        return None
+    async with lock:
+        meta = await run_in_threadpool(_read_meta, upload_id)
+        if not meta:
+            return None
+        part = _part_path(upload_id)
+        received = (await run_in_threadpool(part.stat)).st_size
+        if offset != received:
+            raise OffsetMismatch(f"offset 不匹配，已接收 {received} 字节")
+        f = await run_in_threadpool(open, part, "ab")
+        try:
+            await _write_chunks(f, chunks, meta["size"] - received, ValueError("超出声明的文件大小"))
+        except BaseException:
+            # 丢弃本段已写入的部分，保持 received 停在段首
+            await run_in_threadpool(f.truncate, received)
+            await run_in_threadpool(f.close)
+            raise
+        await run_in_threadpool(f.close)
+        return await run_in_threadpool(_status, upload_id, meta)
+
+
+async def complete_session(upload_id: str) -> Optional[dict]:
+    lock = await _session_lock(upload_id)
+    if lock is None:
+        return None
+    async with lock:
+        meta = await run_in_threadpool(_read_meta, upload_id)
+        if not meta:
+            _session_locks.pop(upload_id, None)
+            return None
+        status = await run_in_threadpool(_status, upload_id, meta)
+        if status["received"] != meta["size"]:
+            raise ValueError(f"文件未上传完整：{status['received']}/{meta['size']} 字节")
+        part = _part_path(upload_id)
+        digest = await run_in_threadpool(_hash_file, part)
+        filename, deduplicated = await run_in_threadpool(_store, part, digest, Path(meta["name"]).suffix.lower())
+        _meta_path(upload_id).unlink(missing_ok=True)
+    _session_locks.pop(upload_id, None)
+    return _file_dict(filename, meta["name"], meta["type"], meta["size"], deduplicated)
+
+
+async def abort_session(upload_id: str) -> bool:
+    meta = await run_in_threadpool(_read_meta, upload_id)
+    if not meta:
+        return False
+
+    def _remove() -> None:
+        _part_path(upload_id).unlink(missing_ok=True)
+        _meta_path(upload_id).unlink(missing_ok=True)
+
+    await run_in_threadpool(_remove)
+    _session_locks.pop(upload_id, None)
+    return True
+
+
+# ============================================================
+# 引用计数与垃圾回收
+# ============================================================
+def _upload_name(url: Optional[str]) -> Optional[str]:
+    if url and url.startswith("/uploads/"):
+        return url[len("/uploads/"):]
+    return None
+
+
+async def reference_counts(db: AsyncSession) -> Dict[str, int]:
+    """统计 UPLOAD_DIR 中每个文件被引用的次数：附件、交易的发票/公账截图、发票图片"""
+    counts: Dict[str, int] = {}
+
+    def add(url: Optional[str]) -> None:
+        name = _upload_name(url)
+        if name:
+            counts[name] = counts.get(name, 0) + 1
+
+    for (url,) in (await db.execute(select(Attachment.url))).all():
+        add(url)
+    for (url,) in (await db.execute(select(Invoice.image_url).where(Invoice.image_url.isnot(None)))).all():
+        add(url)
+    image_rows = await db.execute(
+        select(Transaction.invoice_images, Transaction.company_account_images)
+        .where((Transaction.invoice_images != "[]") | (Transaction.company_account_images != "[]"))
+    )
+    for row in image_rows.all():
+        for raw in row:
+            try:
+                images = json.loads(raw) if raw else []
+            except ValueError:
+                continue
+            for img in images:
+                if isinstance(img, dict):
+                    add(img.get("url"))
+    return counts
+
+
+def _sweep(referenced: set, grace_seconds: int, dry_run: bool) -> dict:
+    cutoff = time.time() - grace_seconds
+    # 缩略图、预压缩副本随原文件保留
+    thumbs = {thumb_name(name) for name in referenced}
+    variants = {name + GZIP_SUFFIX for name in referenced}
+    scanned = deleted = freed = 0
+    for path in UPLOAD_DIR.iterdir():
+        if not path.is_file():
+            continue
+        scanned += 1
+        stat = path.stat()
+        if path.name in referenced or stat.st_mtime > cutoff:
+            continue
+        if path.name in variants or (is_thumbnail(path.name) and path.name in thumbs):
+            continue
+        deleted += 1
+        freed += stat.st_size
+        if not dry_run:
+            path.unlink(missing_ok=True)
+            forget_thumbnail(path.name)
+    return {"scanned": scanned, "referenced": len(referenced), "deleted": deleted, "freedBytes": freed}
+
+
+async def collect_garbage(db: AsyncSession, grace_seconds: int = GC_GRACE_SECONDS, dry_run: bool = False) -> dict:
+    """删除没有任何业务记录引用、且超过保留期的上传文件"""
+    counts = await reference_counts(db)
+    result = await run_in_threadpool(_sweep, set(counts), grace_seconds, dry_run)
+    if not dry_run:
+        # 过期的分片上传会话和残留临时文件
+        await sweep_partial_sessions(grace_seconds)
+    result["dryRun"] = dry_run
+    return result
@@ -0,0 +1,149 @@
+"""附件缩略图：图片与 PDF 首页，在进程池中后台生成，存放在原文件旁（{stem}.thumb.jpg）
+
+依赖 Pillow（PDF 另需 pypdfium2），均为可选：未安装时不生成缩略图，
+thumbnail_url 返回 None，前端回退到原图。
+
+已生成的缩略图记在内存集合中（启动时 scan 扫描一次目录，生成完成后加入），
+生成失败的原文件记入失败集合不再重试（重启后清空），请求中不做文件系统检查。
+"""
+import asyncio
+import importlib.util
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, Set
+
+from app.config import UPLOAD_DIR, settings
+
+logger = logging.getLogger(__name__)
+
+THUMB_SUFFIX = ".thumb.jpg"
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+HAS_PIL = importlib.util.find_spec("PIL") is not None
+HAS_PDFIUM = importlib.util.find_spec("pypdfium2") is not None
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pending: Set[str] = set()
+_tasks: Set[asyncio.Future] = set()
+_ready: Set[str] = set()  # 已存在的缩略图文件名
+_failed: Set[str] = set()  # 生成失败的原文件名
+
+
+def _supported(ext: str) -> bool:
+    if not HAS_PIL:
+        return False
+    return ext in IMAGE_EXTENSIONS or (ext == ".pdf" and HAS_PDFIUM)
+
+
+def thumb_name(filename: str) -> str:
+    return Path(filename).stem + THUMB_SUFFIX
+
+
+def is_thumbnail(filename: str) -> bool:
+    return filename.endswith(THUMB_SUFFIX)
+
+
+def scan() -> None:
+    """扫描上传目录，登记已有的缩略图（启动时在线程池中调用）"""
+    _ready.update(p.name for p in UPLOAD_DIR.glob("*" + THUMB_SUFFIX))
+
+
+def forget(name: str) -> None:
+    """文件被删除（上传文件 GC）或重新上传时清除其登记状态"""
+    _ready.discard(name)
+    _failed.discard(name)
+
+
+def _render(src: str, dst: str, size: int) -> None:
+    """在子进程中执行：读取原文件（PDF 渲染首页），等比缩放后存为 JPEG；已存在时跳过（其他进程已生成）"""
+    if os.path.exists(dst):
+        return
+    from PIL import Image, ImageOps
+
+    if src.lower().endswith(".pdf"):
+        import pypdfium2 as pdfium
+
+        pdf = pdfium.PdfDocument(src)
+        try:
+            page = pdf[0]
+            width, height = page.get_size()
+            img = page.render(scale=size / max(width, height, 1) * 2).to_pil()
+        finally:
+            pdf.close()
+    else:
+        img = ImageOps.exif_transpose(Image.open(src))
+    img.thumbnail((size, size))
+    tmp = dst + ".tmp"
+    img.convert("RGB").save(tmp, "JPEG", quality=80, optimize=True)
+    os.replace(tmp, dst)
+
+
+def enqueue(filename: str) -> None:
+    """提交后台生成任务（已存在、正在生成或曾失败时忽略）；需在事件循环中调用"""
+    global _pool
+    if is_thumbnail(filename) or not _supported(Path(filename).suffix.lower()):
+        return
+    name = thumb_name(filename)
+    if name in _ready or filename in _pending or filename in _failed:
+        return
+    src = UPLOAD_DIR / filename
+    dst = UPLOAD_DIR / name
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    if _pool is None:
+        # spawn：fork 会复制事件循环、数据库连接与持有中的锁，子进程可能死锁
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    _pending.add(filename)
+    future = loop.run_in_executor(_pool, _render, str(src), str(dst), settings.THUMBNAIL_SIZE)
+    _tasks.add(future)
+
+    def _done(f: asyncio.Future) -> None:
+        _tasks.discard(f)
+        _pending.discard(filename)
+        if f.cancelled():
+            return
+        error = f.exception()
+        if error:
+            _failed.add(filename)
+            # 原文件不存在（已被清理）不算生成失败
+            if not isinstance(error, FileNotFoundError):
+                logger.warning("thumbnail generation failed for %s: %s", filename, error)
+        else:
+            _ready.add(name)
+
+    future.add_done_callback(_done)
+
+
+def thumbnail_url(url: Optional[str]) -> Optional[str]:
+    """/uploads/x.pdf → /uploads/x.thumb.jpg；缩略图尚未生成时补提交任务并返回 None"""
+    if not url or not url.startswith("/uploads/"):
+        return None
+    filename = url[len("/uploads/"):]
+    name = thumb_name(filename)
+    if name in _ready:
+        return f"/uploads/{name}"
+    enqueue(filename)
+    return None
+
+
+def with_thumbnails(items: list) -> list:
+    """为附件/图片列表中的每一项补充 thumbUrl"""
+    for item in items:
+        if isinstance(item, dict):
+            item["thumbUrl"] = thumbnail_url(item.get("url"))
+    return items
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,132 @@
+"""
+SQLite 并发读写基准：对比默认配置与性能配置（WAL 等 PRAGMA，见 app.database.sqlite_pragmas）
+在 data.db 的临时副本上运行，不修改原数据库。
+用法：cd server && python benchmark_db.py [--seconds 10] [--readers 8] [--writers 2]
+"""
+import argparse
+import asyncio
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from sqlalchemy import event, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import app.models  # noqa: F401  注册全部模型
+from app.config import settings
+from app.database import Base, sqlite_pragmas
+from app.transaction.keys import ensure_columns
+from app.transaction.models import Transaction
+
+DB_PATH = Path(__file__).parent / "data.db"
+
+
+def _percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+async def _run(db_file: Path, profile: bool, seconds: float, readers: int, writers: int) -> dict:
+    settings.SQLITE_PERFORMANCE_PROFILE = profile
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{db_file}",
+        connect_args={"check_same_thread": False},
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _connect(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+        cursor.close()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await ensure_columns(conn)
+        journal = (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+        account_id = (await conn.execute(text("SELECT id FROM accounts LIMIT 1"))).scalar()
+        category_id = (await conn.execute(text("SELECT id FROM categories WHERE type = 'expense' LIMIT 1"))).scalar()
+    session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    deadline = time.perf_counter() + seconds
+    stats = {"reads": [], "writes": [], "errors": 0}
+
+    async def reader():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with session() as db:
+                    await db.execute(
+                        select(Transaction.category_id, func.sum(Transaction.amount))
+                        .group_by(Transaction.category_id)
+                    )
+                    await db.execute(select(Transaction).order_by(Transaction.date.desc()).limit(20))
+                stats["reads"].append(time.perf_counter() - started)
+            except Exception:
+                stats["errors"] += 1
+
+    async def writer():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with session() as db:
+                    db.add(Transaction(
+                        id=str(uuid.uuid4()), type="expense", amount=1, date="2000-01-01",
+                        account_id=account_id, category_id=category_id, description="benchmark", tags="[]",
+                    ))
+                    await db.execute(
+                        text("UPDATE accounts SET balance = balance - 1 WHERE id = :id"), {"id": account_id}
+                    )
+                    await db.commit()
+                stats["writes"].append(time.perf_counter() - started)
+            except Exception:
+                stats["errors"] += 1
+
+    await asyncio.gather(*[reader() for _ in range(readers)], *[writer() for _ in range(writers)])
+    await engine.dispose()
+    return {
+        "journal": journal,
+        "reads/s": len(stats["reads"]) / seconds,
+        "writes/s": len(stats["writes"]) / seconds,
+        "read p95 ms": _percentile(stats["reads"], 0.95),
+        "write p95 ms": _percentile(stats["writes"], 0.95),
+        "errors": stats["errors"],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    args = parser.parse_args()
+
+    if not DB_PATH.exists():
+        print("[SKIP] data.db 不存在")
+        sys.exit(1)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, profile in (("default", False), ("performance", True)):
+            db_file = Path(tmp) / f"bench_{name}.db"
+            shutil.copy2(DB_PATH, db_file)
+            results[name] = await _run(db_file, profile, args.seconds, args.readers, args.writers)
+            print(f"[OK] {name}: {results[name]['journal']}")
+
+    print(f"\n{args.readers} readers / {args.writers} writers, {args.seconds:g}s")
+    print(f"{'':<14}{'default':>12}{'performance':>14}")
+    for key in ("reads/s", "writes/s", "read p95 ms", "write p95 ms", "errors"):
+        before, after = results["default"][key], results["performance"][key]
+        print(f"{key:<14}{before:>12.1f}{after:>14.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
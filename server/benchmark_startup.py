@@ -0,0 +1,73 @@
+"""
+冷启动耗时：每次在新进程中导入 app.main 并执行 lifespan 启动阶段（与 restart.sh 重启相同）
+第 1 次为未记录库结构版本的旧库（完整建表/补列/种子检查），之后为版本一致时的快速启动。
+在 data.db 的临时副本上运行，不修改原数据库。
+用法：cd server && python benchmark_startup.py [--runs 5] [--full]   # --full 对比关闭 STARTUP_SCHEMA_CHECK
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent / "data.db"
+
+_CHILD = """
+import asyncio, json, time
+t0 = time.perf_counter()
+from app.main import app, lifespan
+t1 = time.perf_counter()
+
+async def boot():
+    async with lifespan(app):
+        t2 = time.perf_counter()
+    return t2
+
+t2 = asyncio.run(boot())
+print(json.dumps({"import": (t1 - t0) * 1000, "startup": (t2 - t1) * 1000}))
+"""
+
+
+def _boot(db_file: Path, schema_check: bool) -> dict:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite+aiosqlite:///{db_file}",
+        STARTUP_SCHEMA_CHECK=str(schema_check).lower(),
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD], cwd=Path(__file__).parent, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def _report(label: str, runs: list) -> None:
+    for i, r in enumerate(runs, 1):
+        total = r["import"] + r["startup"]
+        print(f"  {label} #{i}: import {r['import']:7.0f} ms  startup {r['startup']:7.0f} ms  total {total:7.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--full", action="store_true", help="同时测量每次都完整执行的启动")
+    args = parser.parse_args()
+    if not DB_PATH.exists():
+        print(f"[SKIP] {DB_PATH} 不存在")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = Path(tmp) / "data.db"
+        shutil.copy(DB_PATH, db_file)
+        print("=== 库结构版本检查 ===")
+        _report("boot", [_boot(db_file, True) for _ in range(args.runs)])
+        if args.full:
+            print("=== 每次完整执行 ===")
+            _report("boot", [_boot(db_file, False) for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()
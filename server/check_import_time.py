@@ -0,0 +1,78 @@
+"""
+启动导入耗时检查：用 python -X importtime 在新进程中导入入口模块，超出预算或提前加载了
+应按需导入的重型依赖时以非零状态退出（可放在提交前或 CI 中运行）。
+  app.main    服务进程（uvicorn worker）
+  app.models  命令行工具（迁移、基准脚本、alembic）
+用法：cd server && python check_import_time.py [--runs 3] [--server-ms 1200] [--cli-ms 800] [--top 10]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# 只在生成报表、缩略图或连接 PostgreSQL 时才需要
+LAZY_MODULES = ("xlrd", "xlwt", "xlutils", "PIL", "pypdfium2", "asyncpg", "sqlalchemy.dialects.postgresql")
+# 命令行工具只需模型
+CLI_EXCLUDED = ("fastapi", "app.main")
+
+
+def _importtime(module: str) -> dict:
+    """返回 {模块名: (自身耗时, 累计耗时)}，单位微秒"""
+    env = dict(os.environ, DATABASE_URL="sqlite+aiosqlite:///./data.db")
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).parent, env=env, capture_output=True, text=True, check=True,
+    ).stderr
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def _check(module: str, budget_ms: float, excluded: tuple, runs: int, top: int) -> list:
+    samples = [_importtime(module) for _ in range(runs)]
+    best = min(samples, key=lambda t: t[module][1])
+    elapsed = best[module][1] / 1000
+    print(f"{module}: {elapsed:.0f} ms（预算 {budget_ms:.0f} ms，{runs} 次取最小）")
+    slowest = sorted(
+        ((name, t) for name, t in best.items() if name.startswith("app.")),
+        key=lambda item: item[1][1], reverse=True,
+    )[:top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"  {cumulative_us / 1000:7.1f} ms  (self {self_us / 1000:5.1f})  {name}")
+
+    failures = []
+    if elapsed > budget_ms:
+        failures.append(f"{module} 导入耗时 {elapsed:.0f} ms 超出预算 {budget_ms:.0f} ms")
+    loaded = sorted(
+        name for name in best
+        if any(name == m or name.startswith(m + ".") for m in excluded)
+    )
+    roots = sorted({name for name in loaded if not any(name.startswith(p + ".") for p in loaded)})
+    if roots:
+        failures.append(f"{module} 启动时加载了应按需导入的模块: {', '.join(roots)}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--server-ms", type=float, default=1200)
+    parser.add_argument("--cli-ms", type=float, default=800)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    failures = _check("app.main", args.server_ms, LAZY_MODULES, args.runs, args.top)
+    failures += _check("app.models", args.cli_ms, LAZY_MODULES + CLI_EXCLUDED, args.runs, args.top)
+    if failures:
+        print("\n[FAIL]\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\n[OK] 导入耗时在预算内")
+
+
+if __name__ == "__main__":
+    main()
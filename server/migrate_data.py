@@ -86,21 +86,49 @@ def migrate():
     except sqlite3.OperationalError as e:
         print(f"  [SKIP] category_id fix: {e}")
 
+    # 交易整数键列：day_key（YYYYMMDD）、month_key（YYYYMM）、amount_cents（分）
+    try:
+        cur.execute("PRAGMA table_info(transactions)")
+        txn_cols = {r[1] for r in cur.fetchall()}
+        for col in ("day_key", "month_key", "amount_cents"):
+            if col not in txn_cols:
+                cur.execute(f"ALTER TABLE transactions ADD COLUMN {col} INTEGER NOT NULL DEFAULT 0")
+                print(f"  [OK] transactions.{col} added")
+        cur.execute("""
+            UPDATE transactions SET
+                day_key = CAST(replace(substr(date, 1, 10), '-', '') AS INTEGER),
+                month_key = CAST(replace(substr(date, 1, 7), '-', '') AS INTEGER),
+                amount_cents = CAST(ROUND(amount * 100) AS INTEGER)
+            WHERE day_key = 0 AND date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'
+        """)
+        print(f"  transactions 整数键回填: {cur.rowcount} rows")
+    except sqlite3.OperationalError as e:
+        print(f"  [SKIP] transactions 整数键: {e}")
+
     # Create indexes (IF NOT EXISTS)
     indexes = [
         "CREATE INDEX IF NOT EXISTS ix_transactions_date ON transactions(date)",
         "CREATE INDEX IF NOT EXISTS ix_transactions_type ON transactions(type)",
         "CREATE INDEX IF NOT EXISTS ix_transactions_account_id ON transactions(account_id)",
         "CREATE INDEX IF NOT EXISTS ix_transactions_category_id ON transactions(category_id)",
+        "CREATE INDEX IF NOT EXISTS ix_transactions_category_date ON transactions(category_id, date)",
         "CREATE INDEX IF NOT EXISTS ix_transactions_contact_id ON transactions(contact_id)",
         "CREATE INDEX IF NOT EXISTS ix_transactions_payment_confirmed ON transactions(payment_confirmed)",
         "CREATE INDEX IF NOT EXISTS ix_transactions_tax_declared ON transactions(tax_declared)",
         "CREATE INDEX IF NOT EXISTS ix_transactions_invoice_pending ON transactions(invoice_needed, invoice_completed)",
         "CREATE INDEX IF NOT EXISTS ix_transactions_reimbursement_batch_id ON transactions(reimbursement_batch_id)",
         "CREATE INDEX IF NOT EXISTS ix_budgets_category_id ON budgets(category_id)",
+        "CREATE INDEX IF NOT EXISTS ix_invoices_direction_issue_date ON invoices(direction, issue_date)",
+        "CREATE INDEX IF NOT EXISTS ix_invoices_number ON invoices(number)",
+        "CREATE INDEX IF NOT EXISTS ix_invoices_transaction_id ON invoices(transaction_id)",
         "CREATE INDEX IF NOT EXISTS ix_reimbursement_batches_status ON reimbursement_batches(status)",
         "CREATE INDEX IF NOT EXISTS ix_contacts_type ON contacts(type)",
         "CREATE INDEX IF NOT EXISTS ix_contacts_name ON contacts(name)",
+        "CREATE INDEX IF NOT EXISTS ix_reimbursement_batch_items_transaction_id ON reimbursement_batch_items(transaction_id)",
+        "CREATE INDEX IF NOT EXISTS ix_event_outbox_status ON event_outbox(status)",
+        "CREATE INDEX IF NOT EXISTS ix_transactions_day_key ON transactions(day_key)",
+        "CREATE INDEX IF NOT EXISTS ix_transactions_type_day ON transactions(type, day_key, amount_cents)",
+        "CREATE INDEX IF NOT EXISTS ix_transactions_category_day ON transactions(category_id, day_key)",
     ]
 
     # Unique constraint on salary_records